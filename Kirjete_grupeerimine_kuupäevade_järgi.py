@@ -1,9 +1,18 @@
+import argparse
+import json
 import os
 import re
 
+from kuupaevad import YEAR_LINE_RE, iter_headers
+from tokenid import estimate_tokens
+
+ENTRY_SPLIT_RE = re.compile(r'\n\n\s*(?=\d+\.\s+)')
+
 class TextToJsonTranslator:
-    def __init__(self, max_chunk_size: int = 2500):
+    def __init__(self, max_chunk_size: int = 2500, max_tokens: int = None):
+        # Paki suurim maht märkides; max_tokens lisab hinnangulise tokenipiiri
         self.max_chunk_size = max_chunk_size
+        self.max_tokens = max_tokens
 
     def read_txt_file(self, filename: str) -> str:
         with open(filename, 'r', encoding='utf-8') as file:
@@ -22,48 +31,40 @@ class TextToJsonTranslator:
         current_year = None
 
         # Leia rida, mis sisaldab ainult 4-kohalise aasta (nt "1632")
-        year_match = re.search(r'^\s*(\d{4})\s*$', text, flags=re.MULTILINE)
+        year_match = YEAR_LINE_RE.search(text)
         if year_match:
             current_year = year_match.group(1)
 
-        # Muster, mis haarab kuupäeva ridu.
-        # See muster haarab ridade alguses: number, punkt, tühik, kuu nimi,
-        # ning võimalusel aasta (4 numbrit, võib esineda ka tühikuga enne).
-        date_pattern = re.compile(
-            r'^\s*(\d{1,2}\.\s+[A-Za-zäöüõÄÖÜÕ]+(?:\s+(\d{4}))?)\s*$',
-            flags=re.MULTILINE
-        )
-
-        # Leiame kõik kuupäeva read koos asukohtadega tekstis
-        date_matches = list(date_pattern.finditer(text))
+        # Kuupäeva read leitakse ühise parseriga (kuupaevad.py), mis tunneb ära
+        # ka "Dep." eesliite, OCR-ist katkised kuunimed ja "Juni 1632" kujul päised.
+        date_matches = list(iter_headers(text))
 
         # Kui ei leitud ühtegi kuupäeva rida, tagastame tühja loendi
         if not date_matches:
             return chunks
 
         # Itereerime leidude vahel, et eraldada iga kuupäeva sektsioon
-        for i, match in enumerate(date_matches):
-            full_date_str = match.group(1).strip()  # näiteks "21. April" või "20. April 1632"
-            year_in_date = match.group(2)  # võib olla None, kui aasta puudub
+        for i, (match, header) in enumerate(date_matches):
+            full_date_str = header['text']  # näiteks "21. April" või "20. April 1632"
 
             # Kui aasta puudub, kasuta eelmist teadaolevat aastat
-            if not year_in_date:
+            if not header['year']:
                 if current_year is None:
                     raise ValueError("Aasta pole leitud: veendu, et tekstis oleks rida ainult aasta (nt '1632').")
                 full_date_str += f" {current_year}"
             else:
                 # Uuenda current_year, kui see on olemas kuupäeval
-                current_year = year_in_date
+                current_year = header['year']
 
             # Määra sektsiooni alguspositsioon ja lõpp
             section_start = match.end()
             if i + 1 < len(date_matches):
-                section_end = date_matches[i+1].start()
+                section_end = date_matches[i+1][0].start()
             else:
                 section_end = len(text)
             section_text = text[section_start:section_end]
 
-            entries = re.split(r'\n\n\s*(?=\d+\.\s+)', section_text)
+            entries = ENTRY_SPLIT_RE.split(section_text)
             # Filtreeri tühjad osad ning eemalda liigsed tühikud
             entries = [entry.strip() for entry in entries if entry.strip()]
 
@@ -75,7 +76,7 @@ class TextToJsonTranslator:
 
         return chunks
 
-    def save_chunks(self, chunks: list, output_dir: str):
+    def save_chunks(self, chunks: list, output_dir: str, verbose: bool = False):
         """Salvesta tükid failidesse"""
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
@@ -85,20 +86,128 @@ class TextToJsonTranslator:
             content = f"Date: {chunk['date']}\n\n{chunk['content']}"
             with open(output_file, 'w', encoding='utf-8') as f:
                 f.write(content)
-            print(f"Saved chunk {i} with date {chunk['date']}")
+            if verbose:
+                print(f"Saved chunk {i} with date {chunk['date']}")
+
+    def _fits(self, text: str) -> bool:
+        if self.max_chunk_size and len(text) > self.max_chunk_size:
+            return False
+        if self.max_tokens and estimate_tokens(len(text.encode('utf-8'))) > self.max_tokens:
+            return False
+        return True
+
+    def pack_chunks(self, chunks: list) -> list:
+        """
+        Pakib järjestikused kirjed suuremateks pakkideks, mille maht ei ületa
+        max_chunk_size märki ega max_tokens hinnangulist tokenit.
+
+        Kuupäevarida ("Date: ...") lisatakse paki algusesse ja iga kord, kui
+        kuupäev muutub, nii et iga kirje juurde jääb tema kuupäev.
+        Piirist suurem kirje läheb eraldi pakki.
+        """
+        packs = []
+        parts = []
+        dates = []
+        entries = 0
+
+        def flush():
+            if parts:
+                packs.append({'dates': list(dates), 'entries': entries, 'text': '\n\n'.join(parts)})
+
+        for chunk in chunks:
+            same_date = bool(dates) and dates[-1] == chunk['date']
+            new_parts = [chunk['content']] if same_date else [f"Date: {chunk['date']}", chunk['content']]
+
+            if parts and not self._fits('\n\n'.join(parts + new_parts)):
+                flush()
+                parts, dates, entries = [], [], 0
+                new_parts = [f"Date: {chunk['date']}", chunk['content']]
+                same_date = False
+
+            parts.extend(new_parts)
+            if not same_date:
+                dates.append(chunk['date'])
+            entries += 1
+
+        flush()
+        return packs
+
+    def save_packed(self, packs: list, output_dir: str, shard_size: int = None) -> str:
+        """
+        Salvestab pakid JSONL faili (või shard_size kaupa mitmesse faili) ning
+        nihete indeksi index.json, mille abil saab iga paki lugeda ilma
+        kogu faili läbimata.
+
+        Returns:
+            Indeksi faili tee.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        index = []
+        outfile = None
+        shard_name = None
+        offset = 0
+
+        try:
+            for i, pack in enumerate(packs):
+                if outfile is None or (shard_size and i % shard_size == 0):
+                    if outfile:
+                        outfile.close()
+                    shard_name = f'packs_{i // shard_size:03d}.jsonl' if shard_size else 'packs.jsonl'
+                    outfile = open(os.path.join(output_dir, shard_name), 'wb')
+                    offset = 0
+
+                line = (json.dumps({'id': i, **pack}, ensure_ascii=False) + '\n').encode('utf-8')
+                outfile.write(line)
+                index.append({
+                    'id': i,
+                    'file': shard_name,
+                    'offset': offset,
+                    'length': len(line),
+                    'entries': pack['entries'],
+                    'dates': pack['dates'],
+                    'chars': len(pack['text']),
+                })
+                offset += len(line)
+        finally:
+            if outfile:
+                outfile.close()
+
+        index_file = os.path.join(output_dir, 'index.json')
+        with open(index_file, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        return index_file
+
+    @staticmethod
+    def read_pack(output_dir: str, index_entry: dict) -> dict:
+        """Loeb indeksi kirje järgi ühe paki."""
+        with open(os.path.join(output_dir, index_entry['file']), 'rb') as f:
+            f.seek(index_entry['offset'])
+            return json.loads(f.read(index_entry['length']))
 
 def main():
     # Tee tee skripti asukohast
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    input_file = os.path.join(script_dir, 'test.txt')
-    output_dir = os.path.join(script_dir, 'chunks')
 
-    translator = TextToJsonTranslator()
-    text = translator.read_txt_file(input_file)
+    parser = argparse.ArgumentParser(description='Jaga tekst kuupäevade järgi kirjeteks')
+    parser.add_argument('input_file', nargs='?', default=os.path.join(script_dir, 'test.txt'), help='Sisendfail')
+    parser.add_argument('--output-dir', default=os.path.join(script_dir, 'chunks'), help='Väljundkaust')
+    parser.add_argument('--pack', action='store_true', help='Paki kirjed suuremateks JSONL pakkideks')
+    parser.add_argument('--max-chunk-size', type=int, default=2500, help='Paki suurim maht märkides')
+    parser.add_argument('--max-tokens', type=int, help='Paki suurim hinnanguline tokenite arv')
+    parser.add_argument('--shard-size', type=int, help='Pakke ühes JSONL failis (vaikimisi kõik ühes)')
+    args = parser.parse_args()
+
+    translator = TextToJsonTranslator(max_chunk_size=args.max_chunk_size, max_tokens=args.max_tokens)
+    text = translator.read_txt_file(args.input_file)
     chunks = translator.split_text_into_entries(text)
-    translator.save_chunks(chunks, output_dir)
-    
-    print(f"\nCreated {len(chunks)} chunks in directory '{output_dir}'")
+
+    if args.pack:
+        packs = translator.pack_chunks(chunks)
+        index_file = translator.save_packed(packs, args.output_dir, shard_size=args.shard_size)
+        print(f"\nPacked {len(chunks)} entries into {len(packs)} packs, index: '{index_file}'")
+    else:
+        translator.save_chunks(chunks, args.output_dir)
+        print(f"\nCreated {len(chunks)} chunks in directory '{args.output_dir}'")
 
 if __name__ == "__main__":
     main()
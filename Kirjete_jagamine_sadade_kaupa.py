@@ -1,43 +1,139 @@
-import re
-
-def split_file_by_hundreds(filename):
-    with open(filename, 'r', encoding='utf-8') as file:
-        content = file.read()
-    
-    # Leiame "sajaste" alguspunktid (1., 101., 201. jne)
-    hundreds_positions = []
-    
-    # Alustame esimesest kirjest
-    pattern = r"^1\."
-    match = re.search(pattern, content, re.MULTILINE)
-    if match:
-        hundreds_positions.append(match.start())
-    
-    # Leiame ülejäänud "sajased" alguspunktid
-    for i in range(101, 2000, 100):  # Eeldame, et kirjeid pole rohkem kui 2000
-        pattern = f"^{i}\\."
-        match = re.search(pattern, content, re.MULTILINE)
-        if match:
-            hundreds_positions.append(match.start())
-    
-    # Jagame failid plokkideks
-    for i in range(len(hundreds_positions)):
-        start_pos = hundreds_positions[i]
-        if i + 1 < len(hundreds_positions):
-            end_pos = hundreds_positions[i + 1]
-        else:
-            end_pos = len(content)
-        
-        group_content = content[start_pos:end_pos]
-        start_number = i * 100 + 1
-        end_number = (i + 1) * 100
-        
-        output_filename = f'/home/mf/Downloads/album_academicum_{start_number}_{end_number}.txt'
-        with open(output_filename, 'w', encoding='utf-8') as file:
-            file.write(group_content)
-        
-        print(f"Salvestatud grupp {i+1}: kirjed {start_number}-{end_number}")
-
-# Käivitame jagamise
-input_file = '/home/mf/Downloads/album_academicum.txt'
-split_file_by_hundreds(input_file)
\ No newline at end of file
+import argparse
+import mmap
+import os
+
+from kirjete_numbrid import scan_entries
+from tokenid import estimate_tokens
+
+
+def find_entry_boundaries(data):
+    """
+    Leiab kõik kirjete algused ühe läbimisega (kirjete_numbrid.scan_entries:
+    kirje sees olevaid kuupäevaridu, nt "6. 1629), Gymn.", kirje alguseks
+    ei loeta).
+
+    Args:
+        data: bytes või mmap objekt.
+
+    Returns:
+        List kolmikutest (kirje_number, algus, lõpp) baitides.
+    """
+    entries, _ = scan_entries(data)
+    starts = [(number, start) for number, start, _ in entries]
+
+    boundaries = []
+    for i, (number, start) in enumerate(starts):
+        end = starts[i + 1][1] if i + 1 < len(starts) else len(data)
+        boundaries.append((number, start, end))
+    return boundaries
+
+
+def chunk_by_records(boundaries, records_per_chunk):
+    """Jagab kirjed plokkideks numbrite järgi (1-100, 101-200, ...)."""
+    chunks = {}
+    for number, start, end in boundaries:
+        block = (number - 1) // records_per_chunk
+        chunks.setdefault(block, []).append((number, start, end))
+    return [chunks[block] for block in sorted(chunks)]
+
+
+def chunk_by_budget(boundaries, max_bytes=None, max_tokens=None):
+    """
+    Jagab järjestikused kirjed plokkideks, mille maht ei ületa baitide
+    või hinnanguliste tokenite piiri. Piirist suurem kirje läheb eraldi plokki.
+    """
+    chunks = []
+    current = []
+    current_bytes = 0
+    for number, start, end in boundaries:
+        size = end - start
+        new_bytes = current_bytes + size
+        too_big = (
+            (max_bytes is not None and new_bytes > max_bytes) or
+            (max_tokens is not None and estimate_tokens(new_bytes) > max_tokens)
+        )
+        if current and too_big:
+            chunks.append(current)
+            current = []
+            new_bytes = size
+        current.append((number, start, end))
+        current_bytes = new_bytes
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def split_file(filename, output_dir, records_per_chunk=None, max_bytes=None,
+               max_tokens=None, prefix="album_academicum"):
+    """
+    Jagab faili plokkideks ja kirjutab need väljundkausta.
+
+    Fail avatakse mmap-iga ning kirjete piirid leitakse ühe läbimisega.
+    Plokid kirjutatakse otse mmap-i lõikudest, teksti dekodeerimata.
+
+    Returns:
+        List kirjutatud failide teedest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    written = []
+
+    with open(filename, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            boundaries = find_entry_boundaries(data)
+            if not boundaries:
+                print(f"Failist {filename} ei leitud ühtegi kirjet.")
+                return written
+
+            by_budget = max_bytes is not None or max_tokens is not None
+            if by_budget:
+                chunks = chunk_by_budget(boundaries, max_bytes=max_bytes, max_tokens=max_tokens)
+            else:
+                records_per_chunk = records_per_chunk or 100
+                chunks = chunk_by_records(boundaries, records_per_chunk)
+
+            for i, chunk in enumerate(chunks, 1):
+                first_number = chunk[0][0]
+                last_number = chunk[-1][0]
+                if not by_budget:
+                    # Vana nimekuju: ploki nominaalne vahemik (nt 101_200)
+                    first_number = (first_number - 1) // records_per_chunk * records_per_chunk + 1
+                    last_number = first_number + records_per_chunk - 1
+
+                output_filename = os.path.join(output_dir, f'{prefix}_{first_number}_{last_number}.txt')
+                with open(output_filename, 'wb') as outfile:
+                    outfile.write(data[chunk[0][1]:chunk[-1][2]])
+                written.append(output_filename)
+
+                size = chunk[-1][2] - chunk[0][1]
+                print(f"Salvestatud grupp {i}: kirjed {chunk[0][0]}-{chunk[-1][0]} "
+                      f"({len(chunk)} kirjet, {size} baiti, ~{estimate_tokens(size)} tokenit)")
+
+    return written
+
+
+def split_file_by_hundreds(filename, output_dir):
+    """Jagab faili saja kirje kaupa plokkideks (1-100, 101-200, ...)."""
+    return split_file(filename, output_dir, records_per_chunk=100)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jaga koondfail kirjete plokkideks')
+    parser.add_argument('filename', help='Sisendfail (nt album_academicum.txt)')
+    parser.add_argument('--output-dir', default='.', help='Väljundkaust')
+    parser.add_argument('--records', type=int, default=None, help='Kirjeid plokis (vaikimisi 100)')
+    parser.add_argument('--max-bytes', type=int, help='Ploki suurim maht baitides')
+    parser.add_argument('--max-tokens', type=int, help='Ploki suurim hinnanguline tokenite arv')
+    parser.add_argument('--prefix', default='album_academicum', help='Väljundfailide nime eesliide')
+    args = parser.parse_args()
+
+    split_file(
+        args.filename,
+        args.output_dir,
+        records_per_chunk=args.records,
+        max_bytes=args.max_bytes,
+        max_tokens=args.max_tokens,
+        prefix=args.prefix,
+    )
+
+if __name__ == "__main__":
+    main()
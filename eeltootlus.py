@@ -0,0 +1,198 @@
+"""
+Lehekülje piltide eeltöötlus enne OCR-i üleslaadimist.
+
+Skaneeringutel (nt images/tering_lk_290) on veerised ja värvisügavus, mida
+mudel ei vaja, aga üleslaaditava faili suurus mõjutab nii latentsust kui ka
+hinda. Eeltöötlus lõikab veerised, teisendab halltoonidesse, piirab
+resolutsiooni etteantud DPI-ni ja pakib JPEG-ina uuesti. Tulemused
+salvestatakse sisuaadressiga vahemällu, nii et iga lehekülg töödeldakse üks kord.
+
+    python eeltootlus.py ocr/ --cache-dir ocr/.eeltootlus --max-dpi 200
+"""
+import argparse
+import hashlib
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import PIL.Image
+import PIL.ImageOps
+
+from manifest import atomic_write
+from tekstivordlus import cer
+
+DEFAULT_OPTIONS = {
+    'max_dpi': 200,          # Suurim resolutsioon
+    'assumed_dpi': 300,      # Kui pildil DPI info puudub
+    'quality': 80,           # JPEG kvaliteet
+    'crop_threshold': 200,   # Heledusest (0-255) tumedam on "tint"
+    'crop_padding': 20,      # Veeris tekstiala ümber pikslites
+    'grayscale': True,
+    'autocrop': True,
+}
+
+
+def resolve_options(options=None):
+    """Vaikeseaded, mida antud seaded üle kirjutavad."""
+    return {**DEFAULT_OPTIONS, **(options or {})}
+
+
+def options_key(options):
+    """Seadete lühike räsi: osa vahemälu võtmest ja OCR prompti versioonist."""
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+
+
+def cache_path(image_bytes, options, cache_dir):
+    """Sisuaadress: pildi sisu ja seadete räsi."""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(options_key(options).encode('ascii'))
+    return os.path.join(cache_dir, digest.hexdigest() + '.jpg')
+
+
+def autocrop(img, threshold, padding):
+    """Lõikab ära veerised: leiab tumedate pikslite ümbritseva ristküliku."""
+    gray = img if img.mode == 'L' else img.convert('L')
+    # Tumedad pikslid -> 255, heledad -> 0; getbbox annab nullist erineva ala
+    mask = gray.point(lambda value: 255 if value < threshold else 0)
+    bbox = mask.getbbox()
+    if not bbox:
+        return img
+    left, top, right, bottom = bbox
+    return img.crop((
+        max(0, left - padding),
+        max(0, top - padding),
+        min(img.width, right + padding),
+        min(img.height, bottom + padding),
+    ))
+
+
+def preprocess_bytes(image_bytes, options):
+    """Töötleb pildi baidid ja tagastab uue JPEG-i baidid."""
+    img = PIL.Image.open(io.BytesIO(image_bytes))
+    img = PIL.ImageOps.exif_transpose(img)
+    dpi = img.info.get('dpi', (options['assumed_dpi'],))[0] or options['assumed_dpi']
+
+    img = img.convert('L') if options['grayscale'] else img.convert('RGB')
+    if options['autocrop']:
+        img = autocrop(img, options['crop_threshold'], options['crop_padding'])
+
+    if dpi > options['max_dpi']:
+        scale = options['max_dpi'] / dpi
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), PIL.Image.LANCZOS)
+        dpi = options['max_dpi']
+
+    output = io.BytesIO()
+    img.save(output, format='JPEG', quality=options['quality'], optimize=True, dpi=(dpi, dpi))
+    return output.getvalue()
+
+
+def preprocess_image(image_path, cache_dir, options=None):
+    """
+    Eeltöötleb ühe pildi (töötaja protsessis), kasutades vahemälu.
+
+    Returns:
+        Sõnastik võtmetega image, output, original_bytes, new_bytes, cached, error.
+    """
+    options = resolve_options(options)
+    result = {'image': image_path, 'output': None, 'original_bytes': 0, 'new_bytes': 0, 'cached': False, 'error': None}
+    try:
+        with open(image_path, 'rb') as f:
+            image_bytes = f.read()
+        result['original_bytes'] = len(image_bytes)
+        output_path = cache_path(image_bytes, options, cache_dir)
+        if os.path.exists(output_path):
+            result['cached'] = True
+        else:
+            atomic_write(output_path, preprocess_bytes(image_bytes, options))
+        result['output'] = output_path
+        result['new_bytes'] = os.path.getsize(output_path)
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+def preprocess_images(image_files, cache_dir, options=None, workers=None, verbose=True):
+    """
+    Eeltöötleb pildid protsesside kogumis.
+
+    Returns:
+        (vastendus originaal -> eeltöödeldud tee, tulemuste list). Ebaõnnestunud
+        pildid vastendusse ei satu, nende jaoks kasutatakse originaali.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(preprocess_image, image_files, [cache_dir] * len(image_files),
+                                    [options] * len(image_files)))
+
+    mapping = {}
+    for result in results:
+        if result['error']:
+            print(f"Viga pildi {result['image']} eeltöötlusel: {result['error']}. Kasutan originaali.")
+            continue
+        mapping[result['image']] = result['output']
+        if verbose:
+            saved = result['original_bytes'] - result['new_bytes']
+            percent = saved / result['original_bytes'] * 100 if result['original_bytes'] else 0
+            print(f"{os.path.basename(result['image'])}: {result['original_bytes']} -> {result['new_bytes']} baiti "
+                  f"(säästetud {saved}, {percent:.0f}%){' [vahemälust]' if result['cached'] else ''}")
+
+    original_total = sum(r['original_bytes'] for r in results if not r['error'])
+    new_total = sum(r['new_bytes'] for r in results if not r['error'])
+    if original_total:
+        print(f"Eeltöödeldud {len(mapping)} pilti: {original_total} -> {new_total} baiti "
+              f"(säästetud {(original_total - new_total) / original_total * 100:.0f}%)")
+    return mapping, results
+
+
+def evaluate_accuracy(sample_pairs, transcribe, cache_dir, options=None):
+    """
+    Võrdleb OCR täpsust originaal- ja eeltöödeldud piltidel.
+
+    Args:
+        sample_pairs: List paaridest (pildi tee, käsitsi kontrollitud .txt tee).
+        transcribe: Funktsioon pildi_tee -> tekst (nt OcrSession.transcribe).
+
+    Returns:
+        List sõnastikest võtmetega image, cer_original, cer_preprocessed, original_bytes, new_bytes.
+    """
+    mapping, results = preprocess_images([image for image, _ in sample_pairs], cache_dir, options, verbose=False)
+    sizes = {r['image']: r for r in results}
+    report = []
+    for image_path, text_path in sample_pairs:
+        with open(text_path, 'r', encoding='utf-8') as f:
+            reference = f.read()
+        row = {
+            'image': image_path,
+            'cer_original': cer(reference, transcribe(image_path)),
+            'cer_preprocessed': cer(reference, transcribe(mapping.get(image_path, image_path))),
+            'original_bytes': sizes[image_path]['original_bytes'],
+            'new_bytes': sizes[image_path]['new_bytes'],
+        }
+        report.append(row)
+        print(f"{os.path.basename(image_path)}: CER {row['cer_original']:.3f} -> {row['cer_preprocessed']:.3f}, "
+              f"{row['original_bytes']} -> {row['new_bytes']} baiti")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Eeltöötle lehekülje pildid enne OCR-i')
+    parser.add_argument('folder', help='Piltide kaust')
+    parser.add_argument('--cache-dir', help='Vahemälu kaust (vaikimisi <kaust>/.eeltootlus)')
+    parser.add_argument('--max-dpi', type=int, default=DEFAULT_OPTIONS['max_dpi'])
+    parser.add_argument('--quality', type=int, default=DEFAULT_OPTIONS['quality'])
+    parser.add_argument('--no-crop', action='store_true', help='Ära lõika veeriseid')
+    parser.add_argument('--color', action='store_true', help='Säilita värvid')
+    parser.add_argument('--workers', type=int, help='Protsesside arv')
+    args = parser.parse_args()
+
+    image_files = sorted(
+        os.path.join(args.folder, f)
+        for f in os.listdir(args.folder)
+        if f.lower().endswith(('.jpg', '.jpeg', '.png', '.tif', '.tiff'))
+    )
+    options = {'max_dpi': args.max_dpi, 'quality': args.quality, 'autocrop': not args.no_crop, 'grayscale': not args.color}
+    preprocess_images(image_files, args.cache_dir or os.path.join(args.folder, '.eeltootlus'), options, workers=args.workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Kirjete reeglipõhine eeltuvastus enne LLM-i.
+
+Kirje algus on kindla kujuga:
+
+    Immatrikuleerimise kuupäev: 20. April 1632
+    [NR]1. Baaz(ius) (Baacius, Basius), Benedictus (Bengt), Jönköping (Smal.),
+    *1612, †1650. V.: Joh. B., P. in Jönköping 1624, †1649. Stud. Univ.
+    Rostock (imm. 12. 1627), Uppsala (imm. 4. 1628). AG: ...
+
+Siit loetakse välja ainult see, mis vastab mustrile täpselt: kirje number
+ja kuupäev, nimi koos variantidega, päritolu (linn, regioon), sünni- ja
+surmaaasta (*, †), isa nimi ja surmaaasta (V.:) ning õpingud, kui kogu
+"Stud." lause koosneb kujudest "Univ. X (imm. M. AAAA)". Mustrist kõrvale
+kalduv osa jääb lahendamata ja selle teeb LLM. Listid (studies) on kas
+tervikuna lahendatud või üldse mitte.
+
+pre_extract tagastab osalise JSON-i (ainult kindlad väljad), lahendatud
+väljade teed ja lahendamata jäägi tekstist; merge_partial ühendab LLM-i
+vastuse osalise JSON-iga (kindlad väljad jäävad peale).
+
+    python eeltuvastus.py NR1_1632_04.txt
+    python eeltuvastus.py --benchmark data/tering_koondfail.txt
+"""
+import argparse
+import json
+import re
+import time
+
+from kuupaevad import parse_header, to_iso
+
+# Versioon vastuste vahemälu võtme jaoks: reeglite muutmisel muutub
+PRE_EXTRACT_VERSION = "2"
+
+_UPPER = 'A-ZÄÖÜÕÅ'
+
+DATE_HEADER_RE = re.compile(r'^\s*Immatrikuleerimise kuupäev:\s*(.*?)\s*$', re.MULTILINE)
+ENTRY_RE = re.compile(r'\[NR\]\s*(\d+)\.?\s*')
+
+# Perekonnanimi(lõpp) (variandid), Eesnimi (variandid),
+NAME_RE = re.compile(
+    rf'(?P<family>[{_UPPER}][^\W\d]*(?:\([^\W\d]+\))?)(?:\s\((?P<family_variants>[^()]*)\))?,\s'
+    rf'(?P<given>[{_UPPER}][^\W\d]*)(?:\s\((?P<given_variants>[^()]*)\))?,\s'
+)
+# Perekonnanime sulgudes lõpp: Baaz(ius) -> Baaz
+FAMILY_SUFFIX_RE = re.compile(r'\([^()]*\)$')
+# Linn (Regioon), või .
+ORIGIN_RE = re.compile(
+    rf'(?P<city>[{_UPPER}][^\W\d]*(?:[ -][{_UPPER}][^\W\d]*){{0,2}})'
+    r'(?:\s\((?P<region>[^()\d]{1,30})\))?(?P<end>[,.])(?:\s|$)'
+)
+# Kuupäev: 1612, 4. 1628, 7. 6. 1629
+DATE = r'(?:(?P<day>\d{1,2})\.\s?)?(?:(?P<month>\d{1,2})\.\s?)?(?P<year>\d{4})'
+LIFE_EVENT_RE = re.compile(rf'(?P<mark>[*†])\s?{DATE}(?P<end>[,.])(?:\s|$)')
+FATHER_RE = re.compile(r'V\.:\s(?P<clause>.*?)(?=\s(?:Stud\.|AG:|M\.:)\s|$)')
+# Isa nimi: kuni kolm suurtähega sõna/lühendit, millele järgneb koma või lause lõpp
+FATHER_NAME_RE = re.compile(rf'(?P<name>[{_UPPER}][^\W\d]*\.?(?:\s[{_UPPER}][^\W\d]*\.?){{0,2}})(?=,|$)')
+FATHER_DEATH_RE = re.compile(rf',\s†\s?{DATE}\.?$')
+STUDIES_RE = re.compile(r'Stud\.\s(?P<clause>.*?\.)(?=\s(?:AG:|[A-ZÄÖÜ][^\W\d]*:)|$)')
+STUDY_ITEM_RE = re.compile(
+    rf'(?P<institution>(?:(?:Univ|Gymn)\.\s)?[{_UPPER}][^\W\d]*(?:\s[{_UPPER}][^\W\d]*)?)'
+    rf'(?:\s\(imm\.\s{DATE}\))?(?:,\s|\.$)'
+)
+# Lause, mis päritolu järel algab uue osaga (mitte päritolu märkusega)
+CLAUSE_START_RE = re.compile(r'[*†]|V\.:|Stud\.|AG:|$')
+# Nime järel kohe uus lause: päritolu puudub ("Meyer, Johann, Stud. Univ. ...")
+CLAUSE_MARKER_RE = re.compile(r'(?:Stud|Univ|imm|V|M|AG)\b')
+
+
+def _date(match):
+    """Kuupäev mustri vastest ISO kujul (AAAA, AAAA-KK või AAAA-KK-PP)."""
+    day, month, year = match.group('day'), match.group('month'), match.group('year')
+    if day and not month:
+        # "4. 1628" -> kuu ja aasta
+        day, month = None, day
+    if month and day:
+        return f"{year}-{int(month):02}-{int(day):02}"
+    if month:
+        return f"{year}-{int(month):02}"
+    return year
+
+
+def _variants(text):
+    return [part.strip() for part in text.split(',') if part.strip()] if text else []
+
+
+def _set(partial, path, value):
+    node = partial
+    keys = path.split('.')
+    for key in keys[:-1]:
+        node = node.setdefault(key, {})
+    node[keys[-1]] = value
+
+
+def pre_extract(record_text):
+    """
+    Kirje kindlad väljad reeglite järgi.
+
+    Returns:
+        Sõnastik võtmetega partial (osaline JSON), settled (lahendatud
+        väljade teed) ja remainder (lahendamata osa tekstist).
+    """
+    partial = {}
+    settled = []
+
+    def settle(path, value):
+        _set(partial, path, value)
+        settled.append(path)
+
+    header = DATE_HEADER_RE.search(record_text)
+    entry = ENTRY_RE.search(record_text)
+    if entry:
+        settle('entry_number', int(entry.group(1)))
+    if header:
+        iso = to_iso(parse_header(header.group(1)))
+        if iso:
+            settle('entry_date', iso)
+
+    body = ' '.join(record_text[entry.end():].split()) if entry else ' '.join(record_text.split())
+    # Lahendatud lõigud kehas (algus, lõpp), mis jäägist välja jäetakse
+    consumed = []
+
+    position = 0
+    name = NAME_RE.match(body)
+    if name:
+        family = name.group('family')
+        settle('person.name.full', body[:name.end()].rstrip(', '))
+        settle('person.name.family_name', FAMILY_SUFFIX_RE.sub('', family))
+        settle('person.name.family_name_variants', _variants(name.group('family_variants')))
+        settle('person.name.first_name', name.group('given'))
+        settle('person.name.first_name_variants', _variants(name.group('given_variants')))
+        position = name.end()
+
+        origin = ORIGIN_RE.match(body, position)
+        # "Rostock." ja "Stud." on sama kujuga: punktiga lõppev linn ilma
+        # regioonita võib olla lühend, selle jätame LLM-ile
+        if origin and (CLAUSE_MARKER_RE.match(origin.group('city'))
+                       or (origin.group('end') == '.' and not origin.group('region'))):
+            origin = None
+        if origin:
+            settle('person.origin.city', origin.group('city'))
+            settle('person.origin.region', origin.group('region'))
+            position = origin.end()
+            # Märkus puudub, kui järgmine osa on uus lause (*, †, V.:, Stud., AG:)
+            if CLAUSE_START_RE.match(body, position):
+                settle('person.origin.notes', None)
+                consumed.append((0, position))
+
+    # Sünd ja surm vahetult päritolu järel
+    events = {}
+    if name:
+        while True:
+            event = LIFE_EVENT_RE.match(body, position)
+            if not event:
+                break
+            key = 'birth' if event.group('mark') == '*' else 'death'
+            if key in events:
+                break
+            events[key] = _date(event)
+            consumed.append((position, event.end()))
+            position = event.end()
+        for key, date in events.items():
+            settle(f'person.{key}.date', date)
+            settle(f'person.{key}.place', None)
+            settle(f'person.{key}.notes', None)
+
+    father = FATHER_RE.search(body, position)
+    if father:
+        clause = father.group('clause')
+        father_name = FATHER_NAME_RE.match(clause)
+        if father_name:
+            settle('person.father.name', father_name.group('name'))
+        death = FATHER_DEATH_RE.search(clause)
+        if death:
+            settle('person.father.death.date', _date(death))
+            settle('person.father.death.notes', None)
+
+    studies = STUDIES_RE.search(body, position)
+    if studies:
+        clause = studies.group('clause')
+        items = []
+        item_position = 0
+        while item_position < len(clause):
+            item = STUDY_ITEM_RE.match(clause, item_position)
+            if not item:
+                items = None
+                break
+            date = _date(item) if item.group('year') else None
+            items.append({
+                "institution": item.group('institution'),
+                "type": "imm." if date else "Stud.",
+                "date": date,
+                "semester": None,
+                "arrival_date": None,
+                "end_date": None,
+                "location": None,
+                "degree": None,
+                "subject": None,
+                "notes": None,
+            })
+            item_position = item.end()
+        if items:
+            settle('studies', items)
+            consumed.append(studies.span())
+
+    if settled:
+        settle('raw_text', record_text.strip())
+
+    remainder = body
+    for start, end in sorted(consumed, reverse=True):
+        remainder = remainder[:start] + remainder[end:]
+    remainder = ' '.join(remainder.split())
+    return {'partial': partial, 'settled': settled, 'remainder': remainder}
+
+
+def merge_partial(document, partial):
+    """LLM-i vastus + osaline JSON; osalise JSON-i väärtused jäävad peale."""
+    if not isinstance(document, dict) or not isinstance(partial, dict):
+        return partial
+    merged = dict(document)
+    for key, value in partial.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_partial(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def split_records(text):
+    """Koondfaili kirjed: tükid enne iga "Immatrikuleerimise kuupäev" või [NR] rida."""
+    parts = re.split(r'\n(?=Immatrikuleerimise kuupäev:|\[NR\])', text)
+    return [part for part in parts if '[NR]' in part]
+
+
+def benchmark(texts):
+    """(kogu aeg sekundites, lahendatud väljade keskmine arv kirje kohta, jäägi osakaal)."""
+    start = time.perf_counter()
+    results = [pre_extract(text) for text in texts]
+    elapsed = time.perf_counter() - start
+    settled = sum(len(result['settled']) for result in results) / len(results) if results else 0.0
+    remainder = sum(len(result['remainder']) for result in results) / max(1, sum(len(text) for text in texts))
+    return elapsed, settled, remainder
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kirjete reeglipõhine eeltuvastus')
+    parser.add_argument('files', nargs='*', help='Kirjefailid (NR*.txt)')
+    parser.add_argument('--benchmark', help='Koondfail: eeltuvastus kõigi kirjete peal')
+    args = parser.parse_args()
+
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = pre_extract(f.read())
+        print(f"{path}: {len(result['settled'])} välja lahendatud")
+        print(json.dumps(result['partial'], indent=2, ensure_ascii=False))
+        print(f"Jääk: {result['remainder']}")
+    if args.benchmark:
+        with open(args.benchmark, 'r', encoding='utf-8') as f:
+            texts = split_records(f.read())
+        elapsed, settled, remainder = benchmark(texts)
+        print(f"{len(texts)} kirjet: {elapsed * 1000:.1f} ms, keskmiselt {settled:.1f} välja lahendatud, "
+              f"jääk {remainder * 100:.0f}% tekstist")
+
+if __name__ == "__main__":
+    main()
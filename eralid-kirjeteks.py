@@ -2,6 +2,11 @@ import re
 import os
 from pathlib import Path
 
+from kuupaevad import parse_header
+
+EMPTY_LINES_RE = re.compile(r'\n\s*\n')
+NR_RE = re.compile(r'\[NR\](\d+)')
+
 def process_month_file(month_file, year):
     """Loeb sisse ühe kuufaili, eraldab kirjed ja tagastab need listina."""
     records = []
@@ -11,7 +16,7 @@ def process_month_file(month_file, year):
     with open(month_file, 'r', encoding='utf-8') as infile:
         content = infile.read()
         # Eemaldame liigsed tühikud
-        content = re.sub(r'\n\s*\n', '\n', content)
+        content = EMPTY_LINES_RE.sub('\n', content)
         lines = content.split('\n')
         
         for line in lines:
@@ -19,27 +24,17 @@ def process_month_file(month_file, year):
             if not line:
                 continue
                 
-            # Kuupäeva formaadid
-            date_match = re.match(r'^(?:Dep\.\s*)?(\d{1,2})\.\s*(\w+)(?:\s*(\d{4})?)?$', line)
-            month_year_match = re.match(r'^(?:Dep\.\s*)?(\w+)\s+(\d{4})$', line)
-            
-            if date_match:
-                day = date_match.group(1)
-                month = date_match.group(2)
-                year_from_date = date_match.group(3) or year
-                current_header = f"{day}. {month} {year_from_date}"
-                continue
-            elif month_year_match:
-                month = month_year_match.group(1)
-                year_from_date = month_year_match.group(2)
-                current_header = f"{month} {year_from_date}"
+            # Kuupäeva formaadid (ühine parser, vt kuupaevad.py)
+            header = parse_header(line, default_year=year)
+            if header:
+                current_header = header['text']
                 continue
                 
             # Uus kirje algab [NR] märgistusega
             if line.startswith('[NR]'):
                 if current_record:
                     records.append(current_record)
-                nr_match = re.match(r'\[NR\](\d+)', line)
+                nr_match = NR_RE.match(line)
                 entry_number = nr_match.group(1) if nr_match else "unknown"
                 current_record = {
                     'number': entry_number,
@@ -1,11 +1,12 @@
 import json
 import os
 import glob
-import requests
 import time
 import logging
 from typing import Dict, Optional, Tuple
 
+from geonames_kohalik import DEFAULT_DB, GeoNamesIndex
+
 # Seadista logimine
 logging.basicConfig(
     level=logging.INFO,
@@ -82,9 +83,16 @@ HISTORICAL_REGION_MAPPING = {
 # See aitab vältida korduvaid API päringuid
 GEONAMES_CACHE: Dict[str, Optional[int]] = {}
 
+# Kohalik GeoNames andmebaas (geonames_kohalik.py import); kui puudub või nime
+# seal pole, kasutatakse API-t (v.a OFFLINE korral)
+LOCAL_INDEX: Optional[GeoNamesIndex] = None
+OFFLINE = False
+
 def search_geonames(region_name: str) -> Optional[int]:
     """
-    Otsi Geonames API-st regiooni nime järgi ja tagasta selle Geonames ID.
+    Otsi regiooni nime järgi Geonames ID-d (featureClass A). Esmalt
+    kohalikust andmebaasist (LOCAL_INDEX) ilma ootamiseta; kui seal pole,
+    API-st (OFFLINE korral mitte).
     
     Args:
         region_name: Regiooni nimi, mida otsida
@@ -95,10 +103,24 @@ def search_geonames(region_name: str) -> Optional[int]:
     if not region_name:
         return None
         
-    # Kontrolli, kas tulemus on juba vahemälus
-    if region_name in GEONAMES_CACHE:
+    # Kontrolli, kas tulemus on juba vahemälus (API-st leidmata nime proovitakse kohalikust uuesti)
+    cached = region_name in GEONAMES_CACHE
+    if cached and (GEONAMES_CACHE[region_name] is not None or LOCAL_INDEX is None):
         return GEONAMES_CACHE[region_name]
     
+    if LOCAL_INDEX is not None:
+        geonames_id = LOCAL_INDEX.geonames_id(region_name, feature_class="A")
+        if geonames_id:
+            GEONAMES_CACHE[region_name] = geonames_id
+            logging.info(f"Leitud Geonames ID {region_name} jaoks: {geonames_id}")
+            return geonames_id
+    
+    # Vahemälus olev None: API-st on juba otsitud. Võrguta tulemust ei salvestata,
+    # et hilisem käivitus API-ga seda nime otsiks.
+    if OFFLINE or cached:
+        logging.warning(f"Ei leitud Geonames ID piirkonnale: {region_name}")
+        return None
+    
     # Koosta API päring
     params = {
         "q": region_name,
@@ -108,6 +130,8 @@ def search_geonames(region_name: str) -> Optional[int]:
     }
     
     try:
+        # Ainult API päringute jaoks; kohalik andmebaas ei vaja
+        import requests
         # Lisa väike viivitus, et vältida liiga sagedasi päringuid
         time.sleep(1)
         response = requests.get(GEONAMES_API_URL, params=params)
@@ -247,6 +271,10 @@ def main():
     parser.add_argument('--apply', action='store_true', help='Rakenda muudatused (vaikimisi ainult näitab)')
     parser.add_argument('--max-files', type=int, help='Maksimaalne töödeldavate failide arv')
     parser.add_argument('--username', help='Geonames API kasutajanimi')
+    parser.add_argument('--geonames-db', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), DEFAULT_DB),
+                        help='Kohalik GeoNames andmebaas (geonames_kohalik.py import)')
+    parser.add_argument('--online', action='store_true', help='Kasuta kohaliku andmebaasi asemel Geonames API-t')
+    parser.add_argument('--offline', action='store_true', help='Ainult kohalik andmebaas, API-t ei kasutata')
     
     args = parser.parse_args()
     
@@ -254,6 +282,16 @@ def main():
         global GEONAMES_USERNAME
         GEONAMES_USERNAME = args.username
     
+    global LOCAL_INDEX, OFFLINE
+    OFFLINE = args.offline
+    if not args.online and os.path.exists(args.geonames_db):
+        LOCAL_INDEX = GeoNamesIndex(args.geonames_db)
+        logging.info(f"Kasutan kohalikku GeoNames andmebaasi: {args.geonames_db}")
+    elif args.offline:
+        logging.error(f"Kohalikku GeoNames andmebaasi ei leitud ({args.geonames_db}); --offline korral ei leita midagi")
+    elif not args.online:
+        logging.warning(f"Kohalikku GeoNames andmebaasi ei leitud ({args.geonames_db}), kasutan API-t")
+    
     # Laadi eelnevalt salvestatud vahemälu
     load_geonames_cache()
     
@@ -0,0 +1,374 @@
+"""
+GeoNames nimede otsing kohalikust SQLite andmebaasist (ilma API-ta).
+
+Andmebaas koostatakse GeoNames dump failidest
+(https://download.geonames.org/export/dump/):
+
+- allCountries.zip või riikide kaupa (DE.zip, SE.zip, ...): kohad
+- admin1CodesASCII.txt, admin2Codes.txt: haldusüksuste koodid ja nimed
+- alternateNamesV2.zip (või alternateNames.zip): teisendnimed, sh
+  ajaloolised (Reval, Dorpat) ja lühendid
+
+Vaikimisi imporditakse ainult featureClass A (haldusüksused), sest
+geonames-updater.py otsib ainult neid; --feature-classes all võtab kõik.
+Kõik nimed (põhinimi, ASCII nimi, teisendnimed, koodifailide nimed) on
+tabelis names koos võrdlusvõtmega (väiketähed, diakriitikuta) ja FTS5
+indeksiga. Otsing proovib esmalt täpset võtit (B-puu indeks), siis FTS5
+sõnaotsingut; tulemused on järjestatud rahvaarvu järgi nagu API-s.
+
+Import kirjutab ajutisse faili ja nimetab selle lõpuks ümber, nii et
+katkestatud import vana andmebaasi ei riku.
+
+    python geonames_kohalik.py import --db geonames.sqlite --places allCountries.zip \\
+        --admin1 admin1CodesASCII.txt --admin2 admin2Codes.txt --alternate-names alternateNamesV2.zip
+    python geonames_kohalik.py search --db geonames.sqlite Bavaria "Upper Palatinate" --max-rows 3
+"""
+import argparse
+import io
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+import zipfile
+
+DEFAULT_DB = "geonames.sqlite"
+
+SCHEMA = """
+CREATE TABLE geonames (
+    geonameid INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    feature_class TEXT,
+    feature_code TEXT,
+    country_code TEXT,
+    admin1_code TEXT,
+    admin2_code TEXT,
+    population INTEGER,
+    latitude REAL,
+    longitude REAL
+);
+CREATE TABLE admin_codes (
+    code TEXT PRIMARY KEY,
+    name TEXT,
+    asciiname TEXT,
+    geonameid INTEGER
+);
+CREATE TABLE names (
+    geonameid INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    isolanguage TEXT
+);
+CREATE TABLE meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+INDEXES = """
+CREATE INDEX names_key ON names (key, geonameid);
+CREATE INDEX geonames_feature_class ON geonames (feature_class);
+"""
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE names_fts USING fts5(
+    name, content='names', content_rowid='rowid', tokenize='unicode61 remove_diacritics 2'
+);
+INSERT INTO names_fts (names_fts) VALUES ('rebuild');
+"""
+
+# alternateNames "keeled", mis ei ole nimed (lingid, postiindeksid, lennujaamade koodid, ...)
+NON_NAME_LANGUAGES = {"link", "post", "iata", "icao", "faac", "tcid", "unlc", "wkdt"}
+
+# Failid zip arhiivis, mis ei ole dump ise
+ZIP_EXTRA_FILES = {"readme.txt", "iso-languagecodes.txt"}
+
+BATCH_SIZE = 50000
+
+WORD_RE = re.compile(r'\w+')
+
+RESULT_COLUMNS = ("geonameid", "name", "feature_class", "feature_code", "country_code",
+                  "admin1_code", "admin2_code", "population", "latitude", "longitude")
+
+
+def name_key(name):
+    """Võrdlusvõti: diakriitikuta, väiketähtedega, tühikud ühtlustatud (Häme -> hame)."""
+    decomposed = unicodedata.normalize('NFKD', name)
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def read_dump(path):
+    """Dump faili read (tekst või zip); kommentaariread (#) jäetakse vahele."""
+    if path.endswith('.zip'):
+        with zipfile.ZipFile(path) as archive:
+            members = archive.namelist()
+            member = os.path.splitext(os.path.basename(path))[0] + ".txt"
+            if member not in members:
+                member = next(name for name in members if name.endswith('.txt') and name not in ZIP_EXTRA_FILES)
+            with archive.open(member) as raw:
+                yield from _dump_lines(io.TextIOWrapper(raw, encoding='utf-8'))
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from _dump_lines(f)
+
+
+def _dump_lines(lines):
+    for line in lines:
+        if line.startswith('#') or not line.strip():
+            continue
+        yield line.rstrip('\n').split('\t')
+
+
+def _int(value):
+    return int(value) if value else 0
+
+
+def _float(value):
+    return float(value) if value else None
+
+
+def _batches(rows, size=BATCH_SIZE):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _name_rows(geonameid, names, source, isolanguage=None):
+    """names tabeli read; sama võtmega nimi ühe koha juures ainult üks kord."""
+    seen = set()
+    for name in names:
+        name = name.strip()
+        key = name_key(name) if name else ""
+        if key and key not in seen:
+            seen.add(key)
+            yield (geonameid, name, key, source, isolanguage)
+
+
+def _import_places(connection, paths, feature_classes, with_alternate_column):
+    """
+    Kohad (allCountries formaat); tagastab imporditud geonameid-de hulga.
+    feature_classes on hulk või None (kõik, ka klassita read).
+    """
+    imported = set()
+    for path in paths:
+        print(f"Loen kohti: {path}")
+        for batch in _batches(read_dump(path)):
+            places = []
+            names = []
+            for row in batch:
+                if len(row) < 15 or (feature_classes is not None and row[6] not in feature_classes):
+                    continue
+                geonameid = int(row[0])
+                imported.add(geonameid)
+                places.append((geonameid, row[1], row[6], row[7], row[8], row[10], row[11],
+                               _int(row[14]), _float(row[4]), _float(row[5])))
+                names.extend(_name_rows(geonameid, [row[1], row[2]], "name"))
+                if with_alternate_column and row[3]:
+                    names.extend(_name_rows(geonameid, row[3].split(','), "alternate"))
+            connection.executemany("INSERT OR REPLACE INTO geonames VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", places)
+            connection.executemany("INSERT INTO names VALUES (?, ?, ?, ?, ?)", names)
+    return imported
+
+
+def _import_admin_codes(connection, path, geonameids):
+    """admin1CodesASCII / admin2Codes: kood -> nimi; nimed lisatakse ka otsingusse."""
+    print(f"Loen haldusüksuste koode: {path}")
+    codes = []
+    names = []
+    for row in read_dump(path):
+        if len(row) < 4 or not row[3]:
+            continue
+        geonameid = int(row[3])
+        codes.append((row[0], row[1], row[2], geonameid))
+        if geonameids is None or geonameid in geonameids:
+            names.extend(_name_rows(geonameid, [row[1], row[2]], "admin"))
+    connection.executemany("INSERT OR REPLACE INTO admin_codes VALUES (?, ?, ?, ?)", codes)
+    connection.executemany("INSERT INTO names VALUES (?, ?, ?, ?, ?)", names)
+
+
+def _import_alternate_names(connection, path, geonameids):
+    """alternateNames(V2): alternateNameId, geonameid, isolanguage, nimi, ..."""
+    print(f"Loen teisendnimesid: {path}")
+    count = 0
+    for batch in _batches(read_dump(path)):
+        names = []
+        for row in batch:
+            if len(row) < 4 or row[2] in NON_NAME_LANGUAGES:
+                continue
+            geonameid = int(row[1])
+            if geonameids is not None and geonameid not in geonameids:
+                continue
+            names.extend(_name_rows(geonameid, [row[3]], "alternate", row[2] or None))
+        connection.executemany("INSERT INTO names VALUES (?, ?, ?, ?, ?)", names)
+        count += len(names)
+    return count
+
+
+def import_dumps(db_path, places, admin1=None, admin2=None, alternate_names=None, feature_classes="A"):
+    """
+    Koostab andmebaasi dump failidest (vt mooduli kirjeldus).
+
+    Args:
+        places: allCountries formaadis failid (allCountries.zip, DE.zip, ...).
+        feature_classes: Imporditavad featureClass-id (nt "A", "AP");
+            tühi/None = kõik.
+
+    Returns:
+        Sõnastik tabelite ridade arvuga.
+    """
+    start = time.perf_counter()
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(tmp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        # Teisendnimede fail sisaldab kõiki allCountries alternatenames veeru nimesid (ja keelt)
+        # Hulk, mitte sõne: '' in "A" oleks tõene ja klassita kohad tuleksid kaasa
+        classes = set(feature_classes) if feature_classes else None
+        imported = _import_places(connection, places, classes, with_alternate_column=alternate_names is None)
+        # Kõigi klasside korral ei ole filtrit vaja (ja hulk oleks suur)
+        geonameids = imported if feature_classes else None
+        for path in (admin1, admin2):
+            if path:
+                _import_admin_codes(connection, path, geonameids)
+        if alternate_names:
+            _import_alternate_names(connection, alternate_names, geonameids)
+        print("Koostan indekseid...")
+        connection.executescript(INDEXES)
+        connection.executescript(FTS_SCHEMA)
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ("created", time.strftime("%Y-%m-%dT%H:%M:%S")),
+            ("feature_classes", feature_classes or "all"),
+            ("sources", ", ".join(os.path.basename(path) for path in [*places, admin1, admin2, alternate_names] if path)),
+        ])
+        connection.commit()
+        counts = {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("geonames", "admin_codes", "names")}
+    finally:
+        connection.close()
+    os.replace(tmp_path, db_path)
+    print(f"Andmebaas {db_path}: {counts['geonames']} kohta, {counts['names']} nime, "
+          f"{counts['admin_codes']} haldusüksuse koodi ({time.perf_counter() - start:.1f} s)")
+    return counts
+
+
+class GeoNamesIndex:
+    """
+    Kohalik GeoNames otsing.
+
+    search(query, feature_class="A", max_rows=1) vastab API searchJSON
+    päringule q=...&featureClass=...: esmalt täpne nimi (ükskõik milline
+    nimekuju), siis kõik päringu sõnad sisaldav nimi; mõlemal juhul
+    suurema rahvaarvuga enne.
+    """
+
+    def __init__(self, path=DEFAULT_DB):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"GeoNames andmebaasi ei leitud: {path} (vt python geonames_kohalik.py import)")
+        self.path = path
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+
+    def search(self, query, feature_class="A", max_rows=1):
+        """Kohad sõnastikena (RESULT_COLUMNS + admin1_name), parim esimesena."""
+        key = name_key(query or "")
+        if not key:
+            return []
+        rows = self._exact(key, feature_class, max_rows)
+        if not rows:
+            rows = self._full_text(query, feature_class, max_rows)
+        return [self._result(row) for row in rows]
+
+    def geonames_id(self, query, feature_class="A"):
+        """Parima vaste geonameid või None."""
+        results = self.search(query, feature_class, max_rows=1)
+        return results[0]['geonameid'] if results else None
+
+    def _select(self, source, where, params, feature_class, order, limit):
+        if feature_class:
+            where += " AND g.feature_class = ?"
+            params = (*params, feature_class)
+        return self.connection.execute(
+            f"SELECT DISTINCT {', '.join('g.' + column for column in RESULT_COLUMNS)}, a.name "
+            f"FROM {source} JOIN geonames g ON g.geonameid = n.geonameid "
+            "LEFT JOIN admin_codes a ON a.code = g.country_code || '.' || g.admin1_code "
+            f"WHERE {where} ORDER BY {order} LIMIT ?",
+            (*params, limit),
+        ).fetchall()
+
+    def _exact(self, key, feature_class, max_rows):
+        return self._select("names n", "n.key = ?", (key,), feature_class,
+                            "g.population DESC, g.geonameid", max_rows)
+
+    def _full_text(self, query, feature_class, max_rows):
+        words = WORD_RE.findall(query)
+        if not words:
+            return []
+        match = " ".join(f'"{word}"' for word in words)
+        try:
+            # Sama koht võib sobida mitme nimega; DISTINCT ridu võib tulla vähem kui LIMIT
+            rows = self._select("names_fts f JOIN names n ON n.rowid = f.rowid", "names_fts MATCH ?", (match,),
+                                feature_class, "g.population DESC, g.geonameid", max_rows * 10)
+        except sqlite3.OperationalError:
+            return []
+        return rows[:max_rows]
+
+    @staticmethod
+    def _result(row):
+        result = dict(zip(RESULT_COLUMNS, row))
+        result['admin1_name'] = row[len(RESULT_COLUMNS)]
+        return result
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kohalik GeoNames andmebaas ja otsing')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='Koosta andmebaas dump failidest')
+    import_parser.add_argument('--db', default=DEFAULT_DB, help='SQLite andmebaas')
+    import_parser.add_argument('--places', nargs='+', required=True, help='allCountries.zip või riikide failid (DE.zip, ...)')
+    import_parser.add_argument('--admin1', help='admin1CodesASCII.txt')
+    import_parser.add_argument('--admin2', help='admin2Codes.txt')
+    import_parser.add_argument('--alternate-names', help='alternateNamesV2.zip / alternateNames.zip')
+    import_parser.add_argument('--feature-classes', default="A", help='Imporditavad featureClass-id (nt A, AP) või all')
+
+    search_parser = subparsers.add_parser('search', help='Otsi nimede järgi')
+    search_parser.add_argument('names', nargs='+', help='Otsitavad nimed')
+    search_parser.add_argument('--db', default=DEFAULT_DB, help='SQLite andmebaas')
+    search_parser.add_argument('--feature-class', default="A", help='featureClass (tühi = kõik)')
+    search_parser.add_argument('--max-rows', type=int, default=1, help='Tulemusi nime kohta')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        feature_classes = "" if args.feature_classes == "all" else args.feature_classes
+        import_dumps(args.db, args.places, args.admin1, args.admin2, args.alternate_names, feature_classes)
+        return
+
+    index = GeoNamesIndex(args.db)
+    for name in args.names:
+        start = time.perf_counter()
+        results = index.search(name, args.feature_class or None, args.max_rows)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {len(results)} vastet ({elapsed * 1e6:.0f} µs)")
+        for result in results:
+            print(f"  {result['geonameid']}  {result['name']} ({result['feature_code']}, {result['country_code']}"
+                  f"{', ' + result['admin1_name'] if result['admin1_name'] else ''}), rahvaarv {result['population']}")
+    index.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+API päringute kiiruspiirang asyncio jaoks.
+
+- TokenBucket: päringute ja tokenite piirang minutis (nt Gemini RPM/TPM kvoot).
+- AdaptiveConcurrency: samaaegsete päringute arv, mis kasvab, kui latentsus on
+  hea, ja poolitub 429/kvoodivea korral (AIMD).
+- backoff_delay: eksponentsiaalne ooteaeg juhusliku nihkega (full jitter).
+"""
+import asyncio
+import random
+import time
+
+
+class RateLimitError(Exception):
+    """Teenus teatas kvoodi või kiiruspiirangu ületamisest (HTTP 429)."""
+
+
+def is_rate_limit_error(error):
+    """Kas viga tähendab kiiruspiirangut/kvooti (429, ResourceExhausted, quota)."""
+    if isinstance(error, RateLimitError):
+        return True
+    name = type(error).__name__
+    message = str(error).lower()
+    return (
+        name in ('ResourceExhausted', 'TooManyRequests')
+        or '429' in message
+        or 'quota' in message
+        or 'rate limit' in message
+        or 'resource exhausted' in message
+    )
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """Ooteaeg sekundites katse numbri (0, 1, 2, ...) järgi: juhuslik [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class TokenBucket:
+    """
+    Kahe ämbriga piirang: päringud minutis ja tokenid minutis.
+
+    acquire(tokens) ootab, kuni mõlemas ämbris on piisavalt ruumi.
+    Kui tokens_per_minute on None, piiratakse ainult päringute arvu.
+    """
+
+    def __init__(self, requests_per_minute, tokens_per_minute=None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute) if tokens_per_minute else None
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._updated
+        self._updated = now
+        self._requests = min(self.requests_per_minute, self._requests + elapsed * self.requests_per_minute / 60)
+        if self._tokens is not None:
+            self._tokens = min(self.tokens_per_minute, self._tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _wait_time(self, tokens):
+        wait = 0.0
+        if self._requests < 1:
+            wait = (1 - self._requests) * 60 / self.requests_per_minute
+        if self._tokens is not None:
+            # Ühest minutist suurem päring lastakse läbi, kui ämber on täis
+            tokens = min(tokens, self.tokens_per_minute)
+            if self._tokens < tokens:
+                wait = max(wait, (tokens - self._tokens) * 60 / self.tokens_per_minute)
+        return wait
+
+    async def acquire(self, tokens=0):
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    self._requests -= 1
+                    if self._tokens is not None:
+                        self._tokens -= min(tokens, self.tokens_per_minute)
+                    return
+                await asyncio.sleep(wait)
+
+
+class AdaptiveConcurrency:
+    """
+    Samaaegsete päringute piir, mis kohandub (AIMD).
+
+    - Edukas päring latentsusega alla target_latency: piir kasvab ühe võrra
+      iga `limit` eduka päringu järel (additive increase).
+    - Kiiruspiirangu viga: piir poolitub (multiplicative decrease).
+    """
+
+    def __init__(self, initial=2, min_limit=1, max_limit=16, target_latency=30.0):
+        self.limit = initial
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.target_latency = target_latency
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+        self.history = [(time.monotonic(), initial)]
+
+    async def acquire(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self):
+        async with self._condition:
+            self.in_flight -= 1
+            self._condition.notify_all()
+
+    async def on_success(self, latency):
+        async with self._condition:
+            if latency > self.target_latency:
+                self._successes = 0
+                return
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self._set_limit(self.limit + 1)
+                self._successes = 0
+                self._condition.notify_all()
+
+    async def on_overload(self):
+        async with self._condition:
+            self._set_limit(max(self.min_limit, self.limit // 2))
+            self._successes = 0
+
+    def _set_limit(self, limit):
+        if limit != self.limit:
+            self.limit = limit
+            self.history.append((time.monotonic(), limit))
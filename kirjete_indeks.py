@@ -0,0 +1,243 @@
+"""
+Kirjete baidinihete indeks koondfaili jaoks.
+
+Indeks (SQLite fail teksti kõrval) seob kirje numbri tema baidinihke, pikkuse,
+kuupäevapäise, aasta ja kuuga. Lugeja avab tekstifaili mmap-iga ning annab
+kirje või kirjete vahemiku ühe lõikega, ilma faili uuesti jagamata.
+
+    python kirjete_indeks.py build data/tering_koondfail.txt_marked.txt
+    python kirjete_indeks.py get data/tering_koondfail.txt_marked.txt 1234
+    python kirjete_indeks.py range data/tering_koondfail.txt_marked.txt 100 105
+"""
+import argparse
+import mmap
+import os
+import re
+import sqlite3
+
+from kuupaevad import parse_header
+
+ENTRY_RE = re.compile(rb'\[NR\](\d+)')
+YEAR_RE = re.compile(rb'^\s*(\d{4})\s*$')
+
+# Kuupäevapäis on lühike rida; pikemaid ridu ei dekodeerita
+MAX_HEADER_LINE = 48
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    entry_number INTEGER PRIMARY KEY,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    header TEXT,
+    year INTEGER,
+    month INTEGER
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+
+def index_path(text_file):
+    """Indeksi vaikimisi asukoht: <tekstifail>.idx.sqlite"""
+    return text_file + '.idx.sqlite'
+
+
+def scan_records(data):
+    """
+    Käib mmap-i ridade kaupa läbi ja leiab kirjed.
+
+    Returns:
+        List sõnastikest võtmetega entry_number, offset, length, header, year, month.
+    """
+    records = []
+    current = None
+    current_year = None
+    current_header = None
+    position = 0
+    size = len(data)
+
+    def close(end):
+        if current is not None:
+            current['length'] = end - current['offset']
+            records.append(current)
+
+    while position < size:
+        newline = data.find(b'\n', position)
+        line_end = size if newline == -1 else newline
+        line = data[position:line_end]
+
+        if line.startswith(b'[NR]'):
+            close(position)
+            match = ENTRY_RE.match(line)
+            current = {
+                'entry_number': int(match.group(1)) if match else None,
+                'offset': position,
+                'length': 0,
+                'header': current_header['text'] if current_header else None,
+                'year': int(current_header['year']) if current_header and current_header['year'] else None,
+                'month': current_header['month'] if current_header else None,
+            }
+        elif len(line) <= MAX_HEADER_LINE:
+            year_match = YEAR_RE.match(line)
+            if year_match:
+                current_year = year_match.group(1).decode()
+            else:
+                header = parse_header(line.decode('utf-8', errors='replace').strip(), default_year=current_year)
+                if header:
+                    # Kuupäevapäis lõpetab eelmise kirje
+                    close(position)
+                    current = None
+                    current_header = header
+                    if header['year']:
+                        current_year = header['year']
+
+        position = line_end + 1
+
+    close(size)
+    return [r for r in records if r['entry_number'] is not None]
+
+
+def build_index(text_file, index_file=None):
+    """Ehitab (või ehitab uuesti) kirjete indeksi. Tagastab indekseeritud kirjete arvu."""
+    index_file = index_file or index_path(text_file)
+    with open(text_file, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            records = scan_records(data)
+
+    stat = os.stat(text_file)
+    if os.path.exists(index_file):
+        os.remove(index_file)
+    connection = sqlite3.connect(index_file)
+    try:
+        connection.executescript(SCHEMA)
+        # Korduvad numbrid: jäetakse alles esimene esinemine
+        cursor = connection.executemany(
+            "INSERT OR IGNORE INTO records VALUES (:entry_number, :offset, :length, :header, :year, :month)",
+            records,
+        )
+        connection.executemany("INSERT INTO meta VALUES (?, ?)", [
+            ('source', os.path.abspath(text_file)),
+            ('size', str(stat.st_size)),
+            ('mtime', str(stat.st_mtime)),
+        ])
+        connection.commit()
+        indexed = connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+    finally:
+        connection.close()
+
+    duplicates = len(records) - indexed
+    print(f"Indekseeritud {indexed} kirjet: {index_file}" + (f" (korduvaid numbreid: {duplicates})" if duplicates else ""))
+    return indexed
+
+
+class RecordIndex:
+    """
+    Kirjete lugeja: SQLite indeks + mmap tekstifailist.
+
+    Kasutamine:
+        with RecordIndex("tering_koondfail.txt_marked.txt") as index:
+            record = index.get(1234)
+            print(record['text'])
+    """
+
+    def __init__(self, text_file, index_file=None):
+        self.text_file = text_file
+        self.index_file = index_file or index_path(text_file)
+        if not os.path.exists(self.index_file) or self.is_stale():
+            build_index(text_file, self.index_file)
+        self.connection = sqlite3.connect(self.index_file)
+        self.connection.row_factory = sqlite3.Row
+        self._file = open(text_file, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def is_stale(self):
+        """Kas tekstifail on pärast indeksi ehitamist muutunud."""
+        connection = sqlite3.connect(self.index_file)
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta").fetchall())
+        except sqlite3.DatabaseError:
+            return True
+        finally:
+            connection.close()
+        stat = os.stat(self.text_file)
+        return meta.get('size') != str(stat.st_size) or meta.get('mtime') != str(stat.st_mtime)
+
+    def _record(self, row):
+        raw = self._data[row['offset']:row['offset'] + row['length']]
+        return {
+            'number': row['entry_number'],
+            'header': row['header'],
+            'year': row['year'],
+            'month': row['month'],
+            'text': raw.decode('utf-8').strip(),
+        }
+
+    def get(self, entry_number):
+        """Tagastab ühe kirje või None."""
+        row = self.connection.execute(
+            "SELECT * FROM records WHERE entry_number = ?", (entry_number,)
+        ).fetchone()
+        return self._record(row) if row else None
+
+    def range(self, first, last):
+        """Tagastab kirjed numbritega first..last (kaasa arvatud)."""
+        rows = self.connection.execute(
+            "SELECT * FROM records WHERE entry_number BETWEEN ? AND ? ORDER BY entry_number", (first, last)
+        ).fetchall()
+        return [self._record(row) for row in rows]
+
+    def record_text(self, entry_number):
+        """Kirje tekst samal kujul nagu NR*.txt failides (kuupäevarida + kirje)."""
+        record = self.get(entry_number)
+        if record is None:
+            return None
+        return f"Immatrikuleerimise kuupäev: {record['header']}\n\n{record['text']}\n"
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kirjete baidinihete indeks')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help='Ehita indeks')
+    build_parser.add_argument('text_file')
+
+    get_parser = subparsers.add_parser('get', help='Näita ühte kirjet')
+    get_parser.add_argument('text_file')
+    get_parser.add_argument('number', type=int)
+
+    range_parser = subparsers.add_parser('range', help='Näita kirjete vahemikku')
+    range_parser.add_argument('text_file')
+    range_parser.add_argument('first', type=int)
+    range_parser.add_argument('last', type=int)
+
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_index(args.text_file)
+    elif args.command == 'get':
+        with RecordIndex(args.text_file) as index:
+            text = index.record_text(args.number)
+            print(text if text else f"Kirjet {args.number} ei leitud.")
+    else:
+        with RecordIndex(args.text_file) as index:
+            for record in index.range(args.first, args.last):
+                print(f"Immatrikuleerimise kuupäev: {record['header']}\n\n{record['text']}\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Kirjete alguste tuvastamine numbrijärjestuse järgi.
+
+Kirje algab rea alguses numbri, punkti, tühiku ja suurtähega ("214. Baaz").
+Sama kujuga on ka kirjete sees olevad kuupäevaread ("14. Mai 1632"), seega
+loetakse vaste kirje alguseks ainult järjestuse põhjal:
+
+- oodatud numbrit otsitakse järgmiste LOOKAHEAD vaste seast; vahele jäänud
+  vasted on järjekorravälised;
+- kui oodatud numbrit ei leidu, võetakse esimene suurem number, millele
+  järgneb lähedal (CONFIRM vaste piires) ka number + 1; vahelejäänud
+  numbrid märgitakse puuduvaks. Nii taastub järjestus ka suurema augu
+  (nt kadunud lehekülje) järel, üksik kuupäevarida aga järjestust ei nihuta;
+- kui kumbagi ei leidu, märgitakse oodatud number puuduvaks ja oodatakse
+  järgmist (või jäetakse vaste vahele, kui aknas pole suuremaid numbreid).
+
+Pärast max_number-it leitud vasteid ei vaadata.
+
+Kasutavad numbrite-regex.py ([NR] märgendid) ja
+Kirjete_jagamine_sadade_kaupa.py (plokkideks jagamine).
+"""
+import bisect
+import re
+
+# Kirje algus rea alguses: valikuline [NR] märgend, number, punkt, tühik ja suurtäht
+ENTRY_RE = re.compile(r'^(?:\[NR\])?(\d+)\. (?=[A-ZÄÖÜÅ])', re.MULTILINE)
+# Sama baitides (mmap); UTF-8 Ä, Ö, Ü, Å algavad baidiga 0xC3
+ENTRY_RE_BYTES = re.compile(rb'^(?:\[NR\])?(\d+)\. (?=[A-Z\xc3])', re.MULTILINE)
+
+# Mitme järgmise vaste seast oodatud numbrit otsitakse
+LOOKAHEAD = 50
+# Mitme vaste piires peab hüppe järel tulema järgmine number
+CONFIRM = 3
+
+
+def find_candidates(data):
+    """Kõik kirje alguse kujuga vasted: list kolmikutest (number, positsioon, rida)."""
+    is_bytes = not isinstance(data, str)
+    pattern = ENTRY_RE_BYTES if is_bytes else ENTRY_RE
+    newline = b'\n' if is_bytes else '\n'
+    candidates = []
+    line_no = 1
+    last_pos = 0
+    for match in pattern.finditer(data):
+        position = match.start()
+        # Reanumber arvutatakse järk-järgult, et mitte teksti uuesti lugeda
+        line_no += data[last_pos:position].count(newline)
+        last_pos = position
+        candidates.append((int(match.group(1)), position, line_no))
+    return candidates
+
+
+def sequence_entries(candidates, max_number=None, lookahead=LOOKAHEAD, confirm=CONFIRM):
+    """
+    Valib vastete seast kirjete algused (vt mooduli kirjeldus).
+
+    Returns:
+        (entries, gaps): entries on list (number, positsioon, rida); gaps on
+        list masinloetavatest probleemidest ("missing" koos puuduvate
+        numbritega, "out_of_order" koos oodatud numbriga).
+    """
+    # number -> vastete indeksid tekstis järjest
+    by_number = {}
+    for index, (number, _, _) in enumerate(candidates):
+        by_number.setdefault(number, []).append(index)
+
+    def find(number, start, end):
+        indices = by_number.get(number, ())
+        k = bisect.bisect_left(indices, start)
+        return indices[k] if k < len(indices) and indices[k] < end else None
+
+    entries = []
+    gaps = []
+    missing = []
+    expected = 1
+    i = 0
+    while i < len(candidates) and (max_number is None or expected <= max_number):
+        end = min(len(candidates), i + lookahead)
+        j = find(expected, i, end)
+        if j is None:
+            # Hüpe: esimene suurem number, mille järel tuleb ka järgmine
+            for k in range(i, end):
+                number = candidates[k][0]
+                if number > expected and (max_number is None or number <= max_number) \
+                        and find(number + 1, k + 1, k + 1 + confirm) is not None:
+                    j = k
+                    break
+        if j is None:
+            if any(candidates[k][0] > expected for k in range(i, end)):
+                missing.append(expected)
+                expected += 1
+            else:
+                # Aknas ainult väiksemad numbrid (kirje sees olevad read)
+                number, _, line = candidates[i]
+                gaps.append({"type": "out_of_order", "number": number, "expected": expected, "line": line})
+                i += 1
+            continue
+
+        for k in range(i, j):
+            number, _, line = candidates[k]
+            gaps.append({"type": "out_of_order", "number": number, "expected": expected, "line": line})
+        number, position, line = candidates[j]
+        missing.extend(range(expected, number))
+        if missing:
+            gaps.append({"type": "missing", "numbers": missing, "before_number": number, "line": line})
+            missing = []
+        entries.append((number, position, line))
+        expected = number + 1
+        i = j + 1
+
+    if max_number is not None:
+        missing.extend(range(expected, max_number + 1))
+    if missing:
+        gaps.append({"type": "missing", "numbers": missing, "before_number": None, "line": None})
+    return entries, gaps
+
+
+def scan_entries(data, max_number=None):
+    """Kirjete algused tekstist või baitidest (str, bytes, mmap): (entries, gaps)."""
+    return sequence_entries(find_candidates(data), max_number=max_number)
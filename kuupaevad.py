@@ -0,0 +1,201 @@
+"""
+Immatrikuleerimise kuupäevapäiste ühine parser.
+
+Päiseread on kujul "20. April 1632", "21. April", "Dep. 5. Mai", "Juni 1632"
+või OCR-ist katkisena "24. A pril". Mustrid kompileeritakse mooduli laadimisel
+üks kord ja kuunimede teisendus on memoiseeritud. Kasutavad kuude_kaupa.py,
+eralid-kirjeteks.py, segmenteerimine.py ja Kirjete_grupeerimine_kuupäevade_järgi.py.
+
+    python kuupaevad.py --benchmark   # võrdlus vana regex + dict lahendusega
+
+Kuldtestid (few_shot_examples.json + servajuhud): tests/test_kuupaevad.py.
+"""
+import argparse
+import re
+import timeit
+from functools import lru_cache
+
+_LETTERS = r'A-Za-zÄÖÜÕÅäöüõå'
+
+# Üks muster kõigi päisekujude jaoks. Kuu nimi võib olla OCR-i poolt
+# kaheks lõigatud ("A pril"), seepärast lubatakse üks sisemine tühik.
+_HEADER_PATTERN = (
+    r'^[ \t]*(?P<dep>Dep\.[ \t]*)?'
+    r'(?:(?P<day>\d{1,2})\.[ \t]*)?'
+    rf'(?P<month>[{_LETTERS}]+(?: [{_LETTERS}]+)?)\.?'
+    r'(?:[ \t]+(?P<year>\d{4}))?[ \t]*$'
+)
+
+# Üksiku rea jaoks
+HEADER_RE = re.compile(_HEADER_PATTERN)
+# Terve teksti läbimiseks finditer-iga
+HEADER_LINE_RE = re.compile(_HEADER_PATTERN, re.MULTILINE)
+# Rida, milles on ainult aastaarv (nt "1632")
+YEAR_LINE_RE = re.compile(r'^\s*(\d{4})\s*$', re.MULTILINE)
+
+# Kuunimed saksa, ladina ja eesti keeles ning levinud lühendid.
+# Võtmed on juba normaliseeritud kujul (vt _normalize).
+_MONTH_NAMES = {
+    1: ["januar", "jänner", "jänn", "jän", "jan", "januarius", "januarii", "jaanuar"],
+    2: ["februar", "feber", "febr", "feb", "februarius", "februarii", "veebruar", "veebr"],
+    3: ["märz", "maerz", "marz", "march", "mar", "mart", "martius", "martii", "märts"],
+    4: ["april", "apr", "aprilis", "aprill"],
+    5: ["mai", "may", "maius", "maii", "maji"],
+    6: ["juni", "jun", "junius", "junii", "juuni"],
+    7: ["juli", "jul", "julius", "julii", "juuli"],
+    8: ["august", "aug", "augustus", "augusti"],
+    9: ["september", "sept", "sep", "septembris", "septbr"],
+    10: ["oktober", "october", "okt", "oct", "octobris", "oktoober", "octbr"],
+    11: ["november", "nov", "novembris", "novbr"],
+    12: ["dezember", "december", "dez", "dec", "decembris", "desember", "des", "detsember", "dets", "decbr"],
+}
+
+
+def _normalize(name):
+    """Väiketähed, tühikud ja punktid eemaldatud, ladina i/j ja u/v ühtlustatud."""
+    name = re.sub(r'[\s.]', '', name.lower())
+    return name.replace('j', 'i').replace('v', 'u')
+
+
+_MONTHS = {_normalize(name): number for number, names in _MONTH_NAMES.items() for name in names}
+
+
+@lru_cache(maxsize=None)
+def month_to_number(month_name):
+    """
+    Teisendab kuu nime numbriks (1-12) või tagastab None.
+
+    Lisaks täpsele vastele tunneb ära OCR-ist katkised kujud ("A pril") ja
+    lühendid, mis on mõne kuunime ühemõttelised algused ("Septemb", "Decemb").
+    """
+    key = _normalize(month_name)
+    if not key:
+        return None
+    number = _MONTHS.get(key)
+    if number is not None:
+        return number
+    if len(key) >= 3:
+        candidates = {n for name, n in _MONTHS.items() if name.startswith(key)}
+        if len(candidates) == 1:
+            return candidates.pop()
+    return None
+
+
+def parse_header(line, default_year=None):
+    """
+    Parsib kuupäevapäise rea.
+
+    Args:
+        line: Tekstirida.
+        default_year: Aasta, mida kasutada, kui real aastat pole.
+
+    Returns:
+        Sõnastik võtmetega day, month, month_name, year, deposited ja text
+        või None, kui rida ei ole kuupäevapäis. Päis peab sisaldama kas
+        päeva või aastat ja tuntud kuu nime.
+    """
+    match = HEADER_RE.match(line)
+    if not match:
+        return None
+    return _from_match(match, default_year)
+
+
+def _from_match(match, default_year=None):
+    day, year = match.group('day'), match.group('year')
+    if day is None and year is None:
+        return None
+    month_name = match.group('month').replace(' ', '')
+    month = month_to_number(month_name)
+    if month is None:
+        return None
+
+    year = year or default_year
+    if day is not None:
+        text = f"{day}. {month_name}"
+    else:
+        text = month_name
+    if year:
+        text += f" {year}"
+
+    return {
+        'day': int(day) if day is not None else None,
+        'month': month,
+        'month_name': month_name,
+        'year': str(year) if year else None,
+        'deposited': match.group('dep') is not None,
+        'text': text,
+    }
+
+
+def iter_headers(text, default_year=None):
+    """
+    Leiab tekstist kõik kuupäevapäised ühe finditer läbimisega.
+
+    Yields:
+        Paarid (match, parsed), kus parsed on parse_header tulemus.
+    """
+    for match in HEADER_LINE_RE.finditer(text):
+        parsed = _from_match(match, default_year)
+        if parsed is not None:
+            yield match, parsed
+
+
+def to_iso(parsed):
+    """Päis ISO kujul: "1632-04-20", "1632-06" või None, kui aasta puudub."""
+    if not parsed or not parsed['year']:
+        return None
+    if parsed['day'] is None:
+        return f"{parsed['year']}-{parsed['month']:02}"
+    return f"{parsed['year']}-{parsed['month']:02}-{parsed['day']:02}"
+
+
+# --- Mõõtmine ---
+
+# Päiseread ja mõned kirjeread, mis päisemustrile ei vasta
+BENCHMARK_LINES = [
+    "20. April 1632", "21. April", "24. A pril", "Dep. 5. Mai", "Dep.12. Juni 1640", "Juni 1632",
+    "3. Ian. 1640", "17. Septemb. 1650", "8. Martii 1660", "9. Octobris", "1. Detsember 1700",
+    "1632", "Stockholm 1648", "7. Zethraeus, Georgius",
+    "[NR]1. Baaz(ius), Benedictus", "Univ. Rostock (imm. 12. 1627)",
+]
+
+
+def _old_month_to_number(month_name):
+    # kuude_kaupa.py varasem lahendus: sõnastik ehitati igal kutsel uuesti
+    months = {
+        "januar": 1, "jan": 1, "jän": 1, "februar": 2, "feb": 2,
+        "märz": 3, "march": 3, "mar": 3, "april": 4, "apr": 4, "mai": 5,
+        "juni": 6, "jun": 6, "juli": 7, "jul": 7, "august": 8, "aug": 8,
+        "september": 9, "sep": 9, "oktober": 10, "oct": 10, "okt": 10,
+        "november": 11, "nov": 11, "dezember": 12, "dec": 12, "desember": 12, "des": 12
+    }
+    return months.get(month_name.lower(), None)
+
+
+def _old_parse(line):
+    date_match = re.match(r'^(?:Dep\.\s*)?\d{1,2}\.\s?(\w+)(?:\s*(\d{4}))?$', line)
+    month_year_match = re.match(r'^(?:Dep\.\s*)?(\w+)\s*(\d{4})$', line)
+    match = date_match or month_year_match
+    return _old_month_to_number(match.group(1)) if match else None
+
+
+def benchmark(number=20000):
+    """Mõõdab päiseridade parsimise kiirust vana ja uue lahendusega."""
+    lines = BENCHMARK_LINES
+    old = timeit.timeit(lambda: [_old_parse(line) for line in lines], number=number)
+    new = timeit.timeit(lambda: [parse_header(line) for line in lines], number=number)
+    per_line = number * len(lines)
+    print(f"Vana: {old / per_line * 1e6:.2f} µs/rida")
+    print(f"Uus:  {new / per_line * 1e6:.2f} µs/rida")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kuupäevapäiste parser')
+    parser.add_argument('--benchmark', action='store_true', help='Mõõda parsimise kiirust')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+
+if __name__ == "__main__":
+    main()
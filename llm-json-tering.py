@@ -1,14 +1,34 @@
 import google.generativeai as genai
+import argparse
+import asyncio
+import datetime
+import hashlib
 import os
 import json
 import glob
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
-def create_prompt(record_text, lyhendid_text, json_format_description, few_shot_examples):
-    """
-    Loob Gemini jaoks prompti, mis sisaldab kogu vajalikku infot.
-    """
-    prompt = f"""
+from eeltuvastus import PRE_EXTRACT_VERSION, merge_partial, pre_extract
+from kiiruspiirang import AdaptiveConcurrency, TokenBucket, backoff_delay, is_rate_limit_error
+from lyhendite_otsing import GLOSSARY_FILES, AbbreviationMatcher
+from manifest import atomic_write
+from moodikud import Tracer
+from naidete_valik import ExampleStore
+from skeemi_valideerimine import SchemaValidator, ValidationStats, format_errors
+from tokenid import estimate_tokens
+from vastuste_vahemalu import ResponseCache, cache_key
+
+MODEL_NAME = 'gemini-2.0-flash'
+
+# Prompti muutumatu osa: juhised, lühendid ja JSON formaat (+ näited, kui
+# saadetakse kõik). Koostatakse üks kord (ExtractionClient), kirjepõhine osa
+# lisatakse lõppu.
+PROMPT_PREFIX_TEMPLATE = """
     Oled abiline, kes teisendab ajaloolisi tekste struktureeritud JSON formaati.
     
     **Ülesanne:** Teisenda järgnev tekstikirje JSON formaati vastavalt allpool toodud kirjeldusele ja näidetele.
@@ -35,11 +55,15 @@ def create_prompt(record_text, lyhendid_text, json_format_description, few_shot_
     {json_format_description}
     ```
 
-    **Few-Shot õppe näited:**
+"""
+
+EXAMPLES_TEMPLATE = """    **Few-Shot õppe näited:**
     
     {few_shot_examples}
 
-    **Teisendatav tekstikirje:**
+"""
+
+RECORD_TEMPLATE = """    **Teisendatav tekstikirje:**
 
     ```
     {record_text}
@@ -47,60 +71,867 @@ def create_prompt(record_text, lyhendid_text, json_format_description, few_shot_
 
     **Väljund (ainult JSON formaadis):**
     """
-    return prompt
 
+# Eeltuvastatud kirje (eeltuvastus.pre_extract): mudelile ainult lahendamata
+# osa ja juba teadaolevad väljad, vastuses ainult puuduvad väljad
+PARTIAL_RECORD_TEMPLATE = """    **Teisendatav tekstikirje (osaliselt eeltuvastatud):**
 
-def process_text_file(file_path, api_key, lyhendid_text, json_format_description, few_shot_examples):
+    Need väljad on kirjest reeglitega juba kindlalt välja loetud:
+
+    ```json
+    {partial_json}
+    ```
+
+    Kirje lahendamata osa:
+
+    ```
+    {remainder}
+    ```
+
+    **Väljund (ainult JSON formaadis):**
+    JSON samas formaadis, kuid ilma ülal toodud väljadeta ja ilma väljata "raw_text"
+    ("entry_number" jäta alles).
+    """
+
+PARTIAL_ITEM_TEMPLATE = """    Eeltuvastatud väljad: {partial_json}
+{remainder}"""
+
+PARTIAL_BATCH_NOTE = """    Kirjete juures toodud "Eeltuvastatud väljad" on juba kindlad: jäta need väljad ja
+    "raw_text" objektidest välja ("entry_number" jäta alles).
+
+"""
+
+# Mitme kirje päring: kirjed eraldatud märgenditega, vastuseks JSON massiiv
+BATCH_RECORD_TEMPLATE = """    **Teisendatavad tekstikirjed ({count} tk):**
+
+    Iga kirje on märgendite "=== KIRJE n ===" ja "=== KIRJE n LÕPP ===" vahel.
+
+{records}
+
+    **Väljund (ainult JSON formaadis):**
+    JSON massiiv täpselt {count} objektiga, kirjetega samas järjekorras. Iga objekt
+    vastab ülaltoodud JSON formaadile ja selle "entry_number" on sama kirje number ([NR]).
+    """
+
+# Kirjepõhine lühendite loend (AbbreviationMatcher): eesliites on loendi asemel viide
+ABBREVIATIONS_NOTE = "Kirjes esinevate lühendite tähendused on toodud kirje juures."
+
+ABBREVIATIONS_TEMPLATE = """    **Kirjes esinevad lühendid (tering_lyhendid.txt, tering_nimed.txt):**
+    
+    {lyhendid_text}
+
+"""
+
+# Paranduspäring: ainult validaatori vead ja vigane JSON, mitte kogu prompt
+REPAIR_TEMPLATE = """
+    Allolev JSON ei vasta nõutud skeemile. Paranda ainult loetletud vead,
+    ülejäänud sisu jäta muutmata. Puuduv objekt või list lisa tühjana
+    (objekti väljad null, list []).
+
+    **Vead:**
+{errors}
+
+    **Vigane JSON:**
+
+    ```json
+    {json_output}
+    ```
+
+    **Väljund (ainult parandatud JSON):**
+    """
+
+BATCH_ITEM_TEMPLATE = """    === KIRJE {index} ===
+{record_text}
+    === KIRJE {index} LÕPP ==="""
+
+ENTRY_NUMBER_RE = re.compile(r'\[NR\]\s*(\d+)')
+
+# Ühe kirje JSON vastuse hinnanguline suurus tokenites (partii eelarve jaoks)
+OUTPUT_TOKENS_PER_RECORD = 1200
+
+
+def create_prompt(record_text, lyhendid_text, json_format_description, few_shot_examples, abbreviations=None):
+    """
+    Loob Gemini jaoks prompti, mis sisaldab kogu vajalikku infot.
+
+    abbreviations (lyhendite_otsing.AbbreviationMatcher) korral on kogu
+    lühendite loendi asemel ainult kirjes esinevad lühendid.
+    """
+    if abbreviations is not None:
+        lyhendid_text = abbreviations.glossary_for(record_text)
+    prefix = PROMPT_PREFIX_TEMPLATE.format(
+        lyhendid_text=lyhendid_text,
+        json_format_description=json_format_description,
+    )
+    examples = EXAMPLES_TEMPLATE.format(few_shot_examples=few_shot_examples)
+    return prefix + examples + RECORD_TEMPLATE.format(record_text=record_text)
+
+
+# --- Eesliite vahemälu: teenusepoolne (Gemini) või kohalik asendaja ---
+class LocalContextCache:
+    """
+    Kontekstivahemälu kohalik asendaja testimiseks ja võrguta tööks.
+
+    Käitub nagu teenusepoolne vahemälu: model_for(prefix, model) tagastab
+    mudeli, millele saadetakse ainult kirjepõhine osa; eesliide lisatakse
+    siin. Loendab, mitu korda eesliidet taaskasutati ja mitu märki see säästaks.
+    """
+
+    def __init__(self):
+        self.created = 0
+        self.hits = 0
+        self.reused_chars = 0
+        self._entries = {}
+
+    def model_for(self, prefix, model):
+        key = hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+        if key not in self._entries:
+            self.created += 1
+            self._entries[key] = _PrefixedModel(self, prefix, model)
+        return self._entries[key]
+
+    def summary(self):
+        return f"Kohalik kontekstivahemälu: loodud {self.created}, taaskasutatud {self.hits} korda ({self.reused_chars} märki)"
+
+
+class _PrefixedModel:
+    """LocalContextCache mudel: lisab eesliite iga päringu ette."""
+
+    def __init__(self, cache, prefix, model):
+        self.cache = cache
+        self.prefix = prefix
+        self.model = model
+
+    def generate_content(self, contents):
+        self.cache.hits += 1
+        self.cache.reused_chars += len(self.prefix)
+        return self.model.generate_content(self.prefix + contents)
+
+
+class GeminiContextCache:
+    """
+    Gemini teenusepoolne kontekstivahemälu (genai.caching.CachedContent).
+
+    Eesliide laaditakse teenusesse üks kord ja päringud viitavad sellele, nii
+    et seda ei arveldata täishinnaga iga kirje juures. Kui vahemälu loomine
+    ebaõnnestub (nt liiga lühike eesliide või mudel ei toeta), kasutatakse
+    tavalist mudelit täieliku promptiga.
+
+    Pikal käivitusel pikendatakse TTL-i, kui sellest on järel alla poole;
+    kui teenus teatab, et vahemälu on aegunud, luuakse see uuesti ja päring
+    korratakse.
+    """
+
+    def __init__(self, ttl_minutes=60):
+        self.ttl = datetime.timedelta(minutes=ttl_minutes)
+        self.created = 0
+        self.refreshed = 0
+        # võti -> {'content': CachedContent või None, 'model': mudel, 'expires': time.monotonic()}
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def model_for(self, prefix, model):
+        key = hashlib.sha256(prefix.encode('utf-8')).hexdigest()
+        self._current(key, prefix, model)
+        return _GeminiCachedModel(self, key, prefix, model)
+
+    def _current(self, key, prefix, model, stale=None):
+        """
+        Kehtiv vahemäluga mudel; vajadusel pikendab TTL-i või loob uuesti.
+        stale: aegunuks osutunud mudel; luuakse uuesti, kui teine lõim pole seda juba teinud.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (stale is not None and entry['model'] is stale):
+                return self._create(key, prefix, model)
+            if entry['content'] is not None and time.monotonic() > entry['expires'] - self.ttl.total_seconds() / 2:
+                try:
+                    entry['content'].update(ttl=self.ttl)
+                    entry['expires'] = time.monotonic() + self.ttl.total_seconds()
+                    self.refreshed += 1
+                except Exception as e:
+                    print(f"Kontekstivahemälu pikendamine ebaõnnestus ({e}), loon uuesti.")
+                    return self._create(key, prefix, model)
+            return entry['model']
+
+    def _create(self, key, prefix, model):
+        try:
+            cached_content = genai.caching.CachedContent.create(
+                model=model.model_name,
+                display_name=f"tering-prefix-{key[:12]}",
+                contents=[prefix],
+                ttl=self.ttl,
+            )
+            entry = {
+                'content': cached_content,
+                'model': genai.GenerativeModel.from_cached_content(cached_content=cached_content),
+                'expires': time.monotonic() + self.ttl.total_seconds(),
+            }
+            self.created += 1
+            print(f"Loodud kontekstivahemälu: {cached_content.name}")
+        except Exception as e:
+            print(f"Hoiatus: kontekstivahemälu loomine ebaõnnestus ({e}). Saadan täieliku prompti.")
+            entry = {'content': None, 'model': _PrefixedModel(LocalContextCache(), prefix, model), 'expires': None}
+        self._entries[key] = entry
+        return entry['model']
+
+    def summary(self):
+        return (f"Gemini kontekstivahemälu: {len(self._entries)} eesliidet, loodud {self.created}, "
+                f"TTL pikendatud {self.refreshed} korda")
+
+
+def _is_cache_expired(error):
+    """Kas viga tähendab, et teenusepoolset vahemälu enam pole (aegunud/kustutatud)."""
+    message = str(error).lower()
+    return ('cache' in message or 'cachedcontent' in message) and (
+        'expired' in message or 'not found' in message or type(error).__name__ == 'NotFound'
+    )
+
+
+class _GeminiCachedModel:
+    """GeminiContextCache mudel: aegunud vahemälu korral loob selle uuesti ja kordab päringut."""
+
+    def __init__(self, cache, key, prefix, model):
+        self.cache = cache
+        self.key = key
+        self.prefix = prefix
+        self.model = model
+
+    def generate_content(self, contents):
+        model = self.cache._current(self.key, self.prefix, self.model)
+        try:
+            return model.generate_content(contents)
+        except Exception as e:
+            if not _is_cache_expired(e):
+                raise
+            print(f"Kontekstivahemälu on aegunud ({e}), loon uuesti.")
+            return self.cache._current(self.key, self.prefix, self.model, stale=model).generate_content(contents)
+
+
+class ExtractionClient:
+    """
+    Seadistatud mudel ja valmis prompti eesliide kogu käivituse jaoks.
+
+    genai.configure ja GenerativeModel tehakse üks kord; lühendid, JSON
+    formaat ja näited vormindatakse eesliiteks samuti üks kord. Kui
+    context_cache on antud (GeminiContextCache või LocalContextCache),
+    saadetakse mudelile ainult kirjepõhine osa.
+
+    response_cache (vastuste_vahemalu.ResponseCache) korral võetakse
+    muutmata kirjete vastused vahemälust; salvestatakse ainult valiidne JSON.
+
+    example_store (naidete_valik.ExampleStore) korral ei ole näited
+    eesliites, vaid iga kirje jaoks valitakse example_k sarnasemat näidet
+    example_budget tokeni piires.
+
+    abbreviations (lyhendite_otsing.AbbreviationMatcher) korral ei ole
+    lühendite loend eesliites, vaid iga kirje (partii) juurde lisatakse
+    ainult selles esinevad lühendid.
+
+    validator (skeemi_valideerimine.SchemaValidator) korral kontrollitakse
+    iga vastust skeemi järgi; vigase vastuse kohta saadetakse üks
+    paranduspäring (vead + vigane JSON, ilma eesliiteta). Statistika
+    väljade kaupa on validation_stats-is.
+
+    use_pre_extract=True korral loetakse kirje kindlad väljad reeglitega
+    (eeltuvastus.pre_extract); mudelile saadetakse lahendamata osa ja
+    osaline JSON ning vastus ühendatakse osalise JSON-iga.
+
+    tracer (moodikud.Tracer) kirjutab iga päringu (extract, extract_batch,
+    repair) ja vahemälu tabamuse kohta JSONL rea.
+
+    rate_limit (funktsioon tokenite hinnanguga, ootab kuni kvoot lubab)
+    kutsutakse enne iga mudelipäringut, ka uuestiproovimiste, üksikute
+    kirjete ja paranduspäringute puhul; seab asyncio draiver.
+    """
+
+    def __init__(self, api_key, lyhendid_text, json_format_description, few_shot_examples,
+                 model_name=MODEL_NAME, context_cache=None, response_cache=None,
+                 example_store=None, example_k=2, example_budget=None, abbreviations=None, validator=None,
+                 use_pre_extract=False, tracer=None):
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.example_store = example_store
+        self.example_k = example_k
+        self.example_budget = example_budget
+        self.abbreviations = abbreviations
+        self.use_pre_extract = use_pre_extract
+        self.prefix = PROMPT_PREFIX_TEMPLATE.format(
+            lyhendid_text=lyhendid_text if abbreviations is None else ABBREVIATIONS_NOTE,
+            json_format_description=json_format_description,
+        )
+        if example_store is None:
+            self.prefix += EXAMPLES_TEMPLATE.format(few_shot_examples=few_shot_examples)
+        self.prompt_version = hashlib.sha256(
+            (self.prefix + (ABBREVIATIONS_TEMPLATE if abbreviations is not None else "")
+             + EXAMPLES_TEMPLATE + RECORD_TEMPLATE
+             + (PARTIAL_RECORD_TEMPLATE + PRE_EXTRACT_VERSION if use_pre_extract else "")).encode('utf-8')
+        ).hexdigest()[:12]
+        self.context_cache = context_cache
+        self.response_cache = response_cache
+        self.validator = validator
+        self.validation_stats = ValidationStats()
+        self.tracer = tracer or Tracer()
+        self.rate_limit = None
+        self._prefix_tokens = estimate_tokens(len(self.prefix.encode('utf-8')))
+        # Kõik peale kirje teksti, mis vastust mõjutab
+        self._cache_parts = (
+            PROMPT_PREFIX_TEMPLATE + EXAMPLES_TEMPLATE + RECORD_TEMPLATE, json_format_description, few_shot_examples,
+            lyhendid_text, model_name,
+            f"examples:{example_k}:{example_budget}" if example_store is not None else "examples:all",
+            "abbreviations:all" if abbreviations is None else
+            "abbreviations:" + ABBREVIATIONS_TEMPLATE + "\n".join(abbreviations.lines)
+            + repr(sorted(abbreviations.core)),
+            f"pre_extract:{PRE_EXTRACT_VERSION}" + PARTIAL_RECORD_TEMPLATE + PARTIAL_ITEM_TEMPLATE
+            if use_pre_extract else "pre_extract:off",
+        )
+
+    def response_key(self, record_text):
+        return cache_key(record_text, *self._cache_parts)
+
+    def cached_response(self, record_text, label=None):
+        """Kirje vahemälus olev JSON vastus või None; tabamus märgitakse jälge (label = kirje fail)."""
+        if self.response_cache is None:
+            return None
+        cached = self.response_cache.get(self.response_key(record_text))
+        if cached is not None:
+            with self.tracer.request("extract", [label] if label else [], self.model_name, self.prompt_version) as span:
+                span.outcome = 'cache_hit'
+        return cached
+
+    def store_response(self, record_text, json_output, usage=None, share=1.0):
+        """Salvestab valiidse JSON vastuse; share = kirje osa partii tokenitest."""
+        if self.response_cache is None or self.output_errors(json_output):
+            return
+        prompt_tokens = getattr(usage, 'prompt_token_count', None)
+        output_tokens = getattr(usage, 'candidates_token_count', None)
+        self.response_cache.put(
+            self.response_key(record_text), json_output, self.model_name,
+            round(prompt_tokens * share) if prompt_tokens else estimate_tokens(len(self.prompt(record_text).encode('utf-8'))),
+            round(output_tokens * share) if output_tokens else estimate_tokens(len(json_output.encode('utf-8'))),
+        )
+
+    def examples_part(self, record_texts):
+        """Kirje(te) jaoks valitud näidete lõik; tühi, kui näited on eesliites."""
+        if self.example_store is None:
+            return ""
+        if len(record_texts) == 1:
+            selected = self.example_store.select(record_texts[0], self.example_k, self.example_budget)
+        else:
+            selected = self.example_store.select_for_batch(record_texts, self.example_k, self.example_budget)
+        return EXAMPLES_TEMPLATE.format(few_shot_examples=json.dumps(selected, indent=2, ensure_ascii=False))
+
+    def output_errors(self, json_output):
+        """Vead JSON tekstis: süntaks ja (validaatori korral) skeem."""
+        if self.validator is not None:
+            return self.validator.check_text(json_output)[1]
+        try:
+            json.loads(json_output)
+        except json.JSONDecodeError as e:
+            return [("", f"ei ole valiidne JSON: {e}")]
+        return []
+
+    def check_output(self, json_output, label="", record_text=None):
+        """
+        Valideerib vastuse; vigase korral üks paranduspäring.
+        record_text korral lisatakse parandatud vastusele eeltuvastatud väljad.
+
+        Returns:
+            (json_output, vead) - parandatud väljund, kui parandus õnnestus,
+            muidu esialgne koos esialgsete vigadega.
+        """
+        errors = self.output_errors(json_output)
+        if self.validator is None:
+            return json_output, errors
+        if not errors:
+            self.validation_stats.record(errors)
+            return json_output, errors
+        print(f"Skeemi vead ({len(errors)}) {label}, saadan paranduspäringu:\n{format_errors(errors, limit=10)}")
+        try:
+            self._throttle(estimate_tokens(2 * len(json_output.encode('utf-8'))))
+            with self.tracer.request("repair", [label] if label else [], self.model_name, self.prompt_version) as span:
+                response = self.model.generate_content(
+                    REPAIR_TEMPLATE.format(errors=format_errors(errors), json_output=json_output)
+                )
+                span.response(response)
+            repaired = clean_json_output(response.text) if getattr(response, 'text', None) else ""
+        except Exception as e:
+            print(f"Viga paranduspäringus {label}: {e}")
+            repaired = ""
+        if repaired and record_text is not None and self.use_pre_extract:
+            try:
+                repaired = json.dumps(self.complete(record_text, json.loads(repaired)), ensure_ascii=False, indent=2)
+            except json.JSONDecodeError:
+                pass
+        repair_errors = self.output_errors(repaired) if repaired else errors
+        self.validation_stats.record(errors, repaired=not repair_errors)
+        if repair_errors:
+            print(f"Parandus ebaõnnestus {label} ({len(repair_errors)} viga)")
+            return json_output, errors
+        return repaired, []
+
+    def abbreviations_part(self, record_texts):
+        """Kirje(te)s esinevate lühendite lõik; tühi, kui kogu loend on eesliites."""
+        if self.abbreviations is None:
+            return ""
+        if len(record_texts) == 1:
+            lyhendid_text = self.abbreviations.glossary_for(record_texts[0])
+        else:
+            lyhendid_text = self.abbreviations.glossary_for_batch(record_texts)
+        return ABBREVIATIONS_TEMPLATE.format(lyhendid_text=lyhendid_text)
+
+    def record_context(self, record_texts):
+        """Eesliitele järgnev kirjepõhine osa enne kirjet: lühendid ja näited."""
+        return self.abbreviations_part(record_texts) + self.examples_part(record_texts)
+
+    def pre_extracted(self, record_text):
+        """Eeltuvastuse tulemus või None (välja lülitatud)."""
+        if not self.use_pre_extract:
+            return None
+        return pre_extract(record_text)
+
+    @staticmethod
+    def _partial_json(pre):
+        # raw_text on kirje ise, seda mudelile tagasi ei näidata
+        partial = {key: value for key, value in pre['partial'].items() if key != 'raw_text'}
+        return json.dumps(partial, ensure_ascii=False)
+
+    def record_part(self, record_text):
+        """Kirje osa promptis: terve kirje või eeltuvastuse jääk koos osalise JSON-iga."""
+        pre = self.pre_extracted(record_text)
+        if pre is None:
+            return RECORD_TEMPLATE.format(record_text=record_text)
+        return PARTIAL_RECORD_TEMPLATE.format(partial_json=self._partial_json(pre), remainder=pre['remainder'])
+
+    def complete(self, record_text, document):
+        """Mudeli vastus (dict) + eeltuvastatud väljad; eeltuvastuseta muutmata."""
+        pre = self.pre_extracted(record_text)
+        if pre is None:
+            return document
+        return merge_partial(document, pre['partial'])
+
+    def prompt(self, record_text):
+        """Täielik prompt (kõigi näidete ja lühenditega sama mis create_prompt)."""
+        return self.prefix + self.record_context([record_text]) + self.record_part(record_text)
+
+    def generate(self, record_text, label=None):
+        """Üks API päring ühe kirje jaoks (või vastus vahemälust); tagastab mudeli vastuse."""
+        cached = self.cached_response(record_text, label)
+        if cached is not None:
+            return SimpleNamespace(text=cached, usage_metadata=None)
+        response = self._send(self.record_context([record_text]) + self.record_part(record_text),
+                              "extract", [label] if label else [])
+        if self.use_pre_extract and getattr(response, 'text', None):
+            try:
+                document = json.loads(clean_json_output(response.text))
+            except json.JSONDecodeError:
+                # Parandus (check_output) saab vigase vastuse nagu tavaliselt
+                return response
+            response = SimpleNamespace(
+                text=json.dumps(self.complete(record_text, document), ensure_ascii=False, indent=2),
+                usage_metadata=getattr(response, 'usage_metadata', None),
+            )
+        if getattr(response, 'text', None):
+            self.store_response(record_text, clean_json_output(response.text), getattr(response, 'usage_metadata', None))
+        return response
+
+    def generate_batch(self, record_texts, labels=None):
+        """Üks API päring mitme kirje jaoks (vastuseks JSON massiiv); labels = kirjete failid jälje jaoks."""
+        items = []
+        for text in record_texts:
+            pre = self.pre_extracted(text)
+            if pre is not None:
+                text = PARTIAL_ITEM_TEMPLATE.format(partial_json=self._partial_json(pre), remainder=pre['remainder'])
+            items.append(text.strip())
+        records = "\n\n".join(
+            BATCH_ITEM_TEMPLATE.format(index=index, record_text=text) for index, text in enumerate(items, 1)
+        )
+        if self.use_pre_extract:
+            records = PARTIAL_BATCH_NOTE + records
+        return self._send(self.record_context(record_texts)
+                          + BATCH_RECORD_TEMPLATE.format(count=len(record_texts), records=records),
+                          "extract_batch", labels or [], records=len(record_texts))
+
+    def _throttle(self, tokens):
+        """Ootab kiiruspiirangu (rate_limit) järel; tokens = sisendi ja väljundi hinnang."""
+        if self.rate_limit is not None:
+            self.rate_limit(tokens)
+
+    def _send(self, record_part, kind="extract", files=(), records=1):
+        self._throttle(self._prefix_tokens + estimate_tokens(len(record_part.encode('utf-8')))
+                       + OUTPUT_TOKENS_PER_RECORD * records)
+        with self.tracer.request(kind, files, self.model_name, self.prompt_version) as span:
+            if self.context_cache is not None:
+                response = self.context_cache.model_for(self.prefix, self.model).generate_content(record_part)
+            else:
+                response = self.model.generate_content(self.prefix + record_part)
+            span.response(response)
+            if not getattr(response, 'text', None):
+                span.outcome = 'empty'
+            return response
+
+
+def clean_json_output(text):
+    """Eemalda ümbritsevad ```json ja ```, kui need on olemas."""
+    return text.strip().replace("```json", "").replace("```", "").strip()
+
+
+def json_output_path(file_path, is_valid=True):
+    """Kirje JSON-faili tee: <nimi>.json või <nimi>_INVALID.json kirje kõrval."""
+    filename_without_ext = os.path.splitext(os.path.basename(file_path))[0]
+    # Lisa faili nimesse märge, kui JSON ei valideeru
+    output_filename = filename_without_ext + ("_INVALID" if not is_valid else "") + ".json"
+    return os.path.join(os.path.dirname(file_path), output_filename)
+
+
+def save_json_output(file_path, json_output, is_valid):
+    """Salvestab JSON-i kirje kõrvale atomaarselt. Tagastab faili tee."""
+    output_file_path = json_output_path(file_path, is_valid)
+    atomic_write(output_file_path, json_output)
+    if is_valid:
+        # Varasem _INVALID tulemus on nüüd aegunud
+        invalid_path = json_output_path(file_path, is_valid=False)
+        if os.path.exists(invalid_path):
+            os.remove(invalid_path)
+    print(f"JSON salvestatud: {output_file_path}")
+    return output_file_path
+
+
+def has_valid_json(file_path):
+    """Kas kirje kõrval on juba valiidne <nimi>.json."""
+    try:
+        with open(json_output_path(file_path), 'r', encoding='utf-8') as f:
+            json.load(f)
+        return True
+    except (OSError, json.JSONDecodeError):
+        return False
+
+
+def process_text_file(file_path, client, raise_errors=False):
     """
     Töötleb ühte tekstifaili: loeb sisu, genereerib JSONi ja salvestab.
+    Tagastab True (valiidne JSON), False (_INVALID) või None (viga).
+    raise_errors=True korral API vead tõstetakse (draiver otsustab ootamise üle).
     """
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             record_text = f.read()
     except FileNotFoundError:
         print(f"Viga: Faili ei leitud: {file_path}")
-        return
+        return None
     except Exception as e:
         print(f"Viga faili lugemisel: {e}")
-        return
-
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.0-flash')
-
-    prompt = create_prompt(record_text, lyhendid_text, json_format_description, few_shot_examples)
+        return None
 
     try:
-        response = model.generate_content(prompt)
+        response = client.generate(record_text, file_path)
 
         if hasattr(response, 'text') and response.text:
-            # Eemalda ümbritsevad ```json ja ```, kui need on olemas
-            json_output = response.text.strip().replace("```json", "").replace("```", "").strip()
+            json_output = clean_json_output(response.text)
 
-            # Kontrolli, kas väljund on valide JSON
-            is_valid = True
-            try:
-                json.loads(json_output)
-            except json.JSONDecodeError:
-                is_valid = False
+            # Kontrolli, kas väljund on valide JSON (ja vastab skeemile; vajadusel parandus)
+            checked_output, errors = client.check_output(json_output, file_path, record_text)
+            is_valid = not errors
+            if not is_valid:
                 print(f"Hoiatus: Mudeli väljund ei ole valide JSON: {file_path}")
                 print(f"Väljund: {json_output}")
+            elif checked_output != json_output:
+                json_output = checked_output
+                client.store_response(record_text, json_output)
 
             # Salvesta JSON faili
-            filename_without_ext = os.path.splitext(os.path.basename(file_path))[0]
-            # Lisa faili nimesse märge, kui JSON ei valideeru
-            output_filename = filename_without_ext + ("_INVALID" if not is_valid else "") + ".json"
-            output_file_path = os.path.join(os.path.dirname(file_path), output_filename)
-            
-            with open(output_file_path, 'w', encoding='utf-8') as outfile:
-                outfile.write(json_output)
-            print(f"JSON salvestatud: {output_file_path}")
+            save_json_output(file_path, json_output, is_valid)
+            return is_valid
 
         else:
             print(f"Viga: Mudel ei tagastanud teksti faili jaoks: {file_path}")
 
     except Exception as e:
+        if raise_errors:
+            raise
         print(f"Viga API päringus: {e}")
+    return None
+
+
+# --- Mitme kirje partiid ---
+def entry_number(record_text):
+    """Kirje number [NR] reast või None."""
+    match = ENTRY_NUMBER_RE.search(record_text)
+    return int(match.group(1)) if match else None
+
+
+def pack_records(records, token_budget, max_records=None, output_tokens_per_record=OUTPUT_TOKENS_PER_RECORD):
+    """
+    Jagab kirjed partiideks nii, et kirjete tekst + oodatav JSON vastus
+    mahub token_budget piiresse (vähemalt üks kirje partii kohta).
+
+    Args:
+        records: List paaridest (faili tee, kirje tekst).
+
+    Returns:
+        List partiidest (igaüks list paaridest).
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for file_path, text in records:
+        tokens = estimate_tokens(len(text.encode('utf-8'))) + output_tokens_per_record
+        full = max_records is not None and len(current) >= max_records
+        if current and (current_tokens + tokens > token_budget or full):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((file_path, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def parse_batch_response(text, expected_numbers):
+    """
+    Jagab partii vastuse (JSON massiiv) kirjete kaupa.
+
+    Tulemus seotakse sisendiga entry_number järgi; kui sisendkirjel numbrit
+    pole, siis positsiooni järgi. Tagastab (vastendus indeks -> objekt,
+    ebaõnnestunud indeksite list).
+    """
+    try:
+        items = json.loads(clean_json_output(text))
+    except json.JSONDecodeError:
+        return {}, list(range(len(expected_numbers)))
+    if not isinstance(items, list):
+        items = [items]
+
+    by_number = {}
+    for item in items:
+        if isinstance(item, dict):
+            try:
+                by_number.setdefault(int(item.get('entry_number')), item)
+            except (TypeError, ValueError):
+                pass
+
+    results = {}
+    for index, number in enumerate(expected_numbers):
+        if number is not None and number in by_number:
+            results[index] = by_number[number]
+        elif number is None and index < len(items) and isinstance(items[index], dict):
+            results[index] = items[index]
+    failed = [index for index in range(len(expected_numbers)) if index not in results]
+    return results, failed
+
+
+def process_batch(records, client, max_retries=1, raise_errors=False):
+    """
+    Töötleb partii kirjeid ühe päringuga. Kirjed, mille tulemust ei
+    õnnestunud vastusest leida, saadetakse uuesti (ainult need); viimase
+    võimalusena ükshaaval process_text_file kaudu. Vahemälus olevad
+    kirjed salvestatakse kohe ilma päringuta. raise_errors=True korral
+    kiiruspiirangu vead tõstetakse (draiver ootab).
+
+    Args:
+        records: List paaridest (faili tee, kirje tekst).
+
+    Returns:
+        Sõnastik faili tee -> True/False/None nagu process_text_file.
+    """
+    statuses = {}
+    pending = []
+    for file_path, text in records:
+        cached = client.cached_response(text, file_path)
+        if cached is not None:
+            save_json_output(file_path, cached, True)
+            statuses[file_path] = True
+        else:
+            pending.append((file_path, text))
+
+    for attempt in range(max_retries + 1):
+        if len(pending) <= 1:
+            break
+        numbers = [entry_number(text) for _, text in pending]
+        try:
+            response = client.generate_batch([text for _, text in pending], [file_path for file_path, _ in pending])
+            results, failed = parse_batch_response(response.text if getattr(response, 'text', None) else "", numbers)
+        except Exception as e:
+            if raise_errors and is_rate_limit_error(e) and not statuses:
+                raise
+            print(f"Viga API päringus (partii {len(pending)} kirjet, katse {attempt + 1}): {e}")
+            results, failed = {}, list(range(len(pending)))
+
+        for index, item in results.items():
+            file_path, text = pending[index]
+            item = client.complete(text, item)
+            json_output, errors = client.check_output(json.dumps(item, ensure_ascii=False, indent=2), file_path, text)
+            save_json_output(file_path, json_output, not errors)
+            client.store_response(text, json_output, getattr(response, 'usage_metadata', None), 1 / len(pending))
+            statuses[file_path] = not errors
+        if failed:
+            print(f"Partiist {len(pending)} kirjet jäi {len(failed)} vastuseta, proovin neid uuesti.")
+        pending = [pending[index] for index in failed]
+        if not pending:
+            break
+
+    # Üksikud või korduvalt ebaõnnestunud kirjed: tavaline ühe kirje päring
+    for file_path, _ in pending:
+        try:
+            statuses[file_path] = process_text_file(file_path, client, raise_errors=raise_errors)
+        except Exception as e:
+            if is_rate_limit_error(e) and not statuses:
+                raise
+            print(f"Viga API päringus: {e}")
+            statuses[file_path] = None
+    return statuses
+
 
+def find_record_files(folder_path):
+    """Kausta kirjefailid (NR*.txt) sorteeritud järjekorras."""
+    return sorted(glob.glob(os.path.join(folder_path, "NR*.txt")))
+
+
+def process_folder_batched(folder_path, client, token_budget=8000, max_records=None):
+    """Töötleb kausta kirjed partiidena; partii suurus tuleneb tokenite eelarvest."""
+    records = []
+    for file_path in find_record_files(folder_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            records.append((file_path, f.read()))
+    batches = pack_records(records, token_budget, max_records)
+    print(f"{len(records)} kirjet, {len(batches)} partiid (eelarve {token_budget} tokenit)")
+    statuses = {}
+    for batch in batches:
+        statuses.update(process_batch(batch, client))
+    return statuses
+
+
+# --- Samaaegne jätkatav draiver ---
+RETRY_QUEUE_NAME = "extraction_retry_queue.txt"
+
+
+def find_records(roots, pattern="**/NR*.txt"):
+    """Kõik kirjefailid antud kaustades (rekursiivselt), sorteeritud."""
+    files = set()
+    for root in roots:
+        files.update(glob.glob(os.path.join(root, pattern), recursive=True))
+    return sorted(files)
+
+
+class Progress:
+    """Edenemine ja hinnanguline lõpuaeg (ETA) lõpetatud kirjete põhjal."""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def update(self, count=1):
+        with self._lock:
+            self.done += count
+            elapsed = time.perf_counter() - self.start
+            rate = self.done / elapsed if elapsed else 0
+            eta = (self.total - self.done) / rate if rate else 0
+            print(f"[{self.done}/{self.total}] {self.done / self.total * 100:.1f}% "
+                  f"({rate * 60:.1f} kirjet/min, ETA {int(eta // 60)}:{int(eta % 60):02d})")
+
+
+async def _extract_unit_async(unit, client, concurrency, max_retries, progress):
+    """
+    Üks kirje või partii samaaegsuse piiri all; tagastab {faili tee: staatus}.
+    Kiiruspiirang rakendub iga mudelipäringu juures (client.rate_limit).
+    """
+    for attempt in range(max_retries + 1):
+        await concurrency.acquire()
+        start = time.perf_counter()
+        try:
+            if len(unit) == 1:
+                status = await asyncio.to_thread(process_text_file, unit[0][0], client, True)
+                statuses = {unit[0][0]: status}
+            else:
+                statuses = await asyncio.to_thread(process_batch, unit, client, 1, True)
+        except Exception as e:
+            if is_rate_limit_error(e):
+                await concurrency.on_overload()
+            if attempt < max_retries:
+                delay = backoff_delay(attempt)
+                print(f"Viga API päringus ({unit[0][0]}, katse {attempt + 1}): {e}. Proovin uuesti {delay:.1f} s pärast...")
+                await asyncio.sleep(delay)
+                continue
+            print(f"Lõplikult ebaõnnestus ({unit[0][0]}): {e}")
+            statuses = {file_path: None for file_path, _ in unit}
+        else:
+            await concurrency.on_success(time.perf_counter() - start)
+        finally:
+            await concurrency.release()
+        progress.update(len(unit))
+        return statuses
+
+
+async def extract_records_async(file_paths, client, requests_per_minute=60, tokens_per_minute=None,
+                                max_concurrency=8, batch_tokens=None, max_batch=None, max_retries=3):
+    """
+    Teisendab kirjed samaaegselt (kohanduv samaaegsus + token-bucket).
+
+    batch_tokens korral pakitakse kirjed partiideks (pack_records).
+    Tagastab {faili tee: True/False/None}.
+    """
+    records = []
+    for file_path in file_paths:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            records.append((file_path, f.read()))
+    units = pack_records(records, batch_tokens, max_batch) if batch_tokens else [[record] for record in records]
+
+    bucket = TokenBucket(requests_per_minute, tokens_per_minute)
+    concurrency = AdaptiveConcurrency(initial=min(2, max_concurrency), max_limit=max_concurrency)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=max_concurrency))
+    progress = Progress(len(records))
+
+    # Päringud tehakse lõimedes: iga päring ootab token-bucketit sündmuste tsüklis
+    client.rate_limit = lambda tokens: asyncio.run_coroutine_threadsafe(bucket.acquire(tokens), loop).result()
+    try:
+        results = await asyncio.gather(*[
+            _extract_unit_async(unit, client, concurrency, max_retries, progress)
+            for unit in units
+        ])
+    finally:
+        client.rate_limit = None
+    return {file_path: status for statuses in results for file_path, status in statuses.items()}
+
+
+def run_extraction(roots, client, pattern="**/NR*.txt", retry_invalid=False, invalid_rounds=1, **options):
+    """
+    Kogu korpuse teisendamine ühe käsuga, katkestuse järel jätkatav.
+
+    - Kirjed, mille kõrval on valiidne .json, jäetakse vahele.
+    - Kirjed, mis andsid _INVALID tulemuse või vea, lähevad kordusjärjekorda
+      ja saadetakse invalid_rounds korda uuesti (ükshaaval).
+    - Allesjäänud kordusjärjekord kirjutatakse faili RETRY_QUEUE_NAME
+      esimesse kausta; retry_invalid=True töötleb ainult _INVALID kirjeid.
+    """
+    file_paths = find_records(roots, pattern)
+    if retry_invalid:
+        file_paths = [path for path in file_paths if os.path.exists(json_output_path(path, is_valid=False))]
+    pending = [path for path in file_paths if not has_valid_json(path)]
+    print(f"Leidsin {len(file_paths)} kirjet, neist {len(file_paths) - len(pending)} juba valmis, töötlen {len(pending)}.")
+    if not pending:
+        return {}
+
+    statuses = asyncio.run(extract_records_async(pending, client, **options))
+    retry_queue = [path for path, status in statuses.items() if status is not True]
+    for round_number in range(invalid_rounds):
+        if not retry_queue:
+            break
+        print(f"\nKordusjärjekord ({round_number + 1}. ring): {len(retry_queue)} kirjet")
+        retry_options = dict(options, batch_tokens=None)
+        retried = asyncio.run(extract_records_async(retry_queue, client, **retry_options))
+        statuses.update(retried)
+        retry_queue = [path for path, status in retried.items() if status is not True]
+
+    queue_path = os.path.join(roots[0], RETRY_QUEUE_NAME)
+    atomic_write(queue_path, "".join(path + "\n" for path in sorted(retry_queue)))
+    valid = sum(1 for status in statuses.values() if status is True)
+    print(f"\nValmis: {valid}/{len(statuses)} valiidset JSON-it, kordusjärjekorras {len(retry_queue)} ({queue_path})")
+    return statuses
 
 
 # def process_folder(folder_path, api_key, lyhendid_text, json_format_description, few_shot_examples):
@@ -113,74 +944,151 @@ def process_text_file(file_path, api_key, lyhendid_text, json_format_description
 #             process_text_file(file_path, api_key, lyhendid_text, json_format_description, few_shot_examples)
 
 # Uus funktsioon üksiku faili jaoks
-def process_single_file(file_path, api_key, lyhendid_text, json_format_description, few_shot_examples):
+def process_single_file(file_path, client):
     """
     Töötleb üksikut tekstifaili.
     """
     if file_path.lower().endswith('.txt'):
-        process_text_file(file_path, api_key, lyhendid_text, json_format_description, few_shot_examples)
+        process_text_file(file_path, client)
     else:
         print(f"Hoiatus: {file_path} ei ole tekstifail")
 
+
+def load_prompt_data(data_dir="data"):
+    """
+    Loeb lühendid, JSON formaadi ja few-shot näited.
+
+    Returns:
+        (lyhendid_text, json_format_description, few_shot_examples) promptiks vormindatud kujul.
+    """
+    # Lühendite faili sisu
+    with open(os.path.join(data_dir, "tering_lyhendid.txt"), "r", encoding="utf-8") as f:
+        lyhendid_text = f.read()
+
+    # JSON formaadi kirjeldus failist
+    try:
+        with open(os.path.join(data_dir, "json_schema.json"), "r", encoding="utf-8") as f:
+            json_format_description = json.load(f)
+            json_format_description = json.dumps(json_format_description, indent=2) # Ilusamaks
+    except FileNotFoundError:
+        print("Viga: Faili json_schema.json ei leitud.")
+        exit()
+    except json.JSONDecodeError:
+        print("Viga: json_schema.json sisu ei ole korrektne JSON.")
+        exit()
+
+    # Few-Shot õppe näited failist
+    try:
+        with open(os.path.join(data_dir, "few_shot_examples.json"), "r", encoding="utf-8") as f:
+            few_shot_examples = json.load(f)
+            few_shot_examples = json.dumps(few_shot_examples, indent=2, ensure_ascii=False) # Ilusamaks ja õiged tähed
+
+    except FileNotFoundError:
+        print("Viga: Faili few_shot_examples.json ei leitud.")
+        exit()
+    except json.JSONDecodeError:
+        print("Viga: few_shot_examples.json sisu ei ole korrektne JSON.")
+        exit()
+
+    return lyhendid_text, json_format_description, few_shot_examples
+
+
 # --- Põhiprogramm ---
+def main():
+    parser = argparse.ArgumentParser(description='Kirjete teisendamine JSON-iks Gemini abil')
+    parser.add_argument('--file', default="/home/mf/LLM/tering/processed_records/1636/NR214_1636_10.txt",
+                        help='Töödeldav kirje (NR*.txt)')
+    parser.add_argument('--data-dir', default="data", help='Lühendite, JSON formaadi ja näidete kaust')
+    parser.add_argument('--model', default=MODEL_NAME, help='Gemini mudel')
+    parser.add_argument('--context-cache', choices=['none', 'gemini', 'local'], default='none',
+                        help='Prompti eesliite vahemälu: Gemini kontekstivahemälu või kohalik asendaja')
+    parser.add_argument('--cache', default=os.path.join("data", "llm_vastused.sqlite"), help='Vastuste vahemälu (SQLite)')
+    parser.add_argument('--no-cache', action='store_true', help='Ära kasuta vastuste vahemälu')
+    parser.add_argument('--cache-max-mb', type=int, default=500, help='Vahemälu suurim maht MB')
+    parser.add_argument('--select-examples', type=int, metavar='K',
+                        help='Saada kõigi näidete asemel K kirjele kõige sarnasemat näidet')
+    parser.add_argument('--example-tokens', type=int, help='Valitud näidete tokenite eelarve')
+    parser.add_argument('--prune-abbreviations', action='store_true',
+                        help='Saada kogu lühendite loendi asemel kirjes esinevad lühendid (ka nimede lühendid)')
+    parser.add_argument('--folder', help='Töötle kõik kausta NR*.txt kirjed partiidena (järjest)')
+    parser.add_argument('--root', nargs='+', help='Töötle kõik kirjed kaustades (rekursiivselt), samaaegselt ja jätkatavalt')
+    parser.add_argument('--pattern', default="**/NR*.txt", help='Kirjefailide muster --root kaustades')
+    parser.add_argument('--batch-tokens', type=int,
+                        help='Partii tokenite eelarve (kirjed + oodatav JSON vastus). --root korral vaikimisi '
+                             'üks kirje päringus (partiid ainult selle võtmega); --folder korral vaikimisi 8000')
+    parser.add_argument('--max-batch', type=int, help='Suurim kirjete arv partiis')
+    parser.add_argument('--rpm', type=int, default=60, help='Päringuid minutis')
+    parser.add_argument('--tpm', type=int, help='Tokeneid minutis')
+    parser.add_argument('--max-concurrency', type=int, default=8, help='Suurim samaaegsete päringute arv')
+    parser.add_argument('--pre-extract', action='store_true',
+                        help='Loe kirje kindlad väljad (nimi, päritolu, *, †, V.:, Stud.) reeglitega, mudelile ainult ülejäänu')
+    parser.add_argument('--no-validate', action='store_true',
+                        help='Ära kontrolli vastuseid skeemi järgi (ainult JSON süntaks, paranduspäringuid ei tehta)')
+    parser.add_argument('--validation-stats', default=os.path.join("data", "valideerimise_statistika.json"),
+                        help='Skeemi vigade statistika väljade kaupa (lisatakse varasemale)')
+    parser.add_argument('--trace', default=os.path.join("data", "llm_kutsed.jsonl"),
+                        help='Päringute jälg JSONL (vt moodikud.py summary)')
+    parser.add_argument('--no-trace', action='store_true', help='Ära kirjuta päringute jälge')
+    parser.add_argument('--retry-invalid', action='store_true', help='Töötle ainult kirjeid, millel on _INVALID.json')
+    parser.add_argument('--invalid-rounds', type=int, default=1, help='Mitu korda kordusjärjekord uuesti saata')
+    args = parser.parse_args()
 
-# Lae API võti .env failist
-load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-
-if api_key is None:
-    print("Viga: GOOGLE_API_KEY ei ole .env failis määratud.")
-    exit()
-
-# Lühendite faili sisu
-with open("data/tering_lyhendid.txt", "r", encoding="utf-8") as f:
-    lyhendid_text = f.read()
-
-# JSON formaadi kirjeldus failist
-try:
-    with open("data/json_schema.json", "r", encoding="utf-8") as f:
-        json_format_description = json.load(f)
-        json_format_description = json.dumps(json_format_description, indent=2) # Ilusamaks
-except FileNotFoundError:
-    print("Viga: Faili json_schema.json ei leitud.")
-    exit()
-except json.JSONDecodeError:
-    print("Viga: json_schema.json sisu ei ole korrektne JSON.")
-    exit()
-    
+    # Lae API võti .env failist
+    load_dotenv()
+    api_key = os.getenv("GOOGLE_API_KEY")
+
+    if api_key is None:
+        print("Viga: GOOGLE_API_KEY ei ole .env failis määratud.")
+        exit()
+
+    lyhendid_text, json_format_description, few_shot_examples = load_prompt_data(args.data_dir)
+
+    context_cache = {'none': None, 'gemini': GeminiContextCache, 'local': LocalContextCache}[args.context_cache]
+    example_store = None
+    if args.select_examples:
+        example_store = ExampleStore.from_file(os.path.join(args.data_dir, "few_shot_examples.json"))
+    abbreviations = None
+    if args.prune_abbreviations:
+        abbreviations = AbbreviationMatcher.from_files([os.path.join(args.data_dir, name) for name in GLOSSARY_FILES])
+    response_cache = None if args.no_cache else ResponseCache(args.cache, max_bytes=args.cache_max_mb * 1024 * 1024)
+    client = ExtractionClient(api_key, lyhendid_text, json_format_description, few_shot_examples,
+                              model_name=args.model, context_cache=context_cache() if context_cache else None,
+                              response_cache=response_cache, example_store=example_store,
+                              example_k=args.select_examples or 0, example_budget=args.example_tokens,
+                              abbreviations=abbreviations,
+                              validator=None if args.no_validate else SchemaValidator.from_file(
+                                  os.path.join(args.data_dir, "json_schema.json")),
+                              use_pre_extract=args.pre_extract,
+                              tracer=Tracer(None if args.no_trace else args.trace))
+
+    # Kogu korpus (varem käsitsi patterns + process_folder):
+    #   python llm-json-tering.py --root /home/mf/LLM/tering/processed_records
+    if args.root:
+        run_extraction(
+            args.root, client, pattern=args.pattern, retry_invalid=args.retry_invalid,
+            invalid_rounds=args.invalid_rounds, requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+            max_concurrency=args.max_concurrency, batch_tokens=args.batch_tokens or None, max_batch=args.max_batch,
+        )
+    elif args.folder:
+        print(f"Töötan kataloogiga: {args.folder}")
+        process_folder_batched(args.folder, client, token_budget=args.batch_tokens or 8000, max_records=args.max_batch)
+    else:
+        # Ja põhiprogrammis:
+        file_path = args.file
+        print(f"Töötan failiga: {file_path}")
+        process_single_file(file_path, client)
+    if client.context_cache is not None:
+        print(client.context_cache.summary())
+    if client.validator is not None:
+        print(client.validation_stats.summary())
+        client.validation_stats.save(args.validation_stats)
+    if response_cache is not None:
+        print(response_cache.summary())
+        response_cache.close()
+    client.tracer.close()
+    if not args.no_trace:
+        print(f"Päringute jälg: {args.trace} (kokkuvõte: python moodikud.py summary {args.trace})")
+    print("Valmis!")
 
-# Few-Shot õppe näited failist
-try:
-    with open("data/few_shot_examples.json", "r", encoding="utf-8") as f:
-        few_shot_examples = json.load(f)
-        few_shot_examples = json.dumps(few_shot_examples, indent=2, ensure_ascii=False) # Ilusamaks ja õiged tähed
-
-except FileNotFoundError:
-    print("Viga: Faili few_shot_examples.json ei leitud.")
-    exit()
-except json.JSONDecodeError:
-    print("Viga: few_shot_examples.json sisu ei ole korrektne JSON.")
-    exit()
-
-
-# Töötle kausta
-#patterns = [
-#    "/home/mf/LLM/tering/processed_records/166[0-9]/",
-#    "/home/mf/LLM/tering/processed_records/167[0-9]/",
-#    "/home/mf/LLM/tering/processed_records/168[0-9]/",
-#    "/home/mf/LLM/tering/processed_records/169[0-9]/",
-#    "/home/mf/LLM/tering/processed_records/170[0-9]/",
-#    "/home/mf/LLM/tering/processed_records/171[0]/",
-#]
-
-#for pattern in patterns:
-#    for folder in glob.glob(pattern):
-#        print(f"Töötan kataloogiga: {folder}")
-#        process_folder(folder, api_key, lyhendid_text, json_format_description, few_shot_examples)
-
-
-# Ja põhiprogrammis:
-file_path = "/home/mf/LLM/tering/processed_records/1636/NR214_1636_10.txt"
-print(f"Töötan failiga: {file_path}")
-process_single_file(file_path, api_key, lyhendid_text, json_format_description, few_shot_examples)
-print("Valmis!")
+if __name__ == "__main__":
+    main()
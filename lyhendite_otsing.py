@@ -0,0 +1,225 @@
+"""
+Kirjes esinevate lühendite leidmine (Aho-Corasick).
+
+Prompti ei lisata kogu lühendite loendit, vaid ainult need read failidest
+tering_lyhendid.txt ja tering_nimed.txt, mille lühend kirjes esineb, ning
+väike alati kaasas olev põhihulk (CORE_ABBREVIATIONS). Automaat koostatakse
+mõlemast loendist üks kord; kirje läbitakse ühe korra, iga märgi kohta
+üks üleminek.
+
+Lühendid on tõstutundlikud (Liv./livl., Rekomm./rekomm. on eri tähendusega);
+väiketähega lühenditele lisatakse suure algustähega kuju lause alguse jaoks,
+kui see pole ise eraldi lühend. Tähtedega algav/lõppev lühend peab olema
+sõnapiiril (nt "d." ei sobi sõnas "und."), punktiga lõppev lühend võib
+järgneda vahetult.
+
+Kui pakett pyahocorasick on paigaldatud, kasutatakse selle C automaati
+(kogu korpus mõne millisekundiga); muidu sama automaat puhtas Pythonis.
+
+    python lyhendite_otsing.py --query NR214_1636_10.txt
+    python lyhendite_otsing.py --benchmark data/tering_koondfail.txt
+"""
+import argparse
+import re
+import time
+from collections import deque
+
+GLOSSARY_FILES = ("tering_lyhendid.txt", "tering_nimed.txt")
+
+# Lühendid, mis lisatakse igale kirjele (kirje põhistruktuur)
+CORE_ABBREVIATIONS = ("*", "†", "~", "V.", "M.", "imm.", "stud.", "Univ.", "AG")
+
+PARENTHESIS_RE = re.compile(r'\s*\([^)]*\)')
+
+
+def parse_glossary(text):
+    """
+    Lühendite faili read.
+
+    Returns:
+        List paaridest (lühendid, rida); "Rig, rig. = Riga" annab kaks lühendit.
+    """
+    entries = []
+    for line in text.splitlines():
+        line = line.strip()
+        if '=' not in line:
+            continue
+        key = line.split('=', 1)[0].strip()
+        abbreviations = [part.strip() for part in key.split(', ') if part.strip()]
+        if abbreviations:
+            entries.append((abbreviations, line))
+    return entries
+
+
+def abbreviation_variants(abbreviation):
+    """Lühendi kirjapildid tekstis: sulgudega osa ära/lahti, "Dr. med." ka kujul "Dr.med."."""
+    variants = {abbreviation}
+    if '(' in abbreviation:
+        variants.add(PARENTHESIS_RE.sub('', abbreviation))
+        variants.add(' '.join(abbreviation.replace('(', '').replace(')', '').split()))
+    for variant in list(variants):
+        if '. ' in variant:
+            variants.add(variant.replace('. ', '.'))
+    return {variant for variant in variants if variant}
+
+
+class AbbreviationMatcher:
+    """
+    Aho-Corasick automaat lühendite loendi(te) üle.
+
+    Args:
+        entries: parse_glossary väljund (mitme faili korral järjest).
+        core: Lühendid, mille read lisatakse alati.
+    """
+
+    def __init__(self, entries, core=CORE_ABBREVIATIONS):
+        # Sama rida mõlemas failis (tering_nimed.txt sisaldab ka üldlühendeid) -> üks kirje
+        self.lines = []
+        line_ids = {}
+        patterns = {}
+        for abbreviations, line in entries:
+            entry_id = line_ids.setdefault(line, len(self.lines))
+            if entry_id == len(self.lines):
+                self.lines.append(line)
+            for abbreviation in abbreviations:
+                for variant in abbreviation_variants(abbreviation):
+                    patterns.setdefault(variant, set()).add(entry_id)
+        for pattern in list(patterns):
+            capitalized = pattern[0].upper() + pattern[1:]
+            if pattern[0].islower() and capitalized not in patterns:
+                patterns[capitalized] = patterns[pattern]
+        self.pattern_count = len(patterns)
+        self.core = frozenset(entry_id for abbreviation in core for entry_id in patterns.get(abbreviation, ()))
+        self._build(patterns)
+
+    @classmethod
+    def from_files(cls, paths=GLOSSARY_FILES, **kwargs):
+        entries = []
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                entries.extend(parse_glossary(f.read()))
+        return cls(entries, **kwargs)
+
+    def _build(self, patterns):
+        # (pikkus, kirjed, vasak piir vajalik, parem piir vajalik)
+        matches = {pattern: (len(pattern), tuple(sorted(entry_ids)), pattern[0].isalnum(), pattern[-1].isalnum())
+                   for pattern, entry_ids in patterns.items()}
+        try:
+            import ahocorasick
+        except ImportError:
+            ahocorasick = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for pattern, match in matches.items():
+                self._automaton.add_word(pattern, match)
+            self._automaton.make_automaton()
+            self.state_count = self._automaton.get_stats()['nodes_count']
+            return
+        self._automaton = None
+
+        # Trie
+        goto = [{}]
+        outputs = [[]]
+        for pattern, match in matches.items():
+            state = 0
+            for char in pattern:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(match)
+
+        # Tõrkelingid laiuti; täielik üleminekute tabel (DFA), et skaneerimisel
+        # oleks iga märgi kohta üks sõnastiku päring
+        delta = [dict(goto[0])] + [None] * (len(goto) - 1)
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            delta[state] = dict(delta[fail[state]])
+            delta[state].update(goto[state])
+            outputs[state] = outputs[state] + outputs[fail[state]]
+            for char, child in goto[state].items():
+                fail[child] = delta[fail[state]].get(char, 0)
+                queue.append(child)
+        self._delta = delta
+        self._outputs = [tuple(output) for output in outputs]
+        self.state_count = len(goto)
+
+    def find(self, text):
+        """Kirjes esinevate lühendite kirjete id-d (ilma põhihulgata)."""
+        # Tühikud ühtlustatud, et mitmesõnalised lühendid leiduks ka üle reavahetuse
+        text = ' '.join(text.split())
+        found = set()
+        last = len(text) - 1
+        for i, (length, entry_ids, left, right) in self._matches(text):
+            if left and i >= length and text[i - length].isalnum():
+                continue
+            if right and i < last and text[i + 1].isalnum():
+                continue
+            found.update(entry_ids)
+        return found
+
+    def _matches(self, text):
+        """(lõpuindeks, vaste) kõigi (ka kattuvate) kirjapiltide kohta."""
+        if self._automaton is not None:
+            yield from self._automaton.iter(text)
+            return
+        delta = self._delta
+        outputs = self._outputs
+        state = 0
+        for i, char in enumerate(text):
+            state = delta[state].get(char, 0)
+            if outputs[state]:
+                for match in outputs[state]:
+                    yield i, match
+
+    def glossary_for(self, text):
+        """Kirjes esinevate ja põhihulga lühendite read failide järjekorras."""
+        return self._format(self.find(text))
+
+    def glossary_for_batch(self, texts):
+        """Ühine loend mitme kirje jaoks."""
+        found = set()
+        for text in texts:
+            found |= self.find(text)
+        return self._format(found)
+
+    def _format(self, found):
+        return "\n".join(self.lines[entry_id] for entry_id in sorted(found | self.core))
+
+
+def benchmark(matcher, texts):
+    """(kogu aeg sekundites, keskmine ridade arv kirje kohta)."""
+    start = time.perf_counter()
+    total_lines = 0
+    for text in texts:
+        total_lines += len(matcher.find(text) | matcher.core)
+    elapsed = time.perf_counter() - start
+    return elapsed, total_lines / len(texts) if texts else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kirjes esinevate lühendite leidmine')
+    parser.add_argument('--glossary', nargs='+', default=list(GLOSSARY_FILES), help='Lühendite failid')
+    parser.add_argument('--query', help='Kirje fail: näita leitud lühendeid')
+    parser.add_argument('--benchmark', help='Koondfail: mõõda otsingu aega kõigi kirjete peal')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    matcher = AbbreviationMatcher.from_files(args.glossary)
+    print(f"Automaat ({'pyahocorasick' if matcher._automaton is not None else 'Python'}): "
+          f"{len(matcher.lines)} rida, {matcher.pattern_count} kirjapilti, {matcher.state_count} olekut ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    if args.query:
+        with open(args.query, 'r', encoding='utf-8') as f:
+            print(matcher.glossary_for(f.read()))
+    if args.benchmark:
+        with open(args.benchmark, 'r', encoding='utf-8') as f:
+            texts = [part for part in re.split(r'\n(?=\[NR\])', f.read()) if part.strip()]
+        elapsed, mean_lines = benchmark(matcher, texts)
+        print(f"{len(texts)} kirjet, {sum(len(t) for t in texts) / 1e6:.2f} MB: {elapsed * 1000:.1f} ms, "
+              f"keskmiselt {mean_lines:.1f} rida kirje kohta ({len(matcher.lines)} asemel)")
+
+if __name__ == "__main__":
+    main()
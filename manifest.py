@@ -0,0 +1,100 @@
+"""
+Ühised abivahendid korduvkäivitatavate töövoogude jaoks: sisuräsi,
+atomaarne kirjutamine (ajutine fail + ümbernimetamine) ja JSON manifest.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+
+def sha256_bytes(data):
+    """SHA-256 räsi baitidest."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path, block_size=1 << 20):
+    """Faili sisu SHA-256 räsi, loetakse plokkide kaupa."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_umask():
+    # umask saab lugeda ainult seda muutes; loetakse üks kord impordil, mitte lõimedes
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+
+_UMASK = _read_umask()
+
+
+def atomic_write(path, data, encoding='utf-8'):
+    """
+    Kirjutab faili atomaarselt: sisu läheb samasse kausta ajutisse faili,
+    mis seejärel nimetatakse os.replace abil ümber. Katkestuse korral jääb
+    alles kas vana või uus fail, mitte poolik.
+
+    mkstemp loob faili õigustega 0600; olemasoleva faili õigused kopeeritakse
+    ajutisele failile, uus fail saab tavalised õigused (0666 miinus umask).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    mode = 'wb' if isinstance(data, bytes) else 'w'
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, mode, **({} if mode == 'wb' else {'encoding': encoding})) as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o666 & ~_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+class Manifest:
+    """
+    Võti -> väärtus sõnastik, mis hoitakse JSON failis.
+
+    Kasutatakse selleks, et korduval käivitamisel jätta vahele juba tehtud töö
+    (nt failid, mille sisuräsi pole muutunud).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+
+    def get(self, key, default=None):
+        return self.entries.get(key, default)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __setitem__(self, key, value):
+        self.entries[key] = value
+
+    def __getitem__(self, key):
+        return self.entries[key]
+
+    def pop(self, key, default=None):
+        return self.entries.pop(key, default)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def save(self):
+        """Salvestab manifesti atomaarselt."""
+        if self.path:
+            atomic_write(self.path, json.dumps(self.entries, ensure_ascii=False, indent=2, sort_keys=True))
@@ -0,0 +1,263 @@
+"""
+Mudelipäringute mõõdikud: üks JSONL rida iga päringu kohta.
+
+OCR (ocr-few-shot.py) ja kirjete teisendus (llm-json-tering.py) kirjutavad
+iga Gemini päringu kohta rea:
+
+    {"ts": ..., "kind": "ocr", "files": ["lk_001.jpg"], "model": "gemini-2.0-flash",
+     "prompt_hash": "3f2a...", "latency_s": 4.21, "prompt_tokens": 2811,
+     "cached_tokens": 0, "output_tokens": 912, "retries": 0, "outcome": "ok"}
+
+prompt_tokens sisaldab ka kontekstivahemälust (cached_content) loetud
+tokeneid; cached_tokens on nende arv ja neid hinnatakse eraldi.
+
+kind: ocr, ocr_batch, extract, extract_batch, repair. outcome: ok, empty,
+blocked, cache_hit, rate_limited, error. retries on sama faili varasemate
+sama liiki päringute arv selles käivituses (loetakse siin, nii et kõik
+uuestiproovimise teed on kaetud).
+
+Kokkuvõte protsentiilide ja hinnaga 100 kirje/lehekülje kohta:
+
+    python moodikud.py summary data/llm_kutsed.jsonl
+    python moodikud.py summary ocr_tekstid/ocr_kutsed.jsonl --input-price 0.10 --output-price 0.40 --cached-price 0.025
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+
+from kiiruspiirang import is_rate_limit_error
+from ocr_benchmark import percentile
+
+# USD 1M tokeni kohta (sisend, väljund, vahemälust loetud sisend); mudelid, mida siin
+# pole, vajavad --input-price/--output-price. Vahemälu hoiustamise tunnitasu pole arvestatud.
+PRICES = {
+    'gemini-2.5-pro': (1.25, 10.00, 0.125),  # kuni 200k tokeni pikkune prompt
+    'gemini-2.5-flash': (0.30, 2.50, 0.03),
+    'gemini-2.5-flash-lite': (0.10, 0.40, 0.01),
+    'gemini-2.0-flash': (0.10, 0.40, 0.025),
+    'gemini-2.0-flash-lite': (0.075, 0.30, 0.01875),
+    'gemini-1.5-flash': (0.075, 0.30, 0.01875),
+    'gemini-1.5-pro': (1.25, 5.00, 0.3125),
+}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+class Tracer:
+    """
+    JSONL jälg (lõimede vahel jagatav). path=None korral ei kirjutata
+    midagi, nii et mõõdetav kood ei pea eraldi kontrollima.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._attempts = Counter()
+        self._file = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(path, 'a', encoding='utf-8')
+
+    def request(self, kind, files, model, prompt_hash):
+        """Ühe päringu mõõtmine: with tracer.request(...) as span: ..."""
+        return _Span(self, kind, [os.path.basename(str(f)) for f in files], model, prompt_hash)
+
+    def record(self, **fields):
+        if self._file is None:
+            return
+        fields.setdefault('ts', time.strftime("%Y-%m-%dT%H:%M:%S"))
+        line = json.dumps(fields, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def _next_attempt(self, kind, files):
+        key = (kind, tuple(files))
+        with self._lock:
+            attempt = self._attempts[key]
+            self._attempts[key] += 1
+        return attempt
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Span:
+    """Üks päring: latentsus, tokenid (usage_metadata) ja tulemus."""
+
+    def __init__(self, tracer, kind, files, model, prompt_hash):
+        self.tracer = tracer
+        self.kind = kind
+        self.files = files
+        self.model = model
+        self.prompt_hash = prompt_hash
+        self.prompt_tokens = None
+        self.cached_tokens = None
+        self.output_tokens = None
+        self.outcome = 'ok'
+        self.error = None
+
+    def response(self, response):
+        """Tokenid vastuse usage_metadata-st (2.5 mudelite mõttetokenid on hinnalt väljund)."""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage is not None:
+            self.prompt_tokens = getattr(usage, 'prompt_token_count', None)
+            self.cached_tokens = getattr(usage, 'cached_content_token_count', None) or 0
+            self.output_tokens = getattr(usage, 'candidates_token_count', None)
+            thoughts = getattr(usage, 'thoughts_token_count', None)
+            if thoughts:
+                self.output_tokens = (self.output_tokens or 0) + thoughts
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        latency = time.perf_counter() - self.start
+        if exc is not None and self.outcome == 'ok':
+            self.outcome = 'rate_limited' if is_rate_limit_error(exc) else 'error'
+            self.error = f"{exc_type.__name__}: {exc}"[:300]
+        if self.tracer._file is None:
+            return False
+        fields = {
+            'kind': self.kind,
+            'files': self.files,
+            'model': self.model,
+            'prompt_hash': self.prompt_hash,
+            'latency_s': round(latency, 3),
+            'prompt_tokens': self.prompt_tokens,
+            'cached_tokens': self.cached_tokens,
+            'output_tokens': self.output_tokens,
+            'retries': 0 if self.outcome == 'cache_hit' else self.tracer._next_attempt(self.kind, self.files),
+            'outcome': self.outcome,
+        }
+        if self.error:
+            fields['error'] = self.error
+        self.tracer.record(**fields)
+        return False
+
+
+def read_trace(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def request_cost(record, price):
+    """
+    Ühe päringu hind USD-s. price: (sisend, väljund[, vahemälust loetud sisend])
+    USD 1M tokeni kohta; vahemälu hinna puudumisel on see sama mis sisendil.
+    """
+    prompt_tokens = record.get('prompt_tokens') or 0
+    cached_tokens = min(record.get('cached_tokens') or 0, prompt_tokens)
+    cached_price = price[2] if len(price) > 2 else price[0]
+    return ((prompt_tokens - cached_tokens) * price[0] + cached_tokens * cached_price
+            + (record.get('output_tokens') or 0) * price[1]) / 1e6
+
+
+def summarize(records, prices=None):
+    """
+    Kokkuvõte päringu liigi kaupa.
+
+    prices: (sisend, väljund[, vahemälust loetud sisend]) USD 1M tokeni kohta;
+    vaikimisi PRICES mudeli järgi.
+
+    Returns:
+        Sõnastik liik -> näitajad (päringud, failid, tulemused, latentsuse ja
+        tokenite protsentiilid, hind kokku ja 100 faili kohta).
+    """
+    groups = defaultdict(list)
+    for record in records:
+        groups[record['kind']].append(record)
+
+    summary = {}
+    for kind, group in sorted(groups.items()):
+        requests = [r for r in group if r['outcome'] != 'cache_hit']
+        files = {name for r in group for name in r['files']}
+        cost = 0.0
+        unpriced = set()
+        for r in requests:
+            price = prices or PRICES.get(r['model'])
+            if price is None:
+                unpriced.add(r['model'])
+                continue
+            cost += request_cost(r, price)
+        latencies = [r['latency_s'] for r in requests]
+        prompt_tokens = [r['prompt_tokens'] for r in requests if r.get('prompt_tokens') is not None]
+        output_tokens = [r['output_tokens'] for r in requests if r.get('output_tokens') is not None]
+        summary[kind] = {
+            'requests': len(requests),
+            'files': len(files),
+            'retries': sum(1 for r in requests if r['retries'] > 0),
+            'outcomes': dict(Counter(r['outcome'] for r in group).most_common()),
+            'latency_s': {p: percentile(latencies, p) for p in PERCENTILES},
+            'prompt_tokens': {p: percentile(prompt_tokens, p) for p in PERCENTILES},
+            'output_tokens': {p: percentile(output_tokens, p) for p in PERCENTILES},
+            'total_prompt_tokens': sum(prompt_tokens),
+            'total_cached_tokens': sum(r.get('cached_tokens') or 0 for r in requests),
+            'total_output_tokens': sum(output_tokens),
+            'cost_usd': cost,
+            'cost_per_100': cost / len(files) * 100 if files else 0.0,
+            'unpriced_models': sorted(unpriced),
+        }
+    return summary
+
+
+def _fmt(value, digits=0):
+    return "-" if value is None else f"{value:.{digits}f}"
+
+
+def format_summary(summary):
+    header = f"{'':<16}" + "".join(f"{'p' + str(p):>10}" for p in PERCENTILES)
+    lines = []
+    for kind, s in summary.items():
+        outcomes = ", ".join(f"{name} {count}" for name, count in s['outcomes'].items())
+        lines.append(f"== {kind}: {s['requests']} päringut, {s['files']} faili, "
+                     f"uuestiproovimisi {s['retries']} ({outcomes})")
+        lines.append(header)
+        lines.append(f"{'latentsus (s)':<16}" + "".join(f"{_fmt(s['latency_s'][p], 2):>10}" for p in PERCENTILES))
+        lines.append(f"{'sisendtokenid':<16}" + "".join(f"{_fmt(s['prompt_tokens'][p]):>10}" for p in PERCENTILES))
+        lines.append(f"{'väljundtokenid':<16}" + "".join(f"{_fmt(s['output_tokens'][p]):>10}" for p in PERCENTILES))
+        lines.append(f"Tokenid kokku: sisend {s['total_prompt_tokens']} (vahemälust {s['total_cached_tokens']}), "
+                     f"väljund {s['total_output_tokens']}; "
+                     f"hind ${s['cost_usd']:.4f}, 100 faili kohta ${s['cost_per_100']:.4f}"
+                     + (f" (hinnata mudelid: {', '.join(s['unpriced_models'])})" if s['unpriced_models'] else ""))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Mudelipäringute jälje kokkuvõte')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    summary_parser = subparsers.add_parser('summary', help='Protsentiilid ja hind 100 faili kohta')
+    summary_parser.add_argument('traces', nargs='+', help='JSONL jäljefailid')
+    summary_parser.add_argument('--kind', help='Ainult see päringu liik (nt ocr, extract)')
+    summary_parser.add_argument('--input-price', type=float, help='USD 1M sisendtokeni kohta')
+    summary_parser.add_argument('--output-price', type=float, help='USD 1M väljundtokeni kohta')
+    summary_parser.add_argument('--cached-price', type=float,
+                                help='USD 1M vahemälust loetud sisendtokeni kohta (vaikimisi --input-price)')
+    summary_parser.add_argument('--json', action='store_true', help='Väljund JSON-ina')
+    args = parser.parse_args()
+
+    records = [record for path in args.traces for record in read_trace(path)]
+    if args.kind:
+        records = [record for record in records if record['kind'] == args.kind]
+    prices = None
+    if args.input_price is not None or args.output_price is not None or args.cached_price is not None:
+        input_price = args.input_price or 0.0
+        cached_price = input_price if args.cached_price is None else args.cached_price
+        prices = (input_price, args.output_price or 0.0, cached_price)
+    summary = summarize(records, prices)
+    if args.json:
+        print(json.dumps(summary, indent=2, ensure_ascii=False))
+    else:
+        print(format_summary(summary) or "Jälg on tühi.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Few-shot näidete valik kirje sarnasuse järgi.
+
+Kogu few_shot_examples.json saatmise asemel valitakse iga kirje jaoks k
+kõige sarnasemat näidet (4-grammide TF-IDF, koosinussarnasus), mis
+mahuvad tokenite eelarvesse. Näidete vektorid arvutatakse laadimisel üks
+kord; päring loeb kirje 4-grammid täisarvudena ühe läbimisega ja skoorib
+hulkade ühisosaga.
+
+    python naidete_valik.py few_shot_examples.json --query NR214_1636_10.txt
+    python naidete_valik.py few_shot_examples.json --benchmark data/tering_koondfail.txt
+"""
+import argparse
+import json
+import math
+import re
+import time
+from array import array
+from collections import Counter
+
+from tokenid import estimate_tokens
+
+NGRAM_SIZE = 4
+
+# 4-baidine märgita täisarv (tavaliselt 'I'); üks 4-gramm = üks arv
+_GRAM_TYPE = next(code for code in 'IL' if array(code).itemsize == NGRAM_SIZE)
+
+
+def gram_array(text):
+    """
+    Teksti kõik kattuvad 4-grammid täisarvudena (kordustega), ühe array-na.
+
+    Tekst normaliseeritakse (väiketähed, tühikud ühtlustatud) ja UTF-8 baidid
+    loetakse array('I') abil 32-bitisteks arvudeks neljal nihkel (0..3), mis
+    koos katavad kõik 4-grammid. Nii ei lõigata Pythonis iga alamsõnet
+    eraldi. Mitmebaidised tähed (ä, ö, ü) jagunevad grammide vahel, kuid
+    näidetes ja kirjetes ühtemoodi.
+    """
+    data = ' '.join(text.lower().split()).encode('utf-8')
+    grams = array(_GRAM_TYPE)
+    for offset in range(NGRAM_SIZE):
+        grams.frombytes(data[offset:offset + (len(data) - offset) // NGRAM_SIZE * NGRAM_SIZE])
+    return grams
+
+
+def byte_ngrams(text):
+    """
+    Teksti 4-grammide hulk (vt gram_array).
+
+    Kasutatakse binaarset tf-i: kirjetes korduvad peamiselt lühendid ja
+    aastaarvud, mille sagedus sarnasust ei iseloomusta.
+    """
+    return set(gram_array(text))
+
+
+class ExampleStore:
+    """
+    Näidete hoidla sarnasusindeksiga.
+
+    Laadimisel arvutatakse iga n-grammi kohta rida: kõigi näidete
+    normaliseeritud TF-IDF kaal korrutatuna päringu kaaluga (idf) ja lõpus
+    idf ruut kirje normi jaoks. Päring võtab kirje n-grammidest ühe
+    hulgaoperatsiooniga need, mis näidetes esinevad, ja liidab nende read
+    veergude kaupa (map/zip, kõik C-s). Read on tihedad (üks väärtus näite
+    kohta), mis sobib few-shot hoidla suurusele (kümned näited).
+
+    Args:
+        examples: List sõnastikest ({"Tekst": ..., "JSON": ...}).
+        text_key: Välja nimi, mille järgi sarnasust arvutatakse.
+    """
+
+    def __init__(self, examples, text_key="Tekst"):
+        self.examples = examples
+        self.tokens = [estimate_tokens(len(json.dumps(example, ensure_ascii=False).encode('utf-8')))
+                       for example in examples]
+
+        grams = [byte_ngrams(example.get(text_key, "")) for example in examples]
+        document_frequency = Counter()
+        for example_grams in grams:
+            document_frequency.update(example_grams)
+        total = len(examples)
+        # Silutud idf: ka kõigis näidetes esinev n-gramm saab väikese kaalu
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+        # Kirje normi arvutamiseks loetakse ka näidetes puuduvad n-grammid (idf nagu df=0)
+        self._unseen_squared = (math.log(1 + total) + 1) ** 2
+
+        norms = [math.sqrt(sum(self.idf[gram] ** 2 for gram in example_grams)) or 1.0 for example_grams in grams]
+        self._rows = {
+            gram: tuple(weight * weight / norm if gram in example_grams else 0.0
+                        for example_grams, norm in zip(grams, norms)) + (weight * weight,)
+            for gram, weight in self.idf.items()
+        }
+        self._vocabulary = frozenset(self._rows)
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), **kwargs)
+
+    def scores(self, text):
+        """
+        Koosinussarnasus kirje ja iga näite vahel (list näidete järjekorras).
+
+        Kirje normis hinnatakse näidetes puuduvate n-grammide arv positsioonide
+        järgi (kordusi ei eemaldata, et mitte ehitada kogu kirje hulka); see
+        mõjutab ainult skaalat, mitte näidete järjestust kirje jaoks.
+        """
+        grams = gram_array(text)
+        seen = self._vocabulary.intersection(grams)
+        if not seen:
+            return [0.0] * len(self.examples)
+        *products, seen_squared = map(sum, zip(*map(self._rows.__getitem__, seen)))
+        norm = math.sqrt(seen_squared + (len(grams) - len(seen)) * self._unseen_squared)
+        return [product / norm for product in products]
+
+    def _pack(self, scores, k, token_budget):
+        ranked = sorted(range(len(scores)), key=lambda i: -scores[i])
+        selected = []
+        used = 0
+        for example_id in ranked:
+            if len(selected) >= k:
+                break
+            if token_budget is not None and used + self.tokens[example_id] > token_budget:
+                continue
+            selected.append(example_id)
+            used += self.tokens[example_id]
+        return [self.examples[i] for i in selected]
+
+    def select(self, text, k=2, token_budget=None):
+        """Kuni k kõige sarnasemat näidet, mis mahuvad token_budget piiresse."""
+        return self._pack(self.scores(text), k, token_budget)
+
+    def select_for_batch(self, texts, k=2, token_budget=None):
+        """Näited mitme kirje jaoks: iga näite skoor on tema parim skoor partiis."""
+        best = [0.0] * len(self.examples)
+        for text in texts:
+            best = [max(a, b) for a, b in zip(best, self.scores(text))]
+        return self._pack(best, k, token_budget)
+
+
+def benchmark(store, texts, k=2, token_budget=None):
+    """Keskmine valiku aeg kirje kohta mikrosekundites."""
+    start = time.perf_counter()
+    for text in texts:
+        store.select(text, k, token_budget)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(texts) * 1e6 if texts else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Few-shot näidete valik sarnasuse järgi')
+    parser.add_argument('examples', help='few_shot_examples.json')
+    parser.add_argument('--query', help='Kirje fail, mille jaoks näiteid valida')
+    parser.add_argument('--benchmark', help='Koondfail: mõõda valiku aega kõigi kirjete peal')
+    parser.add_argument('-k', type=int, default=2, help='Näidete arv')
+    parser.add_argument('--token-budget', type=int, help='Näidete tokenite eelarve')
+    args = parser.parse_args()
+
+    store = ExampleStore.from_file(args.examples)
+    if args.query:
+        with open(args.query, 'r', encoding='utf-8') as f:
+            text = f.read()
+        scores = store.scores(text)
+        for example_id in sorted(range(len(scores)), key=lambda i: -scores[i]):
+            first_line = store.examples[example_id].get('Tekst', '').splitlines()[1:2]
+            print(f"{scores[example_id]:.3f}  {store.tokens[example_id]:>5} tokenit  {first_line[0][:60] if first_line else ''}")
+        print(f"Valitud: {len(store.select(text, args.k, args.token_budget))} näidet")
+    if args.benchmark:
+        with open(args.benchmark, 'r', encoding='utf-8') as f:
+            texts = [part for part in re.split(r'\n(?=\[NR\])', f.read()) if part.strip()]
+        print(f"{len(texts)} kirjet: {benchmark(store, texts, args.k, args.token_budget):.1f} µs kirje kohta")
+
+if __name__ == "__main__":
+    main()
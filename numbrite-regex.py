@@ -1,60 +1,88 @@
-import os
-import re
+import argparse
+import json
 
-def find_and_mark_entries(filename="data/tering_koondfail.txt"):
+from kirjete_numbrid import scan_entries as _scan_entries
+
+MARKER = '[NR]'
+
+
+def scan_entries(content, max_number=1705):
+    """
+    Tuvastab kirjete alguspositsioonid ühe läbimisega (kirjete_numbrid).
+
+    Oodatud numbrit otsitakse esmalt täpselt; hüpe ette (puuduvad numbrid)
+    tehakse ainult siis, kui oodatut ei leidu ja järjestus jätkub. Kirje
+    sees olevad kuupäevaread ("14. Mai 1632") lähevad järjekorraväliste
+    vastete alla.
+
+    Tagastab (entries, gaps), kus entries on list (number, positsioon, rida)
+    ja gaps on list masinloetavatest probleemikirjetest.
+    """
+    return _scan_entries(content, max_number=max_number)
+
+
+def mark_entries(content, entries):
+    """Lisab kirjete algusesse [NR] märgendid, koostades teksti ühe join-iga."""
+    parts = []
+    previous = 0
+    for _, position, _ in entries:
+        # position osutab rea algusele; juba märgitud rida jäetakse nagu on
+        if content.startswith(MARKER, position):
+            continue
+        parts.append(content[previous:position])
+        parts.append(MARKER)
+        previous = position
+    parts.append(content[previous:])
+    return ''.join(parts)
+
+
+def find_and_mark_entries(filename="data/tering_koondfail.txt", max_number=1705):
     print("Alustan faili lugemist...")
     with open(filename, 'r', encoding='utf-8') as file:
         content = file.read()
-    
-    # List kirjete salvestamiseks koos positsioonidega
-    entries = []
+
+    entries, gaps = scan_entries(content, max_number=max_number)
+    new_content = mark_entries(content, entries)
+
     problems = []
-    
-    # Otsime kõik read, mis algavad numbriga
-    # Kasutame otsese otsingu asemel regex otsingut
-    current_position = 0
-    expected_number = 1
-    
-    while current_position < len(content):
-        # Otsi järgmist rida, mis võiks olla kirje
-        pattern = fr'\n{expected_number}\. [A-ZÄÖÜ]'
-        match = re.search(pattern, content[current_position:])
-        
-        if match:
-            position = current_position + match.start()
-            entries.append((expected_number, position))
-            current_position = position + 1
-            expected_number += 1
+    for gap in gaps:
+        if gap["type"] == "missing":
+            for number in gap["numbers"]:
+                problems.append(f"Ei leidnud numbrit {number}")
         else:
-            problems.append(f"Ei leidnud numbrit {expected_number}")
-            expected_number += 1
-            if current_position == 0:
-                current_position = 1
-        
-        if expected_number > 1705:  # max number
-            break
-    
-    # Lisa [NR] märgendid
-    new_content = content
-    offset = 0
-    
-    for number, position in sorted(entries, key=lambda x: x[1]):
-        insert_pos = position + offset
-        new_content = new_content[:insert_pos] + '\n[NR]' + new_content[insert_pos+1:]
-        offset += 4
-    
+            problems.append(
+                f"Järjekorraväline number {gap['number']} real {gap['line']} "
+                f"(oodati {gap['expected']})"
+            )
+
     print(f"Leitud {len(entries)} kirjet")
     print(f"Probleeme: {len(problems)}")
-    
+
     # Salvesta tulemused
     with open(f"{filename}_marked.txt", 'w', encoding='utf-8') as outfile:
         outfile.write(new_content)
-    
+
     with open(f"{filename}_report.txt", 'w', encoding='utf-8') as outfile:
         outfile.write("\n".join(problems))
 
+    # Masinloetav aruanne koos reanumbritega
+    with open(f"{filename}_report.json", 'w', encoding='utf-8') as outfile:
+        json.dump({
+            "entries_found": len(entries),
+            "max_number": max_number,
+            "gaps": gaps,
+        }, outfile, ensure_ascii=False, indent=2)
+
+    return entries, gaps
+
+
 def main():
-    find_and_mark_entries()
+    parser = argparse.ArgumentParser(description='Märgi koondfailis kirjete algused [NR] märgendiga')
+    parser.add_argument('filename', nargs='?', default="data/tering_koondfail.txt", help='Sisendfail')
+    parser.add_argument('--max-number', type=int, default=1705, help='Suurim kirje number')
+    args = parser.parse_args()
+
+    find_and_mark_entries(args.filename, max_number=args.max_number)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,514 @@
 import google.generativeai as genai
 import PIL.Image
+import argparse
+import asyncio
+import hashlib
+import json
+import mimetypes
 import os
+import random
+import re
+import shutil
+import tempfile
 import time
 import threading
 import queue
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+from eeltootlus import evaluate_accuracy, options_key, preprocess_images, resolve_options
+from kiiruspiirang import AdaptiveConcurrency, RateLimitError, TokenBucket, backoff_delay, is_rate_limit_error
+from manifest import Manifest, atomic_write, file_sha256
+from ocr_taustad import LowConfidenceError, RoutingBackend, TesseractBackend
+from ocr_benchmark import RecordedModel, RecordingModel, format_result, save_result, summarize
+from moodikud import Tracer
+
+# Alustame Flashiga, mis on kiirem ja odavam.
+MODEL_NAME = 'gemini-2.5-flash'
+
+# Koostame juhised üheks tekstiks
+INITIAL_PROMPT_TEXT = (
+    "Järgi neid reegleid täpselt, et transkribeerida see tekst:\n"
+    "1. **Roll:** Sa oled täpne transkribeerija. Sinu ülesanne on ainult transkribeerida tekst etteantud pildifailil.\n"
+    "2. **Täpsus:** Kopeeri tekst tähemärgi täpsusega. Säilita kõik algne tekst, lühendid ja kahtlased või vigasena näivad kohad muutumatul kujul.\n"
+    "3. **Keelud:** ÄRA paranda arvatavaid kirjavigu. ÄRA moderniseeri keelt. ÄRA lisa omapoolseid kommentaare ega selgitusi ja ÄRA mingil juhul võta few shot näidete teksti transkriptsiooni kaasa. Trankriptsioon peab olema vaid etteantud transkribeeritavast pildifailist.\n"
+)
+
+
+# Mitme lehekülje päringu juhis; leheküljed eraldatakse vastuses PAGE_DELIMITER ridadega
+BATCH_PROMPT_TEXT = (
+    "Järgmises sõnumis on {count} lehekülge, igaüks märgendiga '--- LEHEKÜLG n/{count} ---'.\n"
+    "Transkribeeri iga lehekülg eraldi samade reeglite järgi. Alusta iga lehekülje transkriptsiooni "
+    "eraldi real märgendiga '=== LEHEKÜLG n ===' (n = lehekülje number) ja ära lisa midagi muud.\n"
+)
+PAGE_DELIMITER = "=== LEHEKÜLG {number} ==="
+PAGE_DELIMITER_RE = re.compile(r'^[ \t]*=== LEHEKÜLG (\d+) ===[ \t]*$', re.MULTILINE)
+
+
+class OcrBlockedError(Exception):
+    """API blokeeris päringu (prompt_feedback.block_reason); uuesti proovida pole mõtet."""
+
+
+class BatchSplitError(ValueError):
+    """Mitme lehekülje vastust ei õnnestunud lehekülgedeks jagada."""
+
+
+def clean_response_text(text):
+    """Eemaldab mudeli vastuse ümbert ```markdown / ``` piirded."""
+    cleaned_text = text.strip()
+    if cleaned_text.startswith("```markdown"):
+        cleaned_text = cleaned_text[len("```markdown"):].strip()
+    if cleaned_text.startswith("```"):
+         cleaned_text = cleaned_text[len("```"):].strip()
+    if cleaned_text.endswith("```"):
+        cleaned_text = cleaned_text[:-len("```")].strip()
+    return cleaned_text
+
+
+def split_batch_response(text, count):
+    """
+    Jagab mitme lehekülje vastuse lehekülgedeks PAGE_DELIMITER märgendite järgi.
+
+    Kontrollib, et märgendid on 1..count õiges järjekorras, enne esimest
+    märgendit pole teksti ja ükski lehekülg pole tühi; muidu BatchSplitError.
+    """
+    matches = list(PAGE_DELIMITER_RE.finditer(text))
+    numbers = [int(match.group(1)) for match in matches]
+    if numbers != list(range(1, count + 1)):
+        raise BatchSplitError(f"Ootasin lehekülgi 1..{count}, vastuses märgendid {numbers}")
+    if text[:matches[0].start()].strip():
+        raise BatchSplitError("Vastuses on tekst enne esimest lehekülje märgendit")
+    pages = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        page = clean_response_text(text[match.end():following.start() if following else len(text)])
+        if not page:
+            raise BatchSplitError(f"Lehekülg {match.group(1)} on vastuses tühi")
+        pages.append(page)
+    return pages
+
+
+# --- Ettevalmistuse aja mõõdik ---
+class SetupMetrics:
+    """Kogub lõimede vahel lehekülje ettevalmistuse aegu (mudel, näited, pilt, sõnumid)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.times = []
+
+    def record(self, seconds):
+        with self._lock:
+            self.times.append(seconds)
+
+    def summary(self):
+        """Kokkuvõte millisekundites."""
+        with self._lock:
+            times = list(self.times)
+        if not times:
+            return "Ettevalmistuse mõõtmisi pole."
+        return (f"Ettevalmistus lehekülje kohta: keskmine {sum(times) / len(times) * 1000:.1f} ms, "
+                f"max {max(times) * 1000:.1f} ms ({len(times)} lk)")
+
+
+class TokenUsage:
+    """Kogub API vastuste tokenite arvu (usage_metadata) ja transkribeeritud lehekülgi."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.pages = 0
+        self.requests = 0
+
+    def record(self, response, pages):
+        usage = getattr(response, 'usage_metadata', None)
+        with self._lock:
+            self.requests += 1
+            self.pages += pages
+            if usage is not None:
+                self.prompt_tokens += getattr(usage, 'prompt_token_count', 0) or 0
+                self.output_tokens += getattr(usage, 'candidates_token_count', 0) or 0
+
+    def summary(self):
+        with self._lock:
+            if not self.pages:
+                return "Tokenite mõõtmisi pole."
+            return (f"Tokenid lehekülje kohta: sisend {self.prompt_tokens / self.pages:.0f}, "
+                    f"väljund {self.output_tokens / self.pages:.0f} "
+                    f"({self.pages} lk, {self.requests} päringut)")
+
+
+# --- OCR sessioon: mudel ja few-shot näited valmistatakse ette üks kord ---
+class OcrSession:
+    """
+    Hoiab seadistatud Gemini mudelit ja valmis few-shot vestlusajalugu.
+
+    Näidete pildid loetakse kettalt üks kord ja antakse API-le valmis
+    kodeeritud baitidena (mime_type + data), nii et iga lehekülje jaoks ei
+    avata ega kodeerita neid uuesti. Pärast loomist sessiooni ei muudeta,
+    seega võivad seda kasutada mitu lõime korraga.
+
+    tracer (moodikud.Tracer) kirjutab iga päringu latentsuse, tokenid ja
+    tulemuse JSONL jälge.
+    """
+
+    def __init__(self, api_key, examples, model_name=MODEL_NAME, tracer=None):
+        start = time.perf_counter()
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+        self.few_shot_messages = self._load_examples(examples)
+        self.prompt_version = prompt_version(examples)
+        self.init_time = time.perf_counter() - start
+        self.metrics = SetupMetrics()
+        self.usage = TokenUsage()
+        self.tracer = tracer or Tracer()
+        # Originaalpilt -> eeltöödeldud pilt (vt enable_preprocessing)
+        self.upload_paths = {}
+
+    @staticmethod
+    def _load_examples(examples):
+        """Loob näidetest "user" -> "model" sõnumipaarid."""
+        messages = []
+        for i, example in enumerate(examples):
+            try:
+                with open(example["image"], "rb") as f:
+                    image_blob = {
+                        "mime_type": mimetypes.guess_type(example["image"])[0] or "image/jpeg",
+                        "data": f.read(),
+                    }
+                with open(example["text"], "r", encoding="utf-8") as f:
+                    example_text = f.read()
+
+                # Esimese näitega anname kaasa ka peamised juhised
+                if i == 0:
+                    user_message_parts = [INITIAL_PROMPT_TEXT, image_blob]
+                else:
+                    user_message_parts = [image_blob]
+
+                messages.append({'role': 'user', 'parts': user_message_parts})
+                messages.append({'role': 'model', 'parts': [example_text]})
+
+            except Exception as e:
+                print(f"Hoiatus: Viga näite '{example.get('image', 'N/A')}' töötlemisel: {e}. Jätkan ilma selleta.")
+        return messages
+
+    def upload_path(self, image_path):
+        """Tee, mille pilt API-le saadetakse: eeltöödeldud koopia, kui see on olemas."""
+        return self.upload_paths.get(image_path, image_path)
+
+    def build_messages(self, page_parts):
+        """Few-shot ajalugu + transkribeeritav lehekülg viimase kasutaja sõnumina."""
+        return self.few_shot_messages + [{'role': 'user', 'parts': list(page_parts)}]
+
+    def transcribe(self, image_path):
+        """
+        Üks API päring ühe lehekülje jaoks, ilma uuestiproovimiseta.
+
+        Tagastab puhastatud teksti. Vea korral tõstab erindi (API vead
+        edasi, OcrBlockedError blokeeritud päringu korral), et kutsuja saaks
+        ise otsustada ootamise ja uuesti proovimise üle.
+        """
+        setup_start = time.perf_counter()
+        img = PIL.Image.open(self.upload_path(image_path))
+        messages = self.build_messages([img])
+        self.metrics.record(time.perf_counter() - setup_start)
+
+        with self.tracer.request("ocr", [image_path], self.model_name, self.prompt_version) as span:
+            response = self.model.generate_content(messages)
+            span.response(response)
+            self.usage.record(response, 1)
+            return self._traced_text(span, response, os.path.basename(image_path))
+
+    def transcribe_batch(self, image_paths):
+        """
+        Üks API päring mitme lehekülje jaoks: few-shot eesliide saadetakse
+        üks kord, leheküljed märgenditega ühes kasutaja sõnumis.
+
+        Tagastab tekstide listi piltide järjekorras. Kui vastust ei õnnestu
+        lehekülgedeks jagada, tõstab BatchSplitError.
+        """
+        setup_start = time.perf_counter()
+        count = len(image_paths)
+        parts = [BATCH_PROMPT_TEXT.format(count=count)]
+        for number, image_path in enumerate(image_paths, 1):
+            parts.append(f"--- LEHEKÜLG {number}/{count} ---")
+            parts.append(PIL.Image.open(self.upload_path(image_path)))
+        messages = self.build_messages(parts)
+        self.metrics.record(time.perf_counter() - setup_start)
+
+        label = f"{os.path.basename(image_paths[0])}..{os.path.basename(image_paths[-1])}"
+        with self.tracer.request("ocr_batch", image_paths, self.model_name, self.prompt_version) as span:
+            response = self.model.generate_content(messages)
+            span.response(response)
+            self.usage.record(response, count)
+            text = self._traced_text(span, response, label)
+            try:
+                return split_batch_response(text, count)
+            except BatchSplitError:
+                span.outcome = 'split_error'
+                raise
+
+    @classmethod
+    def _traced_text(cls, span, response, label):
+        """_response_text, mille blokeeritud/tühi tulemus märgitakse jälge."""
+        try:
+            return cls._response_text(response, label)
+        except OcrBlockedError:
+            span.outcome = 'blocked'
+            raise
+        except ValueError:
+            span.outcome = 'empty'
+            raise
+
+    @staticmethod
+    def _response_text(response, label):
+        if response and hasattr(response, 'text') and response.text:
+            cleaned_text = clean_response_text(response.text)
+            if cleaned_text:
+                return cleaned_text
+            raise ValueError(f"Mudel tagastas tühja teksti faili {label} jaoks.")
+        if response and hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason:
+            raise OcrBlockedError(f"API päring blokeeriti faili {label} jaoks. Põhjus: {response.prompt_feedback.block_reason}")
+        raise ValueError(f"API ei tagastanud oodatud tekstivastust faili {label} jaoks. Vastus: {response}")
+
+
+# --- Kohalik asendustaust testimiseks ---
+class StubOcrBackend:
+    """
+    Gemini asendaja: ootab juhusliku latentsusega ja tekitab soovi korral vigu.
+
+    Kui pildi kõrval on samanimeline .txt fail, tagastatakse selle sisu,
+    muidu lühike asendustekst. Sobib draiverite testimiseks ilma API-ta.
+
+    Args:
+        latency: Keskmine latentsus sekundites.
+        jitter: Latentsuse juhuslik kõikumine (+/- sekundit).
+        error_rate: Tavaliste (ajutiste) vigade tõenäosus.
+        rate_limit_rate: 429 vigade tõenäosus.
+        max_concurrency: Kui samaaegseid päringuid on rohkem, tagastatakse 429
+            (nagu kvoodiga teenus).
+        prefix_tokens, page_tokens: Näiliste tokenite arv few-shot eesliite ja
+            lehekülje kohta (TokenUsage aruande jaoks).
+        split_error_rate: Tõenäosus, et mitme lehekülje vastus on vigaste märgenditega.
+    """
+
+    def __init__(self, latency=0.5, jitter=0.2, error_rate=0.0, rate_limit_rate=0.0, max_concurrency=None, seed=None,
+                 prefix_tokens=2500, page_tokens=1500, split_error_rate=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.max_concurrency = max_concurrency
+        self.model_name = 'stub'
+        self.prompt_version = 'stub'
+        self.metrics = SetupMetrics()
+        self.usage = TokenUsage()
+        self.tracer = Tracer()
+        self.prefix_tokens = prefix_tokens
+        self.page_tokens = page_tokens
+        self.split_error_rate = split_error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def transcribe(self, image_path):
+        return self._call([image_path])[0]
+
+    def transcribe_batch(self, image_paths):
+        return self._call(image_paths)
+
+    def _call(self, image_paths):
+        kind = "ocr" if len(image_paths) == 1 else "ocr_batch"
+        with self.tracer.request(kind, image_paths, self.model_name, self.prompt_version) as span:
+            try:
+                return self._respond(image_paths, span)
+            except BatchSplitError:
+                span.outcome = 'split_error'
+                raise
+
+    def _respond(self, image_paths, span):
+        with self._lock:
+            self._in_flight += 1
+            overloaded = self.max_concurrency is not None and self._in_flight > self.max_concurrency
+            roll = self._random.random()
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        try:
+            time.sleep(delay)
+            if overloaded or roll < self.rate_limit_rate:
+                raise RateLimitError("429 Resource exhausted (stub)")
+            if roll < self.rate_limit_rate + self.error_rate:
+                raise RuntimeError("500 Internal error (stub)")
+            usage = type('Usage', (), {
+                'prompt_token_count': self.prefix_tokens + self.page_tokens * len(image_paths),
+                'candidates_token_count': 0,
+            })
+            response = type('Response', (), {'usage_metadata': usage})
+            span.response(response)
+            self.usage.record(response, len(image_paths))
+            texts = [self._page_text(path) for path in image_paths]
+            if len(image_paths) == 1:
+                return texts
+            if self._random.random() < self.split_error_rate:
+                raise BatchSplitError("Vigased lehekülje märgendid (stub)")
+            return texts
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    @staticmethod
+    def _page_text(image_path):
+        text_path = os.path.splitext(image_path)[0] + ".txt"
+        if os.path.exists(text_path):
+            with open(text_path, "r", encoding="utf-8") as f:
+                return f.read()
+        return f"[stub] {os.path.basename(image_path)}"
+
+
+# --- Jätkatavad käivitused: manifest ja vigade päevik ---
+def prompt_version(examples):
+    """Juhiste ja few-shot näidete sisuräsi; muutub, kui prompt või näited muutuvad."""
+    digest = hashlib.sha256(INITIAL_PROMPT_TEXT.encode("utf-8"))
+    for example in examples:
+        for key in ("image", "text"):
+            try:
+                digest.update(file_sha256(example[key]).encode("ascii"))
+            except (OSError, KeyError):
+                digest.update(b"-")
+    return digest.hexdigest()[:12]
+
+
+def preprocessed_version(version, preprocess):
+    """Eeltöötluse seaded on osa prompti versioonist: muutunud seaded tähendavad uut OCR-i."""
+    if preprocess is None:
+        return version
+    return f"{version}+pp{options_key(resolve_options(preprocess))}"
+
+
+def apply_preprocessing(backend, image_files, cache_dir, preprocess):
+    """Eeltöötleb pildid ja seob need taustaga (kui taust toetab upload_paths vastendust)."""
+    if preprocess is None or not image_files:
+        return
+    mapping, _ = preprocess_images(image_files, cache_dir, preprocess)
+    if hasattr(backend, 'upload_paths'):
+        backend.upload_paths.update(mapping)
+
+
+def output_txt_path(image_path, output_folder):
+    """Pildi transkriptsiooni tee: <output_folder>/<pildi nimi>.txt"""
+    filename_without_ext = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(output_folder, filename_without_ext + ".txt")
+
+
+def save_low_confidence_text(image_path, output_folder, error):
+    """
+    Kohaliku OCR-i ebakindel tekst kõrvalfaili <nimi>.txt.ebakindel (mitte
+    .txt, et lehekülge valmis ei loetaks). Tagastab faili tee või None.
+    """
+    if not getattr(error, 'text', None):
+        return None
+    path = output_txt_path(image_path, output_folder) + ".ebakindel"
+    atomic_write(path, error.text)
+    return path
+
+
+class OcrRunState:
+    """
+    OCR käivituse olek väljundkaustas, et katkenud töö saaks jätkata.
+
+    - Manifest (.ocr_manifest.json): võti "<pildi räsi>:<prompti versioon>:<mudel>"
+      -> valmis transkriptsioon. Sellised leheküljed jäetakse vahele.
+    - Vigade päevik (ocr_failures.jsonl): iga ebaõnnestumine ja hilisem
+      õnnestumine lisatakse reana, nii et päevik säilib ka krahhi korral.
+      --retry-failed töötleb ainult lehekülgi, mille viimane olek on "failed".
+
+    Lõimede vahel jagamiseks on meetodid lukuga.
+    """
+
+    MANIFEST_NAME = ".ocr_manifest.json"
+    JOURNAL_NAME = "ocr_failures.jsonl"
+
+    def __init__(self, output_folder, model_name, prompt_version):
+        self.output_folder = output_folder
+        self.model_name = model_name
+        self.prompt_version = prompt_version
+        self.manifest = Manifest(os.path.join(output_folder, self.MANIFEST_NAME))
+        self.journal_path = os.path.join(output_folder, self.JOURNAL_NAME)
+        self._keys = {}
+        self._lock = threading.Lock()
+        self._failed = self.pending_failures()
+
+    def page_key(self, image_path):
+        key = self._keys.get(image_path)
+        if key is None:
+            key = f"{file_sha256(image_path)}:{self.prompt_version}:{self.model_name}"
+            self._keys[image_path] = key
+        return key
+
+    def is_done(self, image_path):
+        entry = self.manifest.get(self.page_key(image_path))
+        return bool(entry) and os.path.exists(output_txt_path(image_path, self.output_folder))
+
+    def pending_failures(self):
+        """Pildid (teed), mille viimane päevikukirje on "failed"."""
+        last_status = {}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        last_status[entry["image"]] = entry["status"]
+        return {image for image, status in last_status.items() if status == "failed"}
+
+    def select_pages(self, image_files, retry_failed=False):
+        """Jätab välja valmis leheküljed; retry_failed korral võtab ainult päeviku vead."""
+        if retry_failed:
+            image_files = [path for path in image_files if path in self._failed]
+
+        # Enne manifesti tehtud transkriptsioonid võetakse manifesti üle
+        known_images = {entry["image"] for entry in self.manifest.entries.values()}
+        pending = []
+        for path in image_files:
+            if self.is_done(path):
+                continue
+            txt_path = output_txt_path(path, self.output_folder)
+            if path not in known_images and path not in self._failed and os.path.exists(txt_path):
+                self.mark_done(path, txt_path)
+                continue
+            pending.append(path)
+        skipped = len(image_files) - len(pending)
+        if skipped:
+            print(f"Jätan vahele {skipped} juba transkribeeritud lehekülge (manifest).")
+        return pending
+
+    def _journal(self, entry):
+        entry["time"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def mark_done(self, image_path, txt_path):
+        key = self.page_key(image_path)
+        with self._lock:
+            self.manifest[key] = {
+                "image": image_path,
+                "output": os.path.basename(txt_path),
+                "finished": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            }
+            self.manifest.save()
+            if image_path in self._failed:
+                self._failed.discard(image_path)
+                self._journal({"image": image_path, "key": key, "status": "resolved"})
+
+    def record_failure(self, image_path, error, **details):
+        with self._lock:
+            self._failed.add(image_path)
+            self._journal({"image": image_path, "key": self.page_key(image_path), "status": "failed", "error": str(error),
+                           **details})
+
+
 # --- Funktsioon pildi OCR-imiseks koos uuestiproovimisega ---
-def ocr_image(image_path, api_key, examples, max_retries=1, retry_delay=3):
+def ocr_image(image_path, api_key, examples, max_retries=1, retry_delay=3, session=None, metrics=None):
     """
     OCR-ib pildi Gemini API abil, kasutades vestlusajaloo vormis few-shot näiteid
     ja proovides vea korral uuesti.
@@ -18,13 +519,22 @@ def ocr_image(image_path, api_key, examples, max_retries=1, retry_delay=3):
         examples: List sõnastikest, kus iga sõnastik on üks näide.
         max_retries (int): Maksimaalne uuestiproovimiste arv peale esimest katset.
         retry_delay (int): Viivitus sekundites enne uuesti proovimist.
+        session: Jagatud OcrSession või muu taust (ocr_taustad: Tesseract,
+            RoutingBackend). Kui puudub, luuakse selle lehekülje jaoks uus
+            OcrSession (vana käitumine: mudel ja näited valmistatakse iga kord).
+        metrics: SetupMetrics, kuhu ettevalmistuse aeg kirjutada
+            (vaikimisi sessiooni oma).
     """
-    genai.configure(api_key=api_key)
-    # Alustame Flashiga, mis on kiirem ja odavam.
-    model = genai.GenerativeModel('gemini-2.5-flash')
+    setup_start = time.perf_counter()
+    if session is None:
+        session = OcrSession(api_key, examples)
+    if not isinstance(session, OcrSession):
+        return _transcribe_with_retries(session, image_path, max_retries, retry_delay)
+    metrics = metrics or session.metrics
+    model = session.model
 
     try:
-        img = PIL.Image.open(image_path)
+        img = PIL.Image.open(session.upload_path(image_path))
     except FileNotFoundError:
         print(f"Viga: Faili ei leitud: {image_path}")
         return None
@@ -35,58 +545,25 @@ def ocr_image(image_path, api_key, examples, max_retries=1, retry_delay=3):
         print(f"Viga pildi avamisel {image_path}: {e}")
         return None
 
-    # --- MUUDETUD OSA ALGUS ---
-
-    # Koostame juhised üheks tekstiks
-    initial_prompt_text = (
-        "Järgi neid reegleid täpselt, et transkribeerida see tekst:\n"
-        "1. **Roll:** Sa oled täpne transkribeerija. Sinu ülesanne on ainult transkribeerida tekst etteantud pildifailil.\n"
-        "2. **Täpsus:** Kopeeri tekst tähemärgi täpsusega. Säilita kõik algne tekst, lühendid ja kahtlased või vigasena näivad kohad muutumatul kujul.\n"
-        "3. **Keelud:** ÄRA paranda arvatavaid kirjavigu. ÄRA moderniseeri keelt. ÄRA lisa omapoolseid kommentaare ega selgitusi ja ÄRA mingil juhul võta few shot näidete teksti transkriptsiooni kaasa. Trankriptsioon peab olema vaid etteantud transkribeeritavast pildifailist.\n"
-    )
-
-    # Loome vestluse ajaloo vormis sõnumite listi
-    messages = []
-
-    # Lisame näited "user" -> "model" paaridena
-    for i, example in enumerate(examples):
-        try:
-            example_img = PIL.Image.open(example["image"])
-            with open(example["text"], "r", encoding="utf-8") as f:
-                example_text = f.read()
-
-            # Esimese näitega anname kaasa ka peamised juhised
-            if i == 0:
-                user_message_parts = [initial_prompt_text, example_img]
-            else:
-                user_message_parts = [example_img]
-
-            messages.append({'role': 'user', 'parts': user_message_parts})
-            messages.append({'role': 'model', 'parts': [example_text]})
-
-        except Exception as e:
-            print(f"Hoiatus: Viga näite '{example.get('image', 'N/A')}' töötlemisel: {e}. Jätkan ilma selleta.")
-
-    # Lõpuks lisame päris pildi, mida on vaja transkribeerida, viimase kasutaja sõnumina
-    messages.append({'role': 'user', 'parts': [img]})
-
-    # --- MUUDETUD OSA LÕPP ---
+    # Vestluse ajalugu: valmis few-shot näited + päris pilt viimase kasutaja sõnumina
+    messages = session.build_messages([img])
+    metrics.record(time.perf_counter() - setup_start)
 
     for attempt in range(max_retries + 1):
         try:
             # Vähendame väljundit veidi, et logi oleks selgem
             # print(f"Alustan API päringut failile {os.path.basename(image_path)} (katse {attempt + 1}/{max_retries + 1})...")
-            response = model.generate_content(messages)
-
-            if response and hasattr(response, 'text') and response.text:
-                cleaned_text = response.text.strip()
-                if cleaned_text.startswith("```markdown"):
-                    cleaned_text = cleaned_text[len("```markdown"):].strip()
-                if cleaned_text.startswith("```"):
-                     cleaned_text = cleaned_text[len("```"):].strip()
-                if cleaned_text.endswith("```"):
-                    cleaned_text = cleaned_text[:-len("```")].strip()
+            with session.tracer.request("ocr", [image_path], session.model_name, session.prompt_version) as span:
+                response = model.generate_content(messages)
+                span.response(response)
+                has_text = response and hasattr(response, 'text') and response.text
+                cleaned_text = clean_response_text(response.text) if has_text else None
+                if not cleaned_text:
+                    blocked = not has_text and response and hasattr(response, 'prompt_feedback') and response.prompt_feedback.block_reason
+                    span.outcome = 'blocked' if blocked else 'empty'
+            session.usage.record(response, 1)
 
+            if has_text:
                 if cleaned_text:
                     # Edukas päring, ei prindi siin, vaid process_image's
                     return cleaned_text
@@ -121,19 +598,37 @@ def ocr_image(image_path, api_key, examples, max_retries=1, retry_delay=3):
     return None # Tagasta None, kui kõik katsed ebaõnnestusid
 
 
+def _transcribe_with_retries(backend, image_path, max_retries, retry_delay):
+    """ocr_image muude taustade jaoks: backend.transcribe koos uuestiproovimisega."""
+    name = os.path.basename(image_path)
+    for attempt in range(max_retries + 1):
+        try:
+            return backend.transcribe(image_path)
+        except (OcrBlockedError, LowConfidenceError) as e:
+            print(f"{e}")
+            return None
+        except Exception as e:
+            error_msg = f"Viga OCR-il (katse {attempt + 1}) faili {name} jaoks: {e}"
+            if attempt < max_retries:
+                print(f"{error_msg} Proovin uuesti {retry_delay} sekundi pärast...")
+                time.sleep(retry_delay)
+            else:
+                print(f"Lõplikult ebaõnnestus peale {max_retries + 1} katset failiga {name}. Põhjus: {error_msg}")
+    return None
+
+
 # --- Funktsioon ühe pildi töötlemiseks ja salvestamiseks ---
 # --- MUUDETUD: Tagastab True/False ---
-def process_image(image_path, api_key, output_folder, examples):
+def process_image(image_path, api_key, output_folder, examples, session=None, metrics=None, max_retries=1):
     """
     Töötleb ühte pilti: OCR ja salvestab teksti faili.
     Tagastab True, kui õnnestus, False kui ebaõnnestus.
     """
     print(f"Alustan töötlemist: {os.path.basename(image_path)}")
-    text = ocr_image(image_path, api_key, examples) # Kasutab vaikimisi retries=1
+    text = ocr_image(image_path, api_key, examples, max_retries=max_retries, session=session, metrics=metrics)
 
     if text:
-        filename_without_ext = os.path.splitext(os.path.basename(image_path))[0]
-        txt_filepath = os.path.join(output_folder, filename_without_ext + ".txt")
+        txt_filepath = output_txt_path(image_path, output_folder)
         try:
             with open(txt_filepath, "w", encoding="utf-8") as f:
                 f.write(text)
@@ -153,7 +648,8 @@ def process_image(image_path, api_key, output_folder, examples):
 
 # --- Paralleeltöötluse abifunktsioon (töötaja) ---
 # --- MUUDETUD: Lisab ebaõnnestunud failid listi ---
-def worker(q, api_key, output_folder, examples, failed_files_list, list_lock):
+def worker(q, api_key, output_folder, examples, failed_files_list, list_lock, session=None, metrics=None, state=None,
+           max_retries=1):
     """Töötaja funktsioon, mis võtab järjekorrast ülesandeid ja lisab ebaõnnestumised listi."""
     while True:
         try:
@@ -163,16 +659,23 @@ def worker(q, api_key, output_folder, examples, failed_files_list, list_lock):
 
         try:
             # Kutsu process_image ja saa teada, kas õnnestus
-            success = process_image(image_path, api_key, output_folder, examples)
+            success = process_image(image_path, api_key, output_folder, examples, session=session, metrics=metrics,
+                                    max_retries=max_retries)
             if not success:
                 # Lisa ebaõnnestunud faili tee listi (kasutades lukku)
                 with list_lock:
                     failed_files_list.append(image_path)
+                if state:
+                    state.record_failure(image_path, "OCR ebaõnnestus")
+            elif state:
+                state.mark_done(image_path, output_txt_path(image_path, output_folder))
         except Exception as e:
             # Püüa kinni ootamatud vead process_image tasemel ja lisa ikkagi listi
             print(f"Ootamatu viga töötlemisel {os.path.basename(image_path)}: {e}")
             with list_lock:
                 failed_files_list.append(image_path)
+            if state:
+                state.record_failure(image_path, e)
         finally:
             # Veendu, et task_done kutsutakse alati
              try:
@@ -182,12 +685,37 @@ def worker(q, api_key, output_folder, examples, failed_files_list, list_lock):
                   pass
 
 
+def find_image_files(folder_path):
+    """Kausta JPG/PNG pildid sorteeritud järjekorras."""
+    return sorted(
+        os.path.join(folder_path, f)
+        for f in os.listdir(folder_path)
+        if f.lower().endswith(('.jpg', '.jpeg', '.png'))
+    )
+
+
 # --- Funktsioon piltide töötlemiseks kaustast paralleelselt ---
 # --- MUUDETUD: Tagastab ebaõnnestunud failide listi ---
-def ocr_images_from_folder_parallel(folder_path, api_key, output_folder, examples, num_workers=4):
+def ocr_images_from_folder_parallel(folder_path, api_key, output_folder, examples, num_workers=4, shared_session=True,
+                                    resume=True, retry_failed=False, preprocess=None, preprocess_cache=None,
+                                    session=None, max_retries=1):
     """
     Töötleb kõik JPG/PNG pildid antud kaustas paralleelselt kasutades lõimesid.
     Tagastab listi failidest, mille töötlemine ebaõnnestus.
+
+    shared_session=True korral luuakse üks OcrSession, mida kõik lõimed
+    jagavad; False korral valmistatakse mudel ja näited iga lehekülje jaoks
+    uuesti (vana käitumine, võrdlusmõõtmiseks).
+
+    resume=True korral jäetakse manifestis olevad leheküljed vahele ja vead
+    kirjutatakse päevikusse (vt OcrRunState); retry_failed töötleb ainult
+    päevikus ootel olevaid vigu.
+
+    preprocess (eeltootlus seaded või None) korral eeltöödeldakse ootel
+    pildid enne üleslaadimist; vajab jagatud sessiooni.
+
+    session: valmis OcrSession (nt võrdlusmõõtmiseks salvestatud vastustega);
+    max_retries: uuestiproovimiste arv lehekülje kohta (ocr_image).
     """
     if not os.path.isdir(folder_path):
         print(f"Viga: Sisendkausta ei leitud: {folder_path}")
@@ -203,17 +731,28 @@ def ocr_images_from_folder_parallel(folder_path, api_key, output_folder, example
     failed_files = [] # List ebaõnnestunud failide kogumiseks
     failed_files_lock = threading.Lock() # Lukk listi kaitsmiseks
 
-    image_files = [
-        os.path.join(folder_path, f)
-        for f in os.listdir(folder_path)
-        if f.lower().endswith(('.jpg', '.jpeg', '.png'))
-    ]
+    image_files = find_image_files(folder_path)
 
     if not image_files:
         print(f"Kaustast {folder_path} ei leitud töödeldavaid pilte (.jpg, .jpeg, .png).")
         return []
 
-    print(f"Leidsin {len(image_files)} pilti. Alustan töötlemist {num_workers} lõimega...")
+    if session is None and shared_session:
+        session = OcrSession(api_key, examples)
+    metrics = getattr(session, 'metrics', None) or SetupMetrics()
+    if preprocess is not None and session is None:
+        print("Hoiatus: eeltöötlus vajab jagatud sessiooni, saadan originaalpildid.")
+        preprocess = None
+
+    state = None
+    if resume:
+        version = preprocessed_version(session.prompt_version if session else prompt_version(examples), preprocess)
+        state = OcrRunState(output_folder, session.model_name if session else MODEL_NAME, version)
+        image_files = state.select_pages(image_files, retry_failed=retry_failed)
+
+    apply_preprocessing(session, image_files, preprocess_cache or os.path.join(output_folder, ".eeltootlus"), preprocess)
+
+    print(f"Leidsin {len(image_files)} töödeldavat pilti. Alustan töötlemist {num_workers} lõimega...")
 
     for image_path in image_files:
         q.put(image_path)
@@ -221,33 +760,350 @@ def ocr_images_from_folder_parallel(folder_path, api_key, output_folder, example
     threads = []
     for i in range(num_workers):
         # Anna workerile kaasa list ja lukk
-        t = threading.Thread(target=worker, args=(q, api_key, output_folder, examples, failed_files, failed_files_lock), name=f"Worker-{i+1}")
+        t = threading.Thread(target=worker, args=(q, api_key, output_folder, examples, failed_files, failed_files_lock, session, metrics, state, max_retries), name=f"Worker-{i+1}")
         t.daemon = True
         t.start()
         threads.append(t)
 
     q.join() # Oota, kuni kõik järjekorras olevad ülesanded on lõpetatud
     print("\nKõik järjekorras olevad ülesanded on lõpetatud.")
+    print(metrics.summary())
+    if isinstance(session, OcrSession):
+        print(session.usage.summary())
+        print(f"Sessiooni loomine (üks kord): {session.init_time * 1000:.1f} ms")
 
     # Tagasta kogutud ebaõnnestunud failide nimekiri
     return failed_files
 
 
+# --- asyncio draiver: kohanduv samaaegsus ja kiiruspiirang ---
+async def _ocr_one_async(image_path, backend, output_folder, bucket, concurrency, tokens_per_page, max_retries, stats, state=None):
+    """Ühe lehekülje OCR koos ootamise ja uuestiproovimisega. Tagastab True/False."""
+    name = os.path.basename(image_path)
+    for attempt in range(max_retries + 1):
+        await bucket.acquire(tokens_per_page)
+        await concurrency.acquire()
+        start = time.perf_counter()
+        try:
+            text = await asyncio.to_thread(backend.transcribe, image_path)
+        except LowConfidenceError as e:
+            print(f"{e}")
+            sidecar = save_low_confidence_text(image_path, output_folder, e)
+            if state:
+                state.record_failure(image_path, e, confidence=e.confidence, local_text=sidecar)
+            return False
+        except OcrBlockedError as e:
+            print(f"{e}")
+            if state:
+                state.record_failure(image_path, e)
+            return False
+        except Exception as e:
+            if is_rate_limit_error(e):
+                stats['rate_limited'] += 1
+                await concurrency.on_overload()
+            else:
+                stats['errors'] += 1
+            if attempt < max_retries:
+                delay = backoff_delay(attempt)
+                stats['retries'] += 1
+                print(f"Viga faili {name} jaoks (katse {attempt + 1}): {e}. Proovin uuesti {delay:.1f} s pärast "
+                      f"(samaaegsus {concurrency.limit})...")
+                await asyncio.sleep(delay)
+                continue
+            print(f"Lõplikult ebaõnnestus peale {max_retries + 1} katset failiga {name}. Põhjus: {e}")
+            if state:
+                state.record_failure(image_path, e)
+            return False
+        else:
+            latency = time.perf_counter() - start
+            stats['latencies'].append(latency)
+            await concurrency.on_success(latency)
+        finally:
+            await concurrency.release()
+
+        return _save_page(image_path, text, output_folder, state,
+                          f"{latency:.1f} s, samaaegsus {concurrency.limit}")
+    return False
+
+
+def _save_page(image_path, text, output_folder, state, note):
+    """Kirjutab lehekülje teksti atomaarselt ja märgib selle manifestis tehtuks."""
+    txt_filepath = output_txt_path(image_path, output_folder)
+    try:
+        atomic_write(txt_filepath, text)
+    except Exception as e:
+        print(f"Viga faili kirjutamisel {txt_filepath}: {e}")
+        if state:
+            state.record_failure(image_path, e)
+        return False
+    if state:
+        state.mark_done(image_path, txt_filepath)
+    # Varasema võrguta läbimise ebakindel tekst on nüüd asendatud
+    if os.path.exists(txt_filepath + ".ebakindel"):
+        os.remove(txt_filepath + ".ebakindel")
+    print(f"Tekst failist {os.path.basename(image_path)} salvestatud: {txt_filepath} ({note})")
+    return True
+
+
+async def _ocr_batch_async(image_paths, backend, output_folder, bucket, concurrency, tokens_per_page, max_retries, stats, state=None):
+    """
+    Mitu lehekülge ühe päringuga (backend.transcribe_batch). Kui vastust ei
+    õnnestu lehekülgedeks jagada, töödeldakse leheküljed ükshaaval.
+    Tagastab True/False iga lehekülje kohta.
+    """
+    label = f"{os.path.basename(image_paths[0])}..{os.path.basename(image_paths[-1])}"
+    for attempt in range(max_retries + 1):
+        await bucket.acquire(tokens_per_page * len(image_paths))
+        await concurrency.acquire()
+        start = time.perf_counter()
+        try:
+            texts = await asyncio.to_thread(backend.transcribe_batch, image_paths)
+        except BatchSplitError as e:
+            stats['batch_fallbacks'] += 1
+            print(f"Partii {label} vastust ei õnnestunud jagada ({e}). Töötlen leheküljed ükshaaval...")
+            break
+        except OcrBlockedError as e:
+            print(f"{e}. Töötlen leheküljed ükshaaval...")
+            break
+        except Exception as e:
+            if is_rate_limit_error(e):
+                stats['rate_limited'] += 1
+                await concurrency.on_overload()
+            else:
+                stats['errors'] += 1
+            if attempt < max_retries:
+                delay = backoff_delay(attempt)
+                stats['retries'] += 1
+                print(f"Viga partii {label} jaoks (katse {attempt + 1}): {e}. Proovin uuesti {delay:.1f} s pärast "
+                      f"(samaaegsus {concurrency.limit})...")
+                await asyncio.sleep(delay)
+                continue
+            print(f"Partii {label} ebaõnnestus peale {max_retries + 1} katset ({e}). Töötlen leheküljed ükshaaval...")
+            break
+        else:
+            latency = time.perf_counter() - start
+            stats['latencies'].append(latency)
+            await concurrency.on_success(latency)
+        finally:
+            await concurrency.release()
+
+        note = f"partii {len(image_paths)} lk, {latency:.1f} s, samaaegsus {concurrency.limit}"
+        return [_save_page(path, text, output_folder, state, note) for path, text in zip(image_paths, texts)]
+
+    return await asyncio.gather(*[
+        _ocr_one_async(path, backend, output_folder, bucket, concurrency, tokens_per_page, max_retries, stats, state)
+        for path in image_paths
+    ])
+
+
+async def ocr_images_async(image_files, backend, output_folder, requests_per_minute=60, tokens_per_minute=None,
+                           tokens_per_page=3000, initial_concurrency=2, max_concurrency=16,
+                           target_latency=30.0, max_retries=3, resume=True, retry_failed=False,
+                           preprocess=None, preprocess_cache=None, batch_size=1):
+    """
+    OCR-ib pildid asyncio abil. Samaaegsus kohandub (AIMD): kasvab, kui
+    latentsus on alla target_latency, ja poolitub 429/kvoodivigade korral.
+    Päringuid piirab token-bucket (päringud ja tokenid minutis) ning vigade
+    korral oodatakse eksponentsiaalselt kasvava juhusliku aja.
+
+    Args:
+        image_files: Piltide teed.
+        backend: Objekt meetodiga transcribe(image_path) -> str (OcrSession,
+            StubOcrBackend vms); kutsutakse lõimes.
+        resume: Jäta manifestis olevad leheküljed vahele, kirjuta vead päevikusse.
+        retry_failed: Töötle ainult päevikus ootel olevaid vigu.
+        preprocess: eeltootlus seaded või None; eeltöödeldud pildid vahemälus
+            preprocess_cache (vaikimisi <output_folder>/.eeltootlus).
+        batch_size: Lehekülgi ühes päringus (K). K > 1 korral saadetakse
+            few-shot eesliide üks kord K lehekülje kohta (backend.transcribe_batch).
+
+    Returns:
+        (ebaõnnestunud failide list, statistika sõnastik)
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    state = None
+    if resume:
+        state = OcrRunState(output_folder, backend.model_name, preprocessed_version(backend.prompt_version, preprocess))
+        image_files = state.select_pages(image_files, retry_failed=retry_failed)
+
+    apply_preprocessing(backend, image_files, preprocess_cache or os.path.join(output_folder, ".eeltootlus"), preprocess)
+
+    bucket = TokenBucket(requests_per_minute, tokens_per_minute)
+    concurrency = AdaptiveConcurrency(initial=initial_concurrency, max_limit=max_concurrency, target_latency=target_latency)
+    stats = {'latencies': [], 'retries': 0, 'rate_limited': 0, 'errors': 0, 'batch_fallbacks': 0}
+
+    # Lõimede arv peab katma suurima lubatud samaaegsuse
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_concurrency))
+
+    start = time.perf_counter()
+    if batch_size > 1 and hasattr(backend, 'transcribe_batch'):
+        batches = [image_files[i:i + batch_size] for i in range(0, len(image_files), batch_size)]
+        batch_results = await asyncio.gather(*[
+            _ocr_batch_async(batch, backend, output_folder, bucket, concurrency, tokens_per_page, max_retries, stats, state)
+            for batch in batches
+        ])
+        results = [ok for batch in batch_results for ok in batch]
+    else:
+        results = await asyncio.gather(*[
+            _ocr_one_async(path, backend, output_folder, bucket, concurrency, tokens_per_page, max_retries, stats, state)
+            for path in image_files
+        ])
+    stats['elapsed'] = time.perf_counter() - start
+    stats['concurrency_history'] = [limit for _, limit in concurrency.history]
+
+    failed_files = [path for path, ok in zip(image_files, results) if not ok]
+    done = len(image_files) - len(failed_files)
+    pages_per_minute = done / stats['elapsed'] * 60 if stats['elapsed'] else 0
+    print(f"\nValmis {done}/{len(image_files)} lk, {stats['elapsed']:.1f} s ({pages_per_minute:.1f} lk/min), "
+          f"uuestiproovimisi {stats['retries']}, 429 vigu {stats['rate_limited']}, "
+          f"samaaegsus lõpus {concurrency.limit}"
+          + (f", partiisid lehekülgedeks jagatud {stats['batch_fallbacks']}" if batch_size > 1 else ""))
+    if hasattr(backend, 'usage'):
+        print(backend.usage.summary())
+    return failed_files, stats
+
+
+def ocr_routed(image_files, local, output_folder, make_remote=None, min_confidence=70.0, resume=True,
+               retry_failed=False, remote_options=None):
+    """
+    Kohalik esimene läbimine (RoutingBackend ilma kaugtaustata); seejärel
+    saadetakse ebakindlad ja ebaõnnestunud leheküljed kaugtaustale.
+
+    Teisele läbimisele antakse esimese läbimise ebaõnnestunud failid otse,
+    mitte vigade päeviku kaudu: --no-resume korral päevikut ei kirjutata
+    ja vana päevik ei pruugi tänaseid ebakindlaid lehekülgi sisaldada.
+
+    Args:
+        local: Taust meetodiga transcribe_with_confidence (TesseractBackend).
+        make_remote: Funktsioon, mis tagastab kaugtausta (luuakse ainult
+            siis, kui on midagi saata); None korral ainult kohalik läbimine.
+        remote_options: Lisaargumendid teise läbimise ocr_images_async-ile.
+
+    Returns:
+        (ebaõnnestunud failide list, RoutingBackend)
+    """
+    router = RoutingBackend(local, remote=None, min_confidence=min_confidence)
+    failed_files, _ = asyncio.run(ocr_images_async(
+        image_files, router, output_folder,
+        requests_per_minute=10 ** 9, initial_concurrency=local.workers, max_concurrency=local.workers,
+        max_retries=0, resume=resume, retry_failed=retry_failed,
+    ))
+    print(router.summary())
+
+    if make_remote is not None and failed_files:
+        remote = make_remote()
+        print(f"\nSaadan {len(failed_files)} lehekülge kaugtaustale ({remote.model_name})...")
+        failed_files, _ = asyncio.run(ocr_images_async(
+            failed_files, remote, output_folder, resume=resume, retry_failed=False, **(remote_options or {}),
+        ))
+    return failed_files, router
+
+
+# --- Võrdlusmõõtmine: fikseeritud lehekülgede komplekt, tulemus JSON-faili ---
+def benchmark_ocr(page_folder, session, mode="threaded", num_workers=3, batch_size=1, max_retries=1,
+                  async_options=None, result_path=None, backend_label="live"):
+    """
+    OCR-ib page_folder pildid (ilma manifestita, ajutisse kausta) ja mõõdab
+    lk/min, p50/p95 latentsuse, uuestiproovimised ning CER/WER piltide
+    kõrval olevate .txt failide suhtes.
+
+    session.model peab olema RecordingModel või RecordedModel (ocr_benchmark),
+    mille kaudu loetakse päringute arv ja latentsused.
+    """
+    image_files = find_image_files(page_folder)
+    output_folder = tempfile.mkdtemp(prefix="ocr_benchmark_")
+    start = time.perf_counter()
+    try:
+        if mode == "async":
+            failed_files, _ = asyncio.run(ocr_images_async(
+                image_files, session, output_folder, max_retries=max_retries, resume=False,
+                batch_size=batch_size, **(async_options or {}),
+            ))
+        else:
+            failed_files = ocr_images_from_folder_parallel(
+                page_folder, None, output_folder, None, num_workers=num_workers,
+                resume=False, session=session, max_retries=max_retries,
+            )
+        elapsed = time.perf_counter() - start
+        config = {
+            "mode": mode,
+            "backend": backend_label,
+            "model": session.model_name,
+            "prompt_version": session.prompt_version,
+            "workers": num_workers if mode == "threaded" else None,
+            "batch_size": batch_size,
+            "max_retries": max_retries,
+            "async_options": async_options or {},
+            "page_folder": page_folder,
+            "expected_requests": -(-len(image_files) // batch_size),
+        }
+        result = summarize(config, image_files, failed_files, elapsed, session.model.log, output_folder)
+    finally:
+        shutil.rmtree(output_folder, ignore_errors=True)
+
+    print(f"\nVõrdlusmõõtmine: {format_result(result)}")
+    if result_path:
+        save_result(result, result_path)
+    return result
+
+
 # --- Põhiprogramm ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Piltide OCR Gemini API abil few-shot näidetega')
+    parser.add_argument('--image-folder', default="/home/mf/LLM/album_academicum/ocr", help='Piltide kaust')
+    parser.add_argument('--output-folder', default="/home/mf/LLM/album_academicum/ocr/transkriptsioon", help='Transkriptsioonide kaust')
+    parser.add_argument('--async', dest='use_async', action='store_true', help='Kasuta asyncio draiverit kohanduva samaaegsusega')
+    parser.add_argument('--rpm', type=int, default=60, help='Päringuid minutis (asyncio draiver)')
+    parser.add_argument('--tpm', type=int, help='Tokeneid minutis (asyncio draiver)')
+    parser.add_argument('--tokens-per-page', type=int, default=3000, help='Hinnanguline tokenite arv lehekülje päringus')
+    parser.add_argument('--max-concurrency', type=int, default=16, help='Suurim samaaegsete päringute arv (asyncio draiver)')
+    parser.add_argument('--retry-failed', action='store_true', help='Töötle ainult vigade päevikus ootel olevaid lehekülgi')
+    parser.add_argument('--no-resume', action='store_true', help='Ära kasuta manifesti: töötle kõik pildid uuesti')
+    parser.add_argument('--stub', action='store_true', help='Kasuta API asemel kohalikku asendajat (testimiseks)')
+    parser.add_argument('--stub-latency', type=float, default=0.5, help='Asendaja keskmine latentsus sekundites')
+    parser.add_argument('--stub-error-rate', type=float, default=0.0, help='Asendaja tavaliste vigade tõenäosus')
+    parser.add_argument('--stub-429-rate', type=float, default=0.0, help='Asendaja 429 vigade tõenäosus')
+    parser.add_argument('--stub-capacity', type=int, help='Asendaja samaaegsuse piir, millest alates tuleb 429')
+    parser.add_argument('--batch-size', type=int, default=1, help='Lehekülgi ühes päringus (K > 1 kasutab asyncio draiverit)')
+    parser.add_argument('--stub-split-error-rate', type=float, default=0.0, help='Asendaja vigaste partiivastuste tõenäosus')
+    parser.add_argument('--benchmark', metavar='PAGE_FOLDER',
+                        help='Võrdlusmõõtmine: OCR-i kausta pildid (koos .txt võrdlustekstidega) ja lõpeta')
+    parser.add_argument('--benchmark-output', help='Tulemuse JSON-fail (vaikimisi ocr_benchmark_<aeg>.json)')
+    parser.add_argument('--record', metavar='FILE', help='Salvesta päris API vastused faili (--benchmark)')
+    parser.add_argument('--replay', metavar='FILE', help='Kasuta API asemel salvestatud vastuseid (--benchmark)')
+    parser.add_argument('--replay-time-scale', type=float, default=1.0, help='Salvestatud latentsuse kordaja (0 = ilma ootamiseta)')
+    parser.add_argument('--workers', type=int, default=3, help='Lõimede arv (lõimedega draiver)')
+    parser.add_argument('--max-retries', type=int, help='Uuestiproovimiste arv lehekülje kohta')
+    parser.add_argument('--backend', choices=['gemini', 'tesseract', 'routed'], default='gemini',
+                        help='gemini; tesseract (kohalik, ebakindlad leheküljed vigade päevikusse); '
+                             'routed (tesseract, seejärel ebakindlad leheküljed Geminile)')
+    parser.add_argument('--tesseract-lang', default='frk+lat', help='Tesseracti keelemudelid')
+    parser.add_argument('--tesseract-config', default='--psm 6', help='Tesseracti lisavõtmed')
+    parser.add_argument('--tesseract-workers', type=int, help='Tesseracti protsesside arv (vaikimisi kõik tuumad)')
+    parser.add_argument('--min-confidence', type=float, default=70.0, help='Kohaliku OCR-i usaldusväärsuse piir (0-100)')
+    parser.add_argument('--preprocess', action='store_true', help='Eeltöötle pildid enne üleslaadimist (veerised, halltoonid, DPI, JPEG)')
+    parser.add_argument('--max-dpi', type=int, default=200, help='Eeltöötluse suurim resolutsioon')
+    parser.add_argument('--jpeg-quality', type=int, default=80, help='Eeltöötluse JPEG kvaliteet')
+    parser.add_argument('--preprocess-cache', help='Eeltöödeldud piltide vahemälu (vaikimisi <väljundkaust>/.eeltootlus)')
+    parser.add_argument('--evaluate-preprocessing', metavar='SAMPLE_FOLDER',
+                        help='Võrdle CER-i originaal- ja eeltöödeldud piltidel (pildid koos .txt failidega) ja lõpeta')
+    parser.add_argument('--trace', help='Päringute jälg JSONL (vaikimisi <väljundkaust>/ocr_kutsed.jsonl; vt moodikud.py)')
+    parser.add_argument('--no-trace', action='store_true', help='Ära kirjuta päringute jälge')
+    args = parser.parse_args()
+
     load_dotenv()
     api_key = os.getenv("GOOGLE_API_KEY")
 
-    if not api_key:
+    if not api_key and not args.stub and not args.replay and args.backend != 'tesseract':
         print("Viga: GOOGLE_API_KEY ei ole keskkonnamuutujates või .env failis määratud.")
         exit(1)
 
     # --- Seadista siin oma kaustad ---
-    image_folder = "/home/mf/LLM/album_academicum/ocr"
-    output_folder = "/home/mf/LLM/album_academicum/ocr/transkriptsioon"
+    image_folder = args.image_folder
+    output_folder = args.output_folder
     # --- ---
 
-    if not os.path.isdir(image_folder):
+    if not os.path.isdir(image_folder) and not (args.benchmark or args.evaluate_preprocessing):
         print(f"Viga: Sisendkausta ei leitud: {image_folder}")
         exit(1)
 
@@ -259,11 +1115,107 @@ if __name__ == "__main__":
     },   
     ] 
 
-    # --- Käivita OCR paralleelselt ---
-    NUMBER_OF_WORKERS = 3 # Kasutad logi järgi 3
-    permanently_failed_files = ocr_images_from_folder_parallel(image_folder, api_key, output_folder, examples, num_workers=NUMBER_OF_WORKERS)
+    preprocess = {'max_dpi': args.max_dpi, 'quality': args.jpeg_quality} if args.preprocess else None
+    preprocess_cache = args.preprocess_cache or os.path.join(output_folder, ".eeltootlus")
+
+    if args.evaluate_preprocessing:
+        # --- Eeltöötluse mõju täpsusele ja suurusele näidiskomplektil ---
+        sample_pairs = [
+            (path, os.path.splitext(path)[0] + ".txt")
+            for path in find_image_files(args.evaluate_preprocessing)
+            if os.path.exists(os.path.splitext(path)[0] + ".txt")
+        ]
+        backend = StubOcrBackend(latency=0) if args.stub else OcrSession(api_key, examples)
+        report = evaluate_accuracy(sample_pairs, backend.transcribe, preprocess_cache,
+                                   {'max_dpi': args.max_dpi, 'quality': args.jpeg_quality})
+        if report:
+            print(f"Keskmine CER: {sum(r['cer_original'] for r in report) / len(report):.3f} -> "
+                  f"{sum(r['cer_preprocessed'] for r in report) / len(report):.3f}")
+        exit(0)
+
+    if args.benchmark:
+        session = OcrSession(api_key or "", examples)
+        if args.replay:
+            session.model = RecordedModel(args.replay, time_scale=args.replay_time_scale)
+            backend_label = f"replay:{os.path.basename(args.replay)}"
+        else:
+            session.model = RecordingModel(session.model, args.record)
+            backend_label = "live"
+        mode = "async" if args.use_async or args.batch_size > 1 else "threaded"
+        benchmark_ocr(
+            args.benchmark, session, mode=mode, num_workers=args.workers, batch_size=args.batch_size,
+            max_retries=args.max_retries if args.max_retries is not None else (3 if mode == "async" else 1),
+            async_options={"requests_per_minute": args.rpm, "tokens_per_minute": args.tpm,
+                           "tokens_per_page": args.tokens_per_page, "max_concurrency": args.max_concurrency},
+            result_path=args.benchmark_output or f"ocr_benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json",
+            backend_label=backend_label,
+        )
+        if isinstance(session.model, RecordingModel):
+            session.model.save()
+        exit(0)
+
+    # Iga mudelipäringu latentsus, tokenid ja tulemus (python moodikud.py summary ...)
+    trace_path = None if args.no_trace else (args.trace or os.path.join(output_folder, "ocr_kutsed.jsonl"))
+    tracer = Tracer(trace_path)
+
+    if args.backend in ('tesseract', 'routed'):
+        # --- Kohalik esimene läbimine kõigil tuumadel; ebakindlad leheküljed vigade päevikusse ---
+        local = TesseractBackend(lang=args.tesseract_lang, config=args.tesseract_config, workers=args.tesseract_workers)
+
+        def make_remote():
+            if args.stub:
+                remote = StubOcrBackend(latency=args.stub_latency, error_rate=args.stub_error_rate,
+                                        rate_limit_rate=args.stub_429_rate, max_concurrency=args.stub_capacity)
+                remote.tracer = tracer
+                return remote
+            return OcrSession(api_key, examples, tracer=tracer)
+
+        try:
+            # --- Teine läbimine (routed): ainult ebakindlad/ebaõnnestunud leheküljed kaugtaustale ---
+            permanently_failed_files, _ = ocr_routed(
+                find_image_files(image_folder), local, output_folder,
+                make_remote=make_remote if args.backend == 'routed' else None,
+                min_confidence=args.min_confidence, resume=not args.no_resume, retry_failed=args.retry_failed,
+                remote_options={
+                    'requests_per_minute': args.rpm, 'tokens_per_minute': args.tpm,
+                    'tokens_per_page': args.tokens_per_page, 'max_concurrency': args.max_concurrency,
+                    'preprocess': preprocess, 'preprocess_cache': preprocess_cache, 'batch_size': args.batch_size,
+                    'max_retries': args.max_retries if args.max_retries is not None else 3,
+                },
+            )
+        finally:
+            local.close()
+    elif args.use_async or args.stub or args.batch_size > 1:
+        # --- asyncio draiver (kohanduv samaaegsus + token-bucket) ---
+        if args.stub:
+            backend = StubOcrBackend(latency=args.stub_latency, error_rate=args.stub_error_rate,
+                                     rate_limit_rate=args.stub_429_rate, max_concurrency=args.stub_capacity,
+                                     split_error_rate=args.stub_split_error_rate)
+            backend.tracer = tracer
+        else:
+            backend = OcrSession(api_key, examples, tracer=tracer)
+        permanently_failed_files, _ = asyncio.run(ocr_images_async(
+            find_image_files(image_folder), backend, output_folder,
+            requests_per_minute=args.rpm, tokens_per_minute=args.tpm,
+            tokens_per_page=args.tokens_per_page, max_concurrency=args.max_concurrency,
+            resume=not args.no_resume, retry_failed=args.retry_failed,
+            preprocess=preprocess, preprocess_cache=preprocess_cache, batch_size=args.batch_size,
+            max_retries=args.max_retries if args.max_retries is not None else 3,
+        ))
+    else:
+        # --- Käivita OCR paralleelselt ---
+        NUMBER_OF_WORKERS = args.workers # Kasutad logi järgi 3
+        SHARED_SESSION = True # False: mudel ja näited iga lehekülje jaoks uuesti (ettevalmistuse aja võrdluseks)
+        session = OcrSession(api_key, examples, tracer=tracer) if SHARED_SESSION else None
+        permanently_failed_files = ocr_images_from_folder_parallel(image_folder, api_key, output_folder, examples, num_workers=NUMBER_OF_WORKERS, shared_session=SHARED_SESSION,
+                                                                   resume=not args.no_resume, retry_failed=args.retry_failed,
+                                                                   preprocess=preprocess, preprocess_cache=preprocess_cache, session=session,
+                                                                   max_retries=args.max_retries if args.max_retries is not None else 1)
 
+    tracer.close()
     print("\n--- TÖÖTLEMINE LÕPETATUD ---")
+    if trace_path:
+        print(f"Päringute jälg: {trace_path} (kokkuvõte: python moodikud.py summary {trace_path})")
 
     # --- Prindi kokkuvõte ebaõnnestunud failidest ---
     if permanently_failed_files:
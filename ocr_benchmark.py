@@ -0,0 +1,262 @@
+"""
+OCR võrdlusmõõtmise abivahendid.
+
+Mõõdetav käivitus ise on ocr-few-shot.py-s (--benchmark), siin on:
+
+- RecordingModel: ümbris päris Gemini mudelile, mis mõõdab iga päringu
+  latentsuse ja salvestab vastused (või vead) lehekülje kaupa faili.
+- RecordedModel: mängib salvestatud vastused koos latentsusega tagasi,
+  nii et konfiguratsioone saab võrrelda ilma API-ta ja kvooti kulutamata.
+- summarize: lk/min, p50/p95 latentsus, uuestiproovimised, CER/WER.
+- compare: mitme tulemusfaili kõrvutamine.
+
+    python ocr_benchmark.py compare tulemused/*.json
+"""
+import argparse
+import json
+import os
+import statistics
+import threading
+import time
+from types import SimpleNamespace
+
+from manifest import atomic_write
+from tekstivordlus import cer, wer
+
+# Sama märgend, mida ocr-few-shot.py mitme lehekülje päringus ootab
+PAGE_DELIMITER = "=== LEHEKÜLG {number} ==="
+
+
+def percentile(values, p):
+    """Protsentiil lineaarse interpolatsiooniga (p vahemikus 0-100)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * p / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def page_names(messages):
+    """Viimase kasutaja sõnumi piltide failinimed (PIL.Image.filename)."""
+    parts = messages[-1]['parts']
+    return [os.path.basename(part.filename) for part in parts if getattr(part, 'filename', None)]
+
+
+class _CallLog:
+    """Päringute arv ja latentsused, lõimede vahel jagatud."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.latencies = []
+
+    def add(self, latency):
+        with self._lock:
+            self.calls += 1
+            self.latencies.append(latency)
+
+
+class RecordingModel:
+    """
+    Päris mudeli ümbris: generate_content mõõdab latentsust ja salvestab
+    iga lehekülje vastuse. save() kirjutab salvestuse JSON-faili kujul
+    {pildi nimi: [{"text" | "error", "latency"}, ...]}.
+    """
+
+    def __init__(self, model, path=None):
+        self.model = model
+        self.path = path
+        self.log = _CallLog()
+        self.recordings = {}
+        self._lock = threading.Lock()
+
+    def generate_content(self, messages):
+        names = page_names(messages)
+        start = time.perf_counter()
+        try:
+            response = self.model.generate_content(messages)
+        except Exception as e:
+            latency = time.perf_counter() - start
+            self.log.add(latency)
+            self._record(names, {'error': str(e), 'latency': latency})
+            raise
+        latency = time.perf_counter() - start
+        self.log.add(latency)
+        try:
+            text = response.text
+        except Exception:
+            text = None
+        usage = getattr(response, 'usage_metadata', None)
+        self._record(names, {
+            'text': text,
+            'latency': latency,
+            'prompt_tokens': getattr(usage, 'prompt_token_count', None),
+            'output_tokens': getattr(usage, 'candidates_token_count', None),
+        })
+        return response
+
+    def _record(self, names, outcome):
+        # Mitme lehekülje päring salvestatakse iga lehekülje alla
+        key = names[0] if len(names) == 1 else '|'.join(names)
+        with self._lock:
+            self.recordings.setdefault(key, []).append(outcome)
+
+    def save(self):
+        if self.path:
+            atomic_write(self.path, json.dumps(self.recordings, ensure_ascii=False, indent=2))
+            print(f"Salvestatud {len(self.recordings)} lehekülje vastused: {self.path}")
+
+
+class RecordedModel:
+    """
+    Salvestatud vastuste taasesitaja Gemini mudeli asemel.
+
+    Iga lehekülje vastused antakse salvestatud järjekorras (viga, siis
+    õnnestumine jne); kui need saavad otsa, korratakse viimast. Latentsust
+    saab skaleerida (time_scale=0 -> ilma ootamiseta). Kui mitme lehekülje
+    päringut pole salvestatud, pannakse vastus kokku ühe lehekülje
+    vastustest koos lehekülje märgenditega.
+    """
+
+    def __init__(self, path, time_scale=1.0):
+        with open(path, 'r', encoding='utf-8') as f:
+            self.recordings = json.load(f)
+        self.time_scale = time_scale
+        self.log = _CallLog()
+        self._positions = {}
+        self._lock = threading.Lock()
+
+    def _next(self, key):
+        outcomes = self.recordings.get(key)
+        if not outcomes:
+            return None
+        with self._lock:
+            position = self._positions.get(key, 0)
+            self._positions[key] = position + 1
+        return outcomes[min(position, len(outcomes) - 1)]
+
+    def generate_content(self, messages):
+        names = page_names(messages)
+        key = names[0] if len(names) == 1 else '|'.join(names)
+        outcome = self._next(key)
+        if outcome is None and len(names) > 1:
+            singles = [self._next(name) for name in names]
+            if all(single and single.get('text') for single in singles):
+                outcome = {
+                    'text': "\n".join(
+                        f"{PAGE_DELIMITER.format(number=number)}\n{single['text']}"
+                        for number, single in enumerate(singles, 1)
+                    ),
+                    'latency': max(single['latency'] for single in singles),
+                }
+        if outcome is None:
+            self.log.add(0.0)
+            raise KeyError(f"Salvestatud vastus puudub: {key}")
+
+        time.sleep(outcome['latency'] * self.time_scale)
+        self.log.add(outcome['latency'])
+        if 'error' in outcome:
+            raise RuntimeError(outcome['error'])
+        usage = SimpleNamespace(prompt_token_count=outcome.get('prompt_tokens') or 0,
+                                candidates_token_count=outcome.get('output_tokens') or 0)
+        return SimpleNamespace(text=outcome['text'], usage_metadata=usage, prompt_feedback=None)
+
+
+def ground_truth_pairs(image_files):
+    """Pildid, mille kõrval on samanimeline .txt (käsitsi kontrollitud transkriptsioon)."""
+    pairs = []
+    for image_path in image_files:
+        text_path = os.path.splitext(image_path)[0] + '.txt'
+        if os.path.exists(text_path):
+            pairs.append((image_path, text_path))
+    return pairs
+
+
+def summarize(config, image_files, failed_files, elapsed, log, output_folder):
+    """
+    Koostab tulemuse sõnastiku: läbilaskevõime, latentsus, uuestiproovimised
+    ja CER/WER lehekülgedel, millel on võrdlustekst.
+    """
+    done = len(image_files) - len(failed_files)
+    per_page = []
+    for image_path, text_path in ground_truth_pairs(image_files):
+        output_path = os.path.join(output_folder, os.path.splitext(os.path.basename(image_path))[0] + '.txt')
+        with open(text_path, 'r', encoding='utf-8') as f:
+            reference = f.read()
+        if os.path.exists(output_path):
+            with open(output_path, 'r', encoding='utf-8') as f:
+                hypothesis = f.read()
+        else:
+            hypothesis = ''
+        per_page.append({
+            'page': os.path.basename(image_path),
+            'cer': round(cer(reference, hypothesis), 5),
+            'wer': round(wer(reference, hypothesis), 5),
+        })
+
+    latencies = log.latencies
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': config,
+        'pages': len(image_files),
+        'failed': len(failed_files),
+        'elapsed': round(elapsed, 3),
+        'pages_per_minute': round(done / elapsed * 60, 2) if elapsed else None,
+        'requests': log.calls,
+        # Iga lehekülg (või partii) vajab vähemalt ühte päringut, ülejäänud on uuestiproovimised
+        'retries': max(0, log.calls - config.get('expected_requests', len(image_files))),
+        'latency': {
+            'p50': round(percentile(latencies, 50), 3) if latencies else None,
+            'p95': round(percentile(latencies, 95), 3) if latencies else None,
+            'mean': round(statistics.mean(latencies), 3) if latencies else None,
+        },
+        'cer': round(statistics.mean(p['cer'] for p in per_page), 5) if per_page else None,
+        'wer': round(statistics.mean(p['wer'] for p in per_page), 5) if per_page else None,
+        'per_page': per_page,
+    }
+
+
+def save_result(result, path):
+    atomic_write(path, json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"Tulemus salvestatud: {path}")
+
+
+def format_result(result):
+    latency = result['latency']
+    cer_text = f"{result['cer']:.4f}" if result['cer'] is not None else '-'
+    wer_text = f"{result['wer']:.4f}" if result['wer'] is not None else '-'
+    return (f"{result['pages'] - result['failed']}/{result['pages']} lk, {result['pages_per_minute']} lk/min, "
+            f"p50 {latency['p50']} s, p95 {latency['p95']} s, päringuid {result['requests']}, "
+            f"uuestiproovimisi {result['retries']}, CER {cer_text}, WER {wer_text}")
+
+
+def compare(paths):
+    """Prindib tulemusfailid tabelina (üks rida käivituse kohta)."""
+    header = f"{'fail':<32} {'režiim':<9} {'mudel':<18} {'lk/min':>8} {'p50':>7} {'p95':>7} {'uuesti':>6} {'CER':>7} {'WER':>7}"
+    print(header)
+    print('-' * len(header))
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            result = json.load(f)
+        config = result['config']
+        print(f"{os.path.basename(path)[:32]:<32} {config.get('mode', ''):<9} {config.get('model', '')[:18]:<18} "
+              f"{result['pages_per_minute'] or 0:>8.1f} {result['latency']['p50'] or 0:>7.2f} "
+              f"{result['latency']['p95'] or 0:>7.2f} {result['retries']:>6} "
+              f"{result['cer'] if result['cer'] is not None else float('nan'):>7.4f} "
+              f"{result['wer'] if result['wer'] is not None else float('nan'):>7.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR võrdlusmõõtmiste tulemused')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compare_parser = subparsers.add_parser('compare', help='Võrdle tulemusfaile')
+    compare_parser.add_argument('results', nargs='+')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        compare(args.results)
+
+if __name__ == "__main__":
+    main()
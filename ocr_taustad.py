@@ -0,0 +1,163 @@
+"""
+OCR taustad (backend) lisaks Gemini sessioonile ocr-few-shot.py-s.
+
+Taust on objekt, millel on:
+    transcribe(image_path) -> str   (vea korral erind)
+    model_name, prompt_version      (manifesti võti, vt OcrRunState)
+
+Siin on:
+- TesseractBackend: kohalik Tesseract (nt Fraktur + ladina mudel) kõigil
+  tuumadel protsesside kogumis; töötab ilma võrguta.
+- RoutingBackend: kohalik esimene läbimine; leheküljed, mille
+  usaldusväärsus jääb alla piiri, saadetakse kaugtaustale (Gemini). Kui
+  kaugtausta pole (võrguta masin), tõstetakse LowConfidenceError koos
+  kohaliku tekstiga: draiver salvestab selle kõrvalfaili <nimi>.txt.ebakindel
+  (mitte .txt, et seda valmis transkriptsiooniks ei loetaks), lehekülg
+  läheb vigade päevikusse ja selle saab hiljem --retry-failed abil
+  Geminile saata.
+
+Tesseract vajab paketti pytesseract ja tesseract programmi koos
+keelemudelitega (nt frk, lat).
+"""
+import hashlib
+import os
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import PIL.Image
+
+
+class LowConfidenceError(Exception):
+    """
+    Kohaliku OCR-i usaldusväärsus jäi alla piiri ja kaugtausta pole.
+    text ja confidence on kohaliku OCR-i tulemus (et see kaduma ei läheks).
+    """
+
+    def __init__(self, message, text=None, confidence=None):
+        super().__init__(message)
+        self.text = text
+        self.confidence = confidence
+
+
+def _tesseract_page(image_path, lang, config):
+    """
+    Töötaja protsessis: OCR ühele leheküljele.
+
+    Returns:
+        (tekst, keskmine sõnade usaldusväärsus 0-100)
+    """
+    import pytesseract
+
+    with PIL.Image.open(image_path) as img:
+        data = pytesseract.image_to_data(img, lang=lang, config=config, output_type=pytesseract.Output.DICT)
+
+    lines = []
+    current_key = None
+    confidences = []
+    for i, word in enumerate(data['text']):
+        confidence = float(data['conf'][i])
+        if confidence < 0 or not word.strip():
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        if key != current_key:
+            # Uus plokk või lõik -> tühi rida vahele
+            if current_key is not None and key[:2] != current_key[:2]:
+                lines.append([])
+            lines.append([])
+            current_key = key
+        lines[-1].append(word)
+        # Pikemad sõnad kaaluvad rohkem
+        confidences.append((confidence, len(word)))
+
+    text = "\n".join(" ".join(words) for words in lines).strip()
+    total_chars = sum(length for _, length in confidences)
+    mean_confidence = sum(c * length for c, length in confidences) / total_chars if total_chars else 0.0
+    return text, mean_confidence
+
+
+class TesseractBackend:
+    """
+    Kohalik Tesseract protsesside kogumis.
+
+    Args:
+        lang: Tesseracti keelemudelid (nt "frk+lat").
+        config: Lisavõtmed (nt "--psm 6").
+        workers: Protsesside arv (vaikimisi kõik tuumad).
+    """
+
+    def __init__(self, lang="frk+lat", config="--psm 6", workers=None):
+        self.lang = lang
+        self.config = config
+        self.workers = workers or os.cpu_count()
+        self.model_name = f"tesseract-{self._tesseract_version()}"
+        self.prompt_version = hashlib.sha256(f"{lang}|{config}".encode("utf-8")).hexdigest()[:12]
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    @staticmethod
+    def _tesseract_version():
+        try:
+            result = subprocess.run(["tesseract", "--version"], capture_output=True, text=True)
+            # Vanemad versioonid kirjutavad --version väljundi stderr-i
+            output = result.stdout or result.stderr
+            return output.split()[1] if output else "unknown"
+        except (OSError, IndexError):
+            return "unknown"
+
+    def transcribe_with_confidence(self, image_path):
+        """(tekst, usaldusväärsus); ootab, kuni töötaja protsess on valmis."""
+        return self._executor.submit(_tesseract_page, image_path, self.lang, self.config).result()
+
+    def transcribe(self, image_path):
+        text, _ = self.transcribe_with_confidence(image_path)
+        if not text:
+            raise ValueError(f"Tesseract ei leidnud teksti failis {os.path.basename(image_path)}.")
+        return text
+
+    def close(self):
+        self._executor.shutdown()
+
+
+class RoutingBackend:
+    """
+    Kohalik OCR esimesena, ebakindlad leheküljed kaugtaustale.
+
+    Args:
+        local: Taust meetodiga transcribe_with_confidence (TesseractBackend).
+        remote: Kaugtaust (OcrSession) või None võrguta töö jaoks.
+        min_confidence: Usaldusväärsuse piir (0-100), millest alates
+            kohalik tulemus võetakse vastu.
+    """
+
+    def __init__(self, local, remote=None, min_confidence=70.0):
+        self.local = local
+        self.remote = remote
+        self.min_confidence = min_confidence
+        remote_name = remote.model_name if remote else "offline"
+        self.model_name = f"{local.model_name}>{remote_name}"
+        self.prompt_version = f"{local.prompt_version}:{remote.prompt_version if remote else '-'}:{min_confidence:g}"
+        self.counts = {'local': 0, 'remote': 0, 'low_confidence': 0}
+        self._lock = threading.Lock()
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def transcribe(self, image_path):
+        text, confidence = self.local.transcribe_with_confidence(image_path)
+        if text and confidence >= self.min_confidence:
+            self._count('local')
+            return text
+        self._count('low_confidence')
+        if self.remote is None:
+            raise LowConfidenceError(
+                f"Kohalik OCR ebakindel faili {os.path.basename(image_path)} jaoks "
+                f"({confidence:.1f} < {self.min_confidence:g}); vajab kaugtausta.",
+                text=text, confidence=confidence,
+            )
+        self._count('remote')
+        return self.remote.transcribe(image_path)
+
+    def summary(self):
+        return (f"Kohalikult vastu võetud {self.counts['local']} lk, ebakindlaid {self.counts['low_confidence']}, "
+                f"kaugtaustale saadetud {self.counts['remote']}")
@@ -0,0 +1,271 @@
+"""
+Leksikonipõhine poolituste liitmine.
+
+puhastamine.merge_hyphenations liidab iga "sõna-" + reavahetus + väiketäht
+pimesi kokku. See moodul ehitab korra räsitud leksikoni (korpus,
+tering_nimed.txt, tering_lyhendid.txt, regioonid.json) ja otsustab iga
+reavahetusel poolitatud sõna puhul hulgapäringutega, kas liita ("Univer-
+sität" -> "Universität") või jätta sidekriips alles ("Curo-Liv",
+"Sveo-Livonus"). Kahtlased juhud antakse eraldi aruandesse.
+
+    python poolitused.py processed_records --report ambiguous.jsonl
+    python poolitused.py processed_records --benchmark
+"""
+import argparse
+import bisect
+import json
+import os
+import re
+import time
+
+# Reavahetusel poolitatud sõna: vasak osa, sidekriips, reavahetus, parem osa.
+# Erinevalt vanast mustrist haaratakse ka suurtähega algav parem osa, et
+# tunda ära liitnimed nagu "Curo-Liv". Mõlemad osad on ainult tähed: numbrid
+# ("1632-\n28. 5. 1633" on kuupäevavahemik) jäävad puutumata nagu vanas mustris.
+BREAK_RE = re.compile(r'([^\W\d_]+)-[ \t]*\r?\n[ \t]*([^\W\d_]+)([^\s]*)')
+WORD_RE = re.compile(r'\w+(?:-\w+)*')
+GLOSSARY_LINE_RE = re.compile(r'^(.+?)\s*=\s*(.*)$')
+
+# Tekstide eraldaja ühekordse läbimise jaoks (ei esine kirjetes)
+_SEPARATOR = '\x00\n'
+
+JOIN = 'join'
+KEEP = 'keep'
+AMBIGUOUS = 'ambiguous'
+
+
+class Lexicon:
+    """Räsitud sõnavara: words (väiketähtedes) ja compounds (sidekriipsuga liitsõnad)."""
+
+    def __init__(self):
+        self.words = set()
+        self.compounds = set()
+
+    def add(self, token):
+        for word in WORD_RE.findall(token):
+            if '-' in word:
+                self.compounds.add(word.lower())
+                self.words.update(part.lower() for part in word.split('-') if part)
+            else:
+                self.words.add(word.lower())
+
+    def add_text(self, text):
+        """Lisab teksti sõnad, jättes reavahetusel poolitatud sõnaosad välja."""
+        self.add(BREAK_RE.sub(' ', text))
+
+    def add_glossary(self, path):
+        """Lisab lühendite/nimede loendi ("Abr. = Abraham(us)") mõlemad pooled."""
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                match = GLOSSARY_LINE_RE.match(line.strip())
+                if match:
+                    self.add(match.group(1))
+                    # "Abraham(us)" -> Abraham ja Abrahamus
+                    expansion = match.group(2)
+                    self.add(re.sub(r'[()]', '', expansion))
+                    self.add(re.sub(r'\(.*?\)', '', expansion))
+
+    def add_regions(self, path):
+        """Lisab regioonid.json regioonid, nende täisnimed, identifikaatorid ja linnad."""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        for key, region in data.get('regions', {}).items():
+            self.add(key)
+            self.add(region.get('full_name') or '')
+            identifiers = region.get('identifiers') or []
+            if isinstance(identifiers, str):
+                identifiers = [identifiers]
+            for identifier in identifiers:
+                self.add(identifier)
+            for city in region.get('cities') or []:
+                self.add(city)
+        for key, value in data.get('cities', {}).items():
+            self.add(key)
+        for key, value in data.get('swedish_regions', {}).items():
+            self.add(key)
+            self.add(value)
+        for key in data.get('identifiers', {}):
+            self.add(key)
+
+
+def build_lexicon(texts=(), names_file=None, abbreviations_file=None, regions_file=None):
+    """Ehitab leksikoni korpusest ja abifailidest (puuduvad failid jäetakse vahele)."""
+    lexicon = Lexicon()
+    for text in texts:
+        lexicon.add_text(text)
+    if names_file and os.path.exists(names_file):
+        lexicon.add_glossary(names_file)
+    if abbreviations_file and os.path.exists(abbreviations_file):
+        lexicon.add_glossary(abbreviations_file)
+    if regions_file and os.path.exists(regions_file):
+        lexicon.add_regions(regions_file)
+    return lexicon
+
+
+class Dehyphenator:
+    """Liidab või säilitab poolitused leksikoni põhjal, O(1) otsus poolituse kohta."""
+
+    def __init__(self, lexicon):
+        self.lexicon = lexicon
+
+    def decide(self, left, right):
+        """Tagastab JOIN, KEEP või AMBIGUOUS."""
+        words = self.lexicon.words
+        if f"{left}-{right}".lower() in self.lexicon.compounds:
+            return KEEP
+        if (left + right).lower() in words:
+            return JOIN
+        if right[0].isupper():
+            # Suurtähega järg on liitnimi, mitte poolitus ("Curo-Liv")
+            return KEEP
+        # Vaikimisi liidame nagu varem, aga kanname juhu aruandesse
+        return AMBIGUOUS
+
+    def process(self, text, ambiguous=None, stats=None):
+        """
+        Töötleb teksti ühe re.sub läbimisega.
+
+        Args:
+            text: Sisendtekst.
+            ambiguous: List, kuhu lisatakse kahtlaste juhtude sõnastikud.
+            stats: Sõnastik loenduritega JOIN/KEEP/AMBIGUOUS.
+
+        Returns:
+            Puhastatud tekst.
+        """
+        def replace(match):
+            left, right, rest = match.groups()
+            decision = self.decide(left, right)
+            if stats is not None:
+                stats[decision] = stats.get(decision, 0) + 1
+            if decision == KEEP:
+                return f"{left}-{right}{rest}"
+            if decision == AMBIGUOUS and ambiguous is not None:
+                ambiguous.append({
+                    'left': left,
+                    'right': right,
+                    'joined': left + right,
+                    'offset': match.start(),
+                })
+            return left + right + rest
+
+        return BREAK_RE.sub(replace, text)
+
+    def process_texts(self, texts, ambiguous=None, stats=None):
+        """
+        Töötleb terve korpuse ühe läbimisega: tekstid liidetakse eraldajaga
+        üheks puhvriks, töödeldakse korraga ja jagatakse tagasi.
+
+        Kahtlaste juhtude sõnastikesse lisatakse index (teksti järjekorranumber)
+        ja offset muudetakse selle teksti sisemiseks nihkeks.
+        """
+        found = [] if ambiguous is not None else None
+        cleaned = self.process(_SEPARATOR.join(texts), ambiguous=found, stats=stats)
+
+        if found:
+            starts = []
+            position = 0
+            for text in texts:
+                starts.append(position)
+                position += len(text) + len(_SEPARATOR)
+            for case in found:
+                index = bisect.bisect_right(starts, case['offset']) - 1
+                case['index'] = index
+                case['offset'] -= starts[index]
+                ambiguous.append(case)
+
+        return cleaned.split(_SEPARATOR)
+
+
+def read_corpus(root_dir):
+    """Loeb kataloogipuu .txt failid: tagastab (teed, tekstid)."""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.endswith('.txt'):
+                paths.append(os.path.join(dirpath, filename))
+    texts = []
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            texts.append(f.read())
+    return paths, texts
+
+
+def default_lexicon(texts, data_dir='.'):
+    """Leksikon korpusest ja repositooriumi abifailidest."""
+    return build_lexicon(
+        texts,
+        names_file=os.path.join(data_dir, 'tering_nimed.txt'),
+        abbreviations_file=os.path.join(data_dir, 'tering_lyhendid.txt'),
+        regions_file=os.path.join(data_dir, 'regioonid.json'),
+    )
+
+
+def benchmark(texts, dehyphenator):
+    """Võrdleb läbilaskevõimet vana regexi (puhastamine.merge_hyphenations) ja mootoriga."""
+    from puhastamine import merge_hyphenations
+
+    total_chars = sum(len(t) for t in texts)
+    start = time.perf_counter()
+    for text in texts:
+        merge_hyphenations(text)
+    old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dehyphenator.process_texts(texts)
+    new = time.perf_counter() - start
+
+    print(f"Korpus: {len(texts)} faili, {total_chars} märki")
+    print(f"Vana regex:  {old:.3f} s ({total_chars / old / 1e6:.1f} M märki/s)" if old else "Vana regex: ~0 s")
+    print(f"Leksikoniga: {new:.3f} s ({total_chars / new / 1e6:.1f} M märki/s)" if new else "Leksikoniga: ~0 s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Leksikonipõhine poolituste liitmine')
+    parser.add_argument('root_directory', help='Kaust kirjefailidega')
+    parser.add_argument('--data-dir', default='.', help='Kaust tering_nimed.txt, tering_lyhendid.txt ja regioonid.json failidega')
+    parser.add_argument('--apply', action='store_true', help='Kirjuta muudetud failid tagasi (vaikimisi ainult aruanne)')
+    parser.add_argument('--report', help='JSONL fail kahtlaste juhtudega')
+    parser.add_argument('--benchmark', action='store_true', help='Võrdle kiirust vana regexiga')
+    args = parser.parse_args()
+
+    from manifest import atomic_write
+
+    start = time.perf_counter()
+    paths, texts = read_corpus(args.root_directory)
+    lexicon = default_lexicon(texts, args.data_dir)
+    print(f"Leksikon: {len(lexicon.words)} sõna, {len(lexicon.compounds)} liitsõna "
+          f"({time.perf_counter() - start:.2f} s)")
+
+    dehyphenator = Dehyphenator(lexicon)
+    if args.benchmark:
+        benchmark(texts, dehyphenator)
+
+    ambiguous = []
+    stats = {}
+    cleaned_texts = dehyphenator.process_texts(texts, ambiguous=ambiguous, stats=stats)
+    for case in ambiguous:
+        text = texts[case['index']]
+        case['file'] = paths[case.pop('index')]
+        case['line'] = text.count('\n', 0, case.pop('offset')) + 1
+
+    print(f"Liidetud: {stats.get(JOIN, 0)}, säilitatud sidekriips: {stats.get(KEEP, 0)}, "
+          f"kahtlased (liidetud): {stats.get(AMBIGUOUS, 0)}")
+
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            for case in ambiguous:
+                f.write(json.dumps(case, ensure_ascii=False) + '\n')
+        print(f"Kahtlased juhud salvestatud: {args.report}")
+
+    if args.apply:
+        changed = 0
+        for path, text, cleaned in zip(paths, texts, cleaned_texts):
+            if cleaned != text:
+                atomic_write(path, cleaned)
+                changed += 1
+        print(f"Muudetud faile: {changed}")
+
+if __name__ == "__main__":
+    main()
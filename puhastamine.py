@@ -1,44 +1,160 @@
+import argparse
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 
-def merge_hyphenations(text):
-    """Liidab poolitatud sõnad."""
+from manifest import Manifest, atomic_write, sha256_bytes
+
+#  Otsib sõna, mis lõpeb sidekriipsuga, millele järgneb
+#  reavahetus (võimalike tühikutega) ja väiketähega algav sõna.
+HYPHENATION_RE = re.compile(r'(\w+-)\s*\r?\n\s*([a-zäöüõ][^\s]*)', re.MULTILINE)
+# Leksikonipõhine liitmine (poolitused.py) otsustab kogu korpuse sõnavara
+# järgi, seega ei sobi see failipõhise räsimanifestiga; siin on kiire
+# failikaupa läbimine, poolitused.py on eraldi ülevaadatav samm.
+
+MANIFEST_NAME = '.puhastamine_manifest.json'
+
+# Puhastusreeglite versioon. Manifesti kirjes on räsi koos versiooniga;
+# kui muster muutub (või replace_hyphenation muutmisel suurendatakse
+# RULES_REVISION-it), töödeldakse kõik failid uuesti ka ilma --full-ita.
+RULES_REVISION = 1
+CLEAN_VERSION = sha256_bytes(
+    f"{RULES_REVISION}|{HYPHENATION_RE.pattern}|{HYPHENATION_RE.flags}".encode('utf-8'))[:12]
+
+
+def replace_hyphenation(match):
+    # See funktsioon saab re.sub poolt leitud vaste
+    first_part = match.group(1)  # Sõnaosa koos sidekriipsuga
+    next_line_start = match.group(2) #järgmine rida
+    return first_part.replace("-", "") + next_line_start #eemaldab sidekriipsu
 
-    def replace_hyphenation(match):
-        # See funktsioon saab re.sub poolt leitud vaste
-        first_part = match.group(1)  # Sõnaosa koos sidekriipsuga
-        next_line_start = match.group(2) #järgmine rida
-        return first_part.replace("-", "") + next_line_start #eemaldab sidekriipsu
 
-    #  Otsib sõna, mis lõpeb sidekriipsuga, millele järgneb
-    #  reavahetus (võimalike tühikutega) ja väiketähega algav sõna.
-    pattern = r'(\w+-)\s*\r?\n\s*([a-zäöüõ][^\s]*)'
-    
+def merge_hyphenations_count(text):
+    """Liidab poolitatud sõnad. Tagastab (puhastatud_tekst, liidetud_poolituste_arv)."""
+    return HYPHENATION_RE.subn(replace_hyphenation, text)
+
+
+def merge_hyphenations(text):
+    """Liidab poolitatud sõnad."""
     # Kasutame re.sub koos asendusfunktsiooniga.
-    cleaned_text = re.sub(pattern, replace_hyphenation, text, flags=re.MULTILINE)
+    cleaned_text, _ = merge_hyphenations_count(text)
     return cleaned_text
 
 
-def process_files(root_dir):
-    """Liidab poolitatud sõnad kõigis failides."""
+def clean_file(file_path, known_hash=None):
+    """
+    Puhastab ühe faili (töötaja protsessis).
+
+    Kui faili sisuräsi ühtib manifestis olevaga, jäetakse fail vahele.
+    Muudetud sisu kirjutatakse atomaarselt; muutmata faili ei kirjutata.
+
+    Returns:
+        Sõnastik võtmetega path, status ("skipped", "unchanged", "changed"
+        või "error"), merged, hash ja error.
+    """
+    result = {'path': file_path, 'status': 'unchanged', 'merged': 0, 'hash': None, 'error': None}
+    try:
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        content_hash = sha256_bytes(raw)
+        if content_hash == known_hash:
+            result['status'] = 'skipped'
+            result['hash'] = content_hash
+            return result
+
+        content = raw.decode('utf-8')
+        cleaned_content, merged = merge_hyphenations_count(content) # Teeb liitmise
+
+        if merged:
+            cleaned_raw = cleaned_content.encode('utf-8')
+            atomic_write(file_path, cleaned_raw)  # Kirjutab muudetud teksti tagasi faili
+            content_hash = sha256_bytes(cleaned_raw)
+            result['status'] = 'changed'
+            result['merged'] = merged
+        result['hash'] = content_hash
+    except Exception as e:
+        result['status'] = 'error'
+        result['error'] = str(e)
+    return result
+
+
+def find_text_files(root_dir):
+    """Kõik .txt failid kataloogipuus sorteeritud järjekorras."""
+    files = []
     for dirpath, dirnames, filenames in os.walk(root_dir):
         dirnames.sort()
         filenames.sort()
         for filename in filenames:
             if filename.endswith('.txt'):
-                file_path = os.path.join(dirpath, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
+                files.append(os.path.join(dirpath, filename))
+    return files
+
+
+def process_files(root_dir, incremental=True, workers=None, manifest_path=None, save_every=200):
+    """
+    Liidab poolitatud sõnad kõigis failides.
+
+    Manifestis on iga faili kohta {"hash": ..., "version": CLEAN_VERSION};
+    teise versiooniga (või vanas vormingus) kirjeid vahele ei jäeta.
+
+    Args:
+        root_dir: Kataloog, mille .txt failid puhastatakse.
+        incremental: Kas jätta vahele failid, mille räsi ja reeglite versioon on manifestis samad.
+        workers: Protsesside arv (vaikimisi protsessorite arv).
+        manifest_path: Manifesti fail (vaikimisi root_dir/.puhastamine_manifest.json).
+        save_every: Mitme faili järel manifest vahepeal salvestada.
+
+    Returns:
+        Kokkuvõtte sõnastik.
+    """
+    manifest = Manifest(manifest_path or os.path.join(root_dir, MANIFEST_NAME))
+    files = find_text_files(root_dir)
+    summary = {'files': len(files), 'skipped': 0, 'unchanged': 0, 'changed': 0, 'errors': 0, 'merged': 0}
+
+    def known_hash(path):
+        entry = manifest.get(os.path.relpath(path, root_dir)) if incremental else None
+        if isinstance(entry, dict) and entry.get('version') == CLEAN_VERSION:
+            return entry['hash']
+        return None
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(clean_file, files, [known_hash(f) for f in files], chunksize=32)
+        for i, result in enumerate(results, 1):
+            status = result['status']
+            if status == 'error':
+                summary['errors'] += 1
+                print(f"Viga faili {result['path']} töötlemisel: {result['error']}")
+                continue
+
+            summary[status] += 1
+            summary['merged'] += result['merged']
+            manifest[os.path.relpath(result['path'], root_dir)] = {'hash': result['hash'], 'version': CLEAN_VERSION}
+            if status == 'changed':
+                print(f"Poolitused liidetud ({result['merged']}): {result['path']}")
+
+            # Vahepealne salvestamine, et katkestuse korral tehtud töö säiliks
+            if i % save_every == 0:
+                manifest.save()
+
+    manifest.save()
+
+    print(f"\nFaile kokku: {summary['files']}")
+    print(f"Muudetud: {summary['changed']}, muutmata: {summary['unchanged']}, "
+          f"vahele jäetud (räsi sama): {summary['skipped']}, vigu: {summary['errors']}")
+    print(f"Liidetud poolitusi: {summary['merged']}")
+    return summary
 
-                    cleaned_content = merge_hyphenations(content) # Teeb liitmise
 
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write(cleaned_content)  # Kirjutab muudetud teksti tagasi faili
+def main():
+    parser = argparse.ArgumentParser(description='Liida poolitatud sõnad kõigis .txt failides')
+    parser.add_argument('root_directory', nargs='?', default='/home/mf/LLM/tering/processed_records/',
+                        help='Kaust kirjefailidega')
+    parser.add_argument('--full', action='store_true', help='Töötle kõik failid, ka manifestis olevad')
+    parser.add_argument('--workers', type=int, help='Protsesside arv')
+    parser.add_argument('--manifest', help='Manifesti fail')
+    args = parser.parse_args()
 
-                    print(f"Poolitused liidetud: {file_path}")
-                except Exception as e:
-                    print(f"Viga faili {file_path} töötlemisel: {str(e)}")
+    process_files(args.root_directory, incremental=not args.full, workers=args.workers, manifest_path=args.manifest)
 
-root_directory = '/home/mf/LLM/tering/processed_records/'  # Asenda oma kataloogiteega
-process_files(root_directory)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Aastafailidest kirjeteni ühe voona.
+
+Asendab kaheastmelise töövoo kuude_kaupa.py (aastafail -> kuufailid) ja
+eralid-kirjeteks.py (kuufail -> NR*.txt failid). Read loetakse generaatoriga,
+kuupäevapäis ja [NR] kirje tuvastatakse samal läbimisel ning kirjed
+kirjutatakse otse ühte JSONL faili. Vahefailid on valikuline silumisväljund.
+"""
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from kuupaevad import parse_header
+
+NR_RE = re.compile(r'\[NR\](\d+)')
+
+
+def iter_records(lines, year):
+    """
+    Jagab aastafaili read kirjeteks.
+
+    Args:
+        lines: Itereeritav ridadest (nt avatud fail).
+        year: Aasta stringina (aastafaili nimi).
+
+    Yields:
+        Sõnastik võtmetega number, year, month, header, content.
+    """
+    current_record = None
+    current_header = None
+    current_month = None
+
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+
+        header = parse_header(line, default_year=year)
+
+        if header:
+            # Uus kuupäev lõpetab eelmise kirje
+            if current_record:
+                yield current_record
+                current_record = None
+
+            if header['year'] == year:
+                current_month = f"{header['month']:02}"
+                current_header = header['text']
+            else:
+                # Teise aasta kirjed jäetakse vahele
+                current_month = None
+                current_header = None
+            continue
+
+        if current_header is None:
+            continue
+
+        # Uus kirje algab [NR] märgistusega
+        if line.startswith('[NR]'):
+            if current_record:
+                yield current_record
+            nr_match = NR_RE.match(line)
+            current_record = {
+                'number': nr_match.group(1) if nr_match else "unknown",
+                'year': year,
+                'month': current_month,
+                'header': current_header,
+                'content': [line],
+            }
+        elif current_record:
+            current_record['content'].append(line)
+
+    if current_record:
+        yield current_record
+
+
+def iter_year_file(year_file):
+    """Loeb aastafaili ja annab selle kirjed generaatorina."""
+    year = os.path.basename(year_file).split('.')[0]
+    with open(year_file, 'r', encoding='utf-8') as infile:
+        yield from iter_records(infile, year)
+
+
+def record_to_text(record):
+    """Kirje tekst samal kujul nagu eralid-kirjeteks.py NR*.txt failides."""
+    return (f"Immatrikuleerimise kuupäev: {record['header']}\n\n"
+            + "".join(line + "\n" for line in record['content']))
+
+
+def record_filename(record):
+    """Failinimi: NR<number>_<aasta>_<kuu>.txt"""
+    return f"NR{record['number']}_{record['year']}_{record['month']}.txt"
+
+
+def dump_records(records, debug_dir):
+    """Kirjutab kirjed silumiseks eraldi failidesse (processed_records kuju)."""
+    for record in records:
+        output_dir = os.path.join(debug_dir, record['year'])
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, record_filename(record)), 'w', encoding='utf-8') as outfile:
+            outfile.write(record_to_text(record))
+
+
+def _process_year_file(year_file, debug_dir=None):
+    """Töötaja: ühe aastafaili kirjed listina (protsesside vahel edastamiseks)."""
+    records = list(iter_year_file(year_file))
+    if debug_dir:
+        dump_records(records, debug_dir)
+    return records
+
+
+def run_pipeline(input_dir, output_file, debug_dir=None, workers=None):
+    """
+    Töötleb kõik aastafailid paralleelselt ja kirjutab kirjed JSONL faili.
+
+    Args:
+        input_dir: Kaust aastafailidega (nt output/1632.txt).
+        output_file: JSONL väljundfail, üks kirje rea kohta.
+        debug_dir: Kui antud, kirjutatakse kirjed ka eraldi failidesse.
+        workers: Protsesside arv (vaikimisi protsessorite arv).
+
+    Returns:
+        Kirjutatud kirjete arv.
+    """
+    year_files = sorted(
+        os.path.join(input_dir, f)
+        for f in os.listdir(input_dir)
+        if f.endswith('.txt')
+    )
+
+    total = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(output_file, 'w', encoding='utf-8') as outfile:
+        futures = [executor.submit(_process_year_file, f, debug_dir) for f in year_files]
+        # Tulemused kirjutatakse aastate järjekorras
+        for year_file, future in zip(year_files, futures):
+            records = future.result()
+            for record in records:
+                outfile.write(json.dumps(record, ensure_ascii=False) + '\n')
+            total += len(records)
+            print(f"Töödeldud {year_file}: {len(records)} kirjet")
+
+    return total
+
+
+def read_jsonl(filename):
+    """Loeb JSONL failist kirjed generaatorina."""
+    with open(filename, 'r', encoding='utf-8') as infile:
+        for line in infile:
+            if line.strip():
+                yield json.loads(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Jaga aastafailid kirjeteks ja kirjuta JSONL faili')
+    parser.add_argument('--input-dir', default='output', help='Kaust aastafailidega')
+    parser.add_argument('--output', default='kirjed.jsonl', help='JSONL väljundfail')
+    parser.add_argument('--debug-dir', help='Kirjuta kirjed ka eraldi NR*.txt failidesse (nt processed_records)')
+    parser.add_argument('--workers', type=int, help='Protsesside arv')
+    args = parser.parse_args()
+
+    total = run_pipeline(args.input_dir, args.output, debug_dir=args.debug_dir, workers=args.workers)
+    print(f"Valmis! Kokku {total} kirjet failis {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+LLM väljundi valideerimine JSON skeemi järgi.
+
+json_schema.json on näidiskujul (väljad väärtusega null, [] või näidisobjekt
+listis), mitte JSON Schema. schema_from_template tuletab sellest skeemi:
+- null -> skalaar (sõne, arv või null), false -> tõeväärtus või null
+- [] -> skalaaride list, [{...}] -> objektide list
+- {...} -> objekt; kohustuslikud on väljad, mille väärtus on objekt või
+  list (struktuur), skalaarväljad võivad puududa
+Kui fail on juba JSON Schema ("type"/"properties"), kasutatakse seda otse.
+
+Skeem kompileeritakse üks kord kontrollfunktsioonide puuks, mis kogub kõik
+vead koos teega (nt "studies[2].type"). Kui pakett fastjsonschema on
+paigaldatud, tehakse esmane kontroll selle koostatud validaatoriga ja
+vigade loend ainult siis, kui dokument ei valideeru.
+
+    python skeemi_valideerimine.py json_schema.json processed_records/1636/*.json
+    python skeemi_valideerimine.py --stats data/valideerimise_statistika.json
+"""
+import argparse
+import json
+import os
+import re
+import threading
+from collections import Counter
+
+from manifest import atomic_write
+
+SCALAR_TYPES = ["string", "number", "null"]
+
+INDEX_RE = re.compile(r'\[\d+\]')
+
+TYPE_CHECKS = {
+    "object": lambda value: isinstance(value, dict),
+    "array": lambda value: isinstance(value, list),
+    "string": lambda value: isinstance(value, str),
+    "number": lambda value: isinstance(value, (int, float)) and not isinstance(value, bool),
+    "integer": lambda value: isinstance(value, int) and not isinstance(value, bool),
+    "boolean": lambda value: isinstance(value, bool),
+    "null": lambda value: value is None,
+}
+
+
+def schema_from_template(template):
+    """JSON Schema näidiskujulisest JSON-ist (vt mooduli kirjeldus)."""
+    if isinstance(template, dict):
+        return {
+            "type": "object",
+            "properties": {key: schema_from_template(value) for key, value in template.items()},
+            "required": [key for key, value in template.items() if isinstance(value, (dict, list))],
+        }
+    if isinstance(template, list):
+        return {
+            "type": "array",
+            "items": schema_from_template(template[0]) if template else {"type": SCALAR_TYPES},
+        }
+    if isinstance(template, bool):
+        return {"type": ["boolean", "null"]}
+    return {"type": SCALAR_TYPES}
+
+
+def load_schema(path):
+    """Skeem failist: JSON Schema otse, näidiskuju teisendatakse."""
+    with open(path, 'r', encoding='utf-8') as f:
+        document = json.load(f)
+    if isinstance(document, dict) and ("properties" in document or "$schema" in document):
+        return document
+    return schema_from_template(document)
+
+
+def _type_name(value):
+    for name in ("null", "boolean", "integer", "number", "string", "array", "object"):
+        if TYPE_CHECKS[name](value):
+            return name
+    return type(value).__name__
+
+
+def _compile(schema):
+    """Skeemi osa -> funktsioon(value, path, errors)."""
+    types = schema.get("type")
+    if isinstance(types, str):
+        types = [types]
+    type_checks = [TYPE_CHECKS[name] for name in types] if types else None
+    properties = {key: _compile(sub) for key, sub in schema.get("properties", {}).items()}
+    required = schema.get("required", [])
+    items = _compile(schema["items"]) if "items" in schema else None
+    expected = " või ".join(types) if types else ""
+
+    def validate(value, path, errors):
+        if type_checks is not None and not any(check(value) for check in type_checks):
+            errors.append((path, f"oodati {expected}, saadi {_type_name(value)}"))
+            return
+        if isinstance(value, dict):
+            for key in required:
+                if key not in value:
+                    errors.append((f"{path}.{key}" if path else key, "kohustuslik väli puudub"))
+            for key, validate_property in properties.items():
+                if key in value:
+                    validate_property(value[key], f"{path}.{key}" if path else key, errors)
+        elif isinstance(value, list) and items is not None:
+            for index, item in enumerate(value):
+                items(item, f"{path}[{index}]", errors)
+
+    return validate
+
+
+def field_name(path):
+    """Vea tee statistika jaoks ilma indeksiteta: studies[2].type -> studies[].type."""
+    return INDEX_RE.sub('[]', path) or "(juur)"
+
+
+class SchemaValidator:
+    """
+    Üks kord kompileeritud validaator.
+
+    errors(document) -> list paaridest (tee, teade); tühi list = valiidne.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        self._validate = _compile(schema)
+        try:
+            import fastjsonschema
+        except ImportError:
+            fastjsonschema = None
+        self._fast = fastjsonschema.compile(schema) if fastjsonschema is not None else None
+        self._fast_error = fastjsonschema.JsonSchemaException if fastjsonschema is not None else None
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_schema(path))
+
+    def errors(self, document):
+        if self._fast is not None:
+            try:
+                self._fast(document)
+                return []
+            except self._fast_error:
+                pass
+        errors = []
+        self._validate(document, "", errors)
+        return errors
+
+    def check_text(self, json_output):
+        """(dokument või None, vead) JSON tekstist; süntaksiviga on samuti viga."""
+        try:
+            document = json.loads(json_output)
+        except json.JSONDecodeError as e:
+            return None, [("", f"ei ole valiidne JSON: {e}")]
+        return document, self.errors(document)
+
+
+def format_errors(errors, limit=50):
+    """Vead parandusprompti jaoks (üks rida vea kohta)."""
+    lines = [f"- {path or '(juur)'}: {message}" for path, message in errors[:limit]]
+    if len(errors) > limit:
+        lines.append(f"- ... veel {len(errors) - limit} viga")
+    return "\n".join(lines)
+
+
+class ValidationStats:
+    """
+    Valideerimise statistika väljade kaupa (lõimede vahel jagatav).
+
+    fields: välja tee (indeksiteta) -> vastuste arv, mille esimeses
+    versioonis oli selles väljas viga.
+    """
+
+    def __init__(self):
+        self.checked = 0
+        self.invalid = 0
+        self.repaired = 0
+        self.fields = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, errors, repaired=False):
+        """Ühe vastuse tulemus: esialgsed vead ja kas parandus õnnestus."""
+        with self._lock:
+            self.checked += 1
+            if errors:
+                self.invalid += 1
+                self.repaired += bool(repaired)
+                self.fields.update({field_name(path) for path, _ in errors})
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'checked': self.checked,
+                'invalid': self.invalid,
+                'repaired': self.repaired,
+                'fields': dict(self.fields.most_common()),
+            }
+
+    def save(self, path):
+        """Lisab statistika faili varasematele käivitustele juurde."""
+        totals = self.as_dict()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+            for key in ('checked', 'invalid', 'repaired'):
+                totals[key] += previous.get(key, 0)
+            fields = Counter(previous.get('fields', {}))
+            fields.update(totals['fields'])
+            totals['fields'] = dict(fields.most_common())
+        atomic_write(path, json.dumps(totals, indent=2, ensure_ascii=False))
+        return totals
+
+    def summary(self, top=5):
+        stats = self.as_dict()
+        fields = ", ".join(f"{name} {count}" for name, count in list(stats['fields'].items())[:top])
+        return (f"Skeemi valideerimine: {stats['checked']} vastust, vigaseid {stats['invalid']}, "
+                f"parandatud {stats['repaired']}" + (f"; sagedasemad väljad: {fields}" if fields else ""))
+
+
+def format_stats(stats, top=20):
+    lines = [f"{stats['checked']} vastust, vigaseid {stats['invalid']}, parandatud {stats['repaired']}"]
+    for name, count in list(stats['fields'].items())[:top]:
+        lines.append(f"  {count:>6}  {name}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON väljundite valideerimine skeemi järgi')
+    parser.add_argument('schema', nargs='?', default="json_schema.json", help='json_schema.json (näidiskuju või JSON Schema)')
+    parser.add_argument('files', nargs='*', help='Kontrollitavad JSON failid')
+    parser.add_argument('--stats', help='Näita salvestatud statistikat')
+    args = parser.parse_args()
+
+    if args.stats:
+        with open(args.stats, 'r', encoding='utf-8') as f:
+            print(format_stats(json.load(f)))
+        return
+
+    validator = SchemaValidator.from_file(args.schema)
+    stats = ValidationStats()
+    for path in args.files:
+        with open(path, 'r', encoding='utf-8') as f:
+            _, errors = validator.check_text(f.read())
+        stats.record(errors)
+        if errors:
+            print(f"{path}:\n{format_errors(errors, limit=10)}")
+    print(format_stats(stats.as_dict()))
+
+if __name__ == "__main__":
+    main()
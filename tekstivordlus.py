@@ -0,0 +1,43 @@
+"""
+Transkriptsioonide võrdlemine: märgi- ja sõnaveamäär (CER/WER) Levenshteini
+kauguse põhjal.
+"""
+
+
+def levenshtein(a, b):
+    """Levenshteini kaugus kahe jada vahel (märgid või sõnad), O(len(a) * len(b)) aeg, O(len(b)) mälu."""
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, item_a in enumerate(a, 1):
+        current = [i]
+        for j, item_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,                        # kustutamine
+                current[j - 1] + 1,                     # lisamine
+                previous[j - 1] + (item_a != item_b),   # asendus
+            ))
+        previous = current
+    return previous[-1]
+
+
+def normalize_whitespace(text):
+    """Ühtlustab tühikud ja reavahetused, et võrrelda ainult sisu."""
+    return " ".join(text.split())
+
+
+def cer(reference, hypothesis, normalize=True):
+    """Märgiveamäär: muudatuste arv / viiteteksti pikkus."""
+    if normalize:
+        reference, hypothesis = normalize_whitespace(reference), normalize_whitespace(hypothesis)
+    if not reference:
+        return 0.0 if not hypothesis else 1.0
+    return levenshtein(reference, hypothesis) / len(reference)
+
+
+def wer(reference, hypothesis):
+    """Sõnaveamäär: muudatuste arv sõnades / viiteteksti sõnade arv."""
+    reference_words, hypothesis_words = reference.split(), hypothesis.split()
+    if not reference_words:
+        return 0.0 if not hypothesis_words else 1.0
+    return levenshtein(reference_words, hypothesis_words) / len(reference_words)
@@ -0,0 +1,38 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def _load_script(filename):
+    """Sidekriipsuga skriptid (nt ocr-few-shot.py) laaditakse faili tee järgi."""
+    name = os.path.splitext(filename)[0].replace("-", "_")
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    try:
+        spec.loader.exec_module(module)
+    except BaseException:
+        del sys.modules[name]
+        raise
+    return module
+
+
+@pytest.fixture(scope="session")
+def load_script():
+    return _load_script
+
+
+@pytest.fixture(scope="session")
+def ocr(load_script):
+    """ocr-few-shot.py (vajab google-generativeai ja python-dotenv paketti)."""
+    pytest.importorskip("google.generativeai")
+    pytest.importorskip("dotenv")
+    return load_script("ocr-few-shot.py")
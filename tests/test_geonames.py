@@ -0,0 +1,189 @@
+import os
+import sqlite3
+import sys
+import zipfile
+
+import pytest
+
+from conftest import ROOT
+from geonames_kohalik import GeoNamesIndex, import_dumps, name_key
+
+DUMPS = os.path.join(ROOT, "tests", "andmed", "geonames")
+PLACES = os.path.join(DUMPS, "allCountries.txt")
+ADMIN1 = os.path.join(DUMPS, "admin1CodesASCII.txt")
+ALTERNATE_NAMES = os.path.join(DUMPS, "alternateNames.txt")
+
+
+def build(path, feature_classes="A", places=PLACES, alternate_names=ALTERNATE_NAMES):
+    import_dumps(str(path), [places], admin1=ADMIN1, alternate_names=alternate_names, feature_classes=feature_classes)
+    return GeoNamesIndex(str(path))
+
+
+@pytest.fixture(scope="module")
+def index(tmp_path_factory):
+    index = build(tmp_path_factory.mktemp("geonames") / "geonames.sqlite")
+    yield index
+    index.close()
+
+
+def ids(results):
+    return [result['geonameid'] for result in results]
+
+
+def test_name_key():
+    assert name_key("  Häme ") == name_key("HAME") == "hame"
+    assert name_key("Upper  Palatinate") == "upper palatinate"
+
+
+def test_exact_key_orders_by_population(index):
+    assert ids(index.search("HAME", max_rows=2)) == [830709, 830710]
+    assert index.geonames_id("Häme") == 830709
+
+
+def test_exact_key_matches_alternate_names(index):
+    assert index.geonames_id("Estland") == 453733
+    assert index.geonames_id("Upper Palatinate") == 2853658
+    assert index.geonames_id("Tavastland") == 830709
+
+
+def test_full_text_fallback(index):
+    # Täpset nime pole; FTS leiab nime, mis sisaldab kõiki sõnu
+    assert index.geonames_id("Palatinate") == 2853658
+    assert index.geonames_id("Oberpfalz Regierungsbezirk") == 2853658
+    assert index.search("Atlantis") == []
+
+
+def test_admin1_name(index):
+    assert index.search("Bavaria")[0]['admin1_name'] == "Bavaria"
+
+
+def test_link_rows_are_not_names(index):
+    assert index.search("wikipedia", feature_class=None) == []
+
+
+def test_default_import_keeps_only_feature_class_a(index):
+    # Tallinn on P-klassi koht; klassita rida ei tohi '' in "A" kaudu kaasa tulla
+    assert index.search("Reval", feature_class=None) == []
+    assert index.search("Dorpatia", feature_class=None) == []
+    classes = {row[0] for row in index.connection.execute("SELECT DISTINCT feature_class FROM geonames")}
+    assert classes == {"A"}
+
+
+def test_feature_class_filter(tmp_path):
+    index = build(tmp_path / "geonames.sqlite", feature_classes="AP")
+    try:
+        assert index.geonames_id("Reval", feature_class="P") == 588409
+        assert index.geonames_id("Reval", feature_class="A") is None
+        assert index.geonames_id("Reval", feature_class=None) == 588409
+        assert index.search("Dorpatia", feature_class=None) == []
+    finally:
+        index.close()
+
+
+def test_import_all_classes(tmp_path):
+    index = build(tmp_path / "geonames.sqlite", feature_classes="")
+    try:
+        assert index.geonames_id("Dorpatia", feature_class=None) == 9990001
+    finally:
+        index.close()
+
+
+def test_zip_dump_and_alternate_column(tmp_path):
+    archive = str(tmp_path / "allCountries.zip")
+    with zipfile.ZipFile(archive, "w") as f:
+        f.writestr("readme.txt", "GeoNames")
+        f.write(PLACES, "allCountries.txt")
+    # Ilma teisendnimede failita loetakse allCountries alternatenames veergu
+    index = build(tmp_path / "geonames.sqlite", places=archive, alternate_names=None)
+    try:
+        assert index.geonames_id("Freistaat Bayern") == 2951839
+        assert index.geonames_id("Upper Palatinate") is None
+    finally:
+        index.close()
+
+
+def test_index_is_read_only(index):
+    with pytest.raises(sqlite3.OperationalError):
+        index.connection.execute("DELETE FROM geonames")
+
+
+# --- geonames-updater.py: kohalik andmebaas, --offline ja vahemälu ---
+
+class FakeRequests:
+    """requests mooduli asendaja: loeb päringud ja tagastab ette antud vastuse."""
+
+    def __init__(self, geonames=()):
+        self.calls = []
+        self.data = {"totalResultsCount": len(geonames), "geonames": list(geonames)}
+
+    def get(self, url, params=None):
+        self.calls.append(params["q"])
+        data = self.data
+        return type("Response", (), {"raise_for_status": lambda self: None, "json": lambda self: data})()
+
+
+@pytest.fixture(scope="module")
+def updater_module(load_script, tmp_path_factory):
+    # Moodul seadistab laadimisel logifaili töökausta
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("logi"))
+    try:
+        return load_script("geonames-updater.py")
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def updater(updater_module, index, monkeypatch):
+    monkeypatch.setattr(updater_module, "GEONAMES_CACHE", {})
+    monkeypatch.setattr(updater_module, "LOCAL_INDEX", index)
+    monkeypatch.setattr(updater_module, "OFFLINE", False)
+    monkeypatch.setattr(updater_module.time, "sleep", lambda seconds: None)
+    return updater_module
+
+
+@pytest.fixture
+def api(monkeypatch):
+    fake = FakeRequests([{"geonameId": "123"}])
+    monkeypatch.setitem(sys.modules, "requests", fake)
+    return fake
+
+
+def test_updater_local_hit_skips_api(updater, api):
+    assert updater.search_geonames("Bavaria") == 2951839
+    assert updater.get_or_create_geonames_id("Bayern") == 2951839
+    assert api.calls == []
+    assert updater.GEONAMES_CACHE["Bavaria"] == 2951839
+
+
+def test_updater_local_miss_falls_back_to_api(updater, api):
+    assert updater.search_geonames("Atlantis") == 123
+    assert api.calls == ["Atlantis"]
+    assert updater.GEONAMES_CACHE["Atlantis"] == 123
+
+
+def test_updater_offline_miss(updater, api, monkeypatch):
+    monkeypatch.setattr(updater, "OFFLINE", True)
+    assert updater.search_geonames("Atlantis") is None
+    assert api.calls == []
+    # Võrguta tulemust ei salvestata, et hilisem käivitus API-ga seda otsiks
+    assert "Atlantis" not in updater.GEONAMES_CACHE
+
+
+def test_updater_cached_none(updater, api, monkeypatch):
+    updater.GEONAMES_CACHE.update({"Atlantis": None, "Bavaria": None})
+    # API-st juba otsitud nime ei küsita uuesti ...
+    assert updater.search_geonames("Atlantis") is None
+    # ... kuid kohalikust andmebaasist proovitakse
+    assert updater.search_geonames("Bavaria") == 2951839
+    monkeypatch.setattr(updater, "LOCAL_INDEX", None)
+    assert updater.search_geonames("Atlantis") is None
+    assert api.calls == []
+
+
+def test_updater_api_miss_is_cached(updater, monkeypatch):
+    fake = FakeRequests()
+    monkeypatch.setitem(sys.modules, "requests", fake)
+    assert updater.search_geonames("Atlantis") is None
+    assert updater.search_geonames("Atlantis") is None
+    assert fake.calls == ["Atlantis"]
@@ -0,0 +1,99 @@
+import asyncio
+import time
+
+import pytest
+
+from kiiruspiirang import AdaptiveConcurrency, RateLimitError, TokenBucket, is_rate_limit_error
+
+
+def timed_acquires(bucket, tokens, count):
+    async def run():
+        start = time.monotonic()
+        for _ in range(count):
+            await bucket.acquire(tokens)
+        return time.monotonic() - start
+    return asyncio.run(run())
+
+
+def test_bucket_allows_burst_of_one_minute():
+    assert timed_acquires(TokenBucket(1200), 0, 1200) < 0.2
+
+
+def test_bucket_limits_requests_per_minute():
+    # 1200 päringut minutis = 20/s: täis ämbri järel 10 päringut võtab ~0,5 s
+    assert timed_acquires(TokenBucket(1200), 0, 1210) >= 0.45
+
+
+def test_bucket_limits_tokens_per_minute():
+    # 6000 tokenit minutis = 100/s
+    bucket = TokenBucket(10 ** 6, tokens_per_minute=6000)
+    assert timed_acquires(bucket, 3000, 2) < 0.1
+    assert timed_acquires(bucket, 50, 1) >= 0.45
+
+
+def test_bucket_lets_oversized_request_through_when_full():
+    bucket = TokenBucket(10 ** 6, tokens_per_minute=6000)
+    assert timed_acquires(bucket, 10 ** 6, 1) < 0.1
+
+
+def test_bucket_is_fair_across_tasks():
+    bucket = TokenBucket(1200)
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*[bucket.acquire() for _ in range(1210)])
+        return time.monotonic() - start
+
+    assert asyncio.run(run()) >= 0.45
+
+
+def test_concurrency_halves_on_overload():
+    async def run():
+        concurrency = AdaptiveConcurrency(initial=8, min_limit=1)
+        limits = []
+        for _ in range(5):
+            await concurrency.on_overload()
+            limits.append(concurrency.limit)
+        return limits, [limit for _, limit in concurrency.history]
+
+    limits, history = asyncio.run(run())
+    assert limits == [4, 2, 1, 1, 1]
+    assert history == [8, 4, 2, 1]
+
+
+def test_concurrency_grows_after_limit_fast_successes():
+    async def run():
+        concurrency = AdaptiveConcurrency(initial=2, max_limit=3, target_latency=1.0)
+        limits = []
+        for latency in [0.1, 0.1, 0.1, 5.0, 0.1, 0.1, 0.1, 0.1, 0.1]:
+            await concurrency.on_success(latency)
+            limits.append(concurrency.limit)
+        return limits
+
+    # Aeglane päring nullib loenduri; piir ei ületa max_limit-i
+    assert asyncio.run(run()) == [2, 3, 3, 3, 3, 3, 3, 3, 3]
+
+
+def test_concurrency_blocks_above_limit():
+    async def run():
+        concurrency = AdaptiveConcurrency(initial=1)
+        await concurrency.acquire()
+        waiter = asyncio.create_task(concurrency.acquire())
+        await asyncio.sleep(0.01)
+        blocked = not waiter.done()
+        await concurrency.release()
+        await asyncio.wait_for(waiter, 1)
+        return blocked, concurrency.in_flight
+
+    assert asyncio.run(run()) == (True, 1)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (RateLimitError("x"), True),
+    (RuntimeError("429 Too Many Requests"), True),
+    (RuntimeError("Quota exceeded"), True),
+    (type("ResourceExhausted", (Exception,), {})("x"), True),
+    (RuntimeError("500 Internal error"), False),
+])
+def test_is_rate_limit_error(error, expected):
+    assert is_rate_limit_error(error) is expected
@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from conftest import ROOT
+from kuupaevad import iter_headers, month_to_number, parse_header, to_iso
+
+# Servajuhud, mille kohta varasemad skriptid andsid erinevaid tulemusi.
+GOLDEN_CASES = [
+    ("20. April 1632", None, "1632-04-20"),
+    ("21. April", "1632", "1632-04-21"),
+    ("24. A pril", "1632", "1632-04-24"),
+    ("Dep. 5. Mai", "1633", "1633-05-05"),
+    ("Dep.12. Juni 1640", None, "1640-06-12"),
+    ("Juni 1632", None, "1632-06"),
+    ("3. Ian. 1640", None, "1640-01-03"),
+    ("17. Septemb. 1650", None, "1650-09-17"),
+    ("8. Martii 1660", None, "1660-03-08"),
+    ("9. Octobris", "1670", "1670-10-09"),
+    ("1. Detsember 1700", None, "1700-12-01"),
+    ("1632", None, None),
+    ("Stockholm 1648", None, None),
+    ("7. Zethraeus, Georgius", None, None),
+]
+
+
+def few_shot_headers():
+    """(päiserida, entry_date) paarid few_shot_examples.json-ist."""
+    with open(os.path.join(ROOT, "few_shot_examples.json"), encoding="utf-8") as f:
+        examples = json.load(f)
+    prefix = "Immatrikuleerimise kuupäev:"
+    cases = []
+    for example in examples:
+        first_line = example["Tekst"].split("\n", 1)[0]
+        if first_line.startswith(prefix):
+            first_line = first_line[len(prefix):]
+        cases.append((first_line.strip(), example["JSON"]["entry_date"]))
+    return cases
+
+
+@pytest.mark.parametrize("line, default_year, expected", GOLDEN_CASES)
+def test_golden_headers(line, default_year, expected):
+    assert to_iso(parse_header(line, default_year)) == expected
+
+
+@pytest.mark.parametrize("line, expected", few_shot_headers())
+def test_few_shot_headers(line, expected):
+    assert to_iso(parse_header(line)) == expected
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("April", 4),
+    ("A pril", 4),
+    ("Ian.", 1),
+    ("Jänner", 1),
+    ("Martii", 3),
+    ("März", 3),
+    ("Septemb", 9),
+    ("Decemb.", 12),
+    ("Octobris", 10),
+    ("Juuli", 7),
+    ("Ju", None),
+    ("Stockholm", None),
+    ("", None),
+])
+def test_month_to_number(name, expected):
+    assert month_to_number(name) == expected
+
+
+def test_parse_header_fields():
+    assert parse_header("Dep. 5. Mai", "1633") == {
+        'day': 5, 'month': 5, 'month_name': "Mai", 'year': "1633", 'deposited': True, 'text': "5. Mai 1633",
+    }
+
+
+def test_iter_headers_skips_entry_lines():
+    text = "20. April 1632\n1. Baaz(ius), Benedictus\n21. April\n2. Zethraeus, Georgius\n"
+    assert [parsed['text'] for _, parsed in iter_headers(text, "1632")] == ["20. April 1632", "21. April 1632"]
@@ -0,0 +1,68 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from moodikud import PRICES, Tracer, read_trace, request_cost, summarize
+
+
+def usage(prompt, output, cached=None, thoughts=None):
+    return SimpleNamespace(usage_metadata=SimpleNamespace(
+        prompt_token_count=prompt, candidates_token_count=output,
+        cached_content_token_count=cached, thoughts_token_count=thoughts))
+
+
+def record(prompt, output, cached=0, model="gemini-2.0-flash", outcome="ok", name="a.txt"):
+    return {'kind': "extract", 'files': [name], 'model': model, 'latency_s': 1.0, 'prompt_tokens': prompt,
+            'cached_tokens': cached, 'output_tokens': output, 'retries': 0, 'outcome': outcome}
+
+
+def test_span_records_cached_tokens(tmp_path):
+    path = str(tmp_path / "kutsed.jsonl")
+    tracer = Tracer(path)
+    with tracer.request("extract", ["data/a.txt"], "gemini-2.0-flash", "abc") as span:
+        span.response(usage(1000, 200, cached=800, thoughts=50))
+    with tracer.request("extract", ["data/b.txt"], "gemini-2.0-flash", "abc") as span:
+        span.response(usage(300, 20))
+    tracer.close()
+
+    first, second = read_trace(path)
+    assert (first['prompt_tokens'], first['cached_tokens'], first['output_tokens']) == (1000, 800, 250)
+    assert first['files'] == ["a.txt"]
+    assert second['cached_tokens'] == 0
+
+
+def test_cached_tokens_are_priced_separately():
+    price = PRICES["gemini-2.0-flash"]
+    # 200 tavalist ja 800 vahemälust loetud sisendtokenit
+    expected = (200 * price[0] + 800 * price[2] + 100 * price[1]) / 1e6
+    assert request_cost(record(1000, 100, cached=800), price) == pytest.approx(expected)
+    assert request_cost(record(1000, 100, cached=800), price) < request_cost(record(1000, 100), price)
+    # Ilma vahemälu hinnata on vahemälust loetud sisend tavahinnaga
+    assert request_cost(record(1000, 0, cached=800), (1.0, 2.0)) == pytest.approx(1000 / 1e6)
+    # Vanemates jälgedes cached_tokens puudub
+    old = record(1000, 0)
+    del old['cached_tokens']
+    assert request_cost(old, (1.0, 2.0, 0.25)) == pytest.approx(1000 / 1e6)
+
+
+def test_summarize_totals_and_cost():
+    records = [
+        record(1000, 100, cached=800, name="a.txt"),
+        record(1000, 100, name="b.txt"),
+        record(1000, 100, cached=1000, outcome="cache_hit", name="c.txt"),
+    ]
+    summary = summarize(records, prices=(1.0, 2.0, 0.25))["extract"]
+
+    assert summary['requests'] == 2
+    assert summary['files'] == 3
+    assert summary['total_prompt_tokens'] == 2000
+    assert summary['total_cached_tokens'] == 800
+    assert summary['cost_usd'] == pytest.approx((200 + 800 * 0.25 + 1000 + 2 * 100 * 2.0) / 1e6)
+    json.dumps(summary)
+
+
+def test_unpriced_models():
+    summary = summarize([record(1000, 100, model="tundmatu")])["extract"]
+    assert summary['cost_usd'] == 0.0
+    assert summary['unpriced_models'] == ["tundmatu"]
@@ -0,0 +1,54 @@
+import json
+import os
+
+import pytest
+
+from conftest import ROOT
+from naidete_valik import ExampleStore, byte_ngrams, gram_array
+
+
+@pytest.fixture(scope="module")
+def examples():
+    with open(os.path.join(ROOT, "few_shot_examples.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_gram_array_covers_every_position():
+    text = "Stud. Univ. Rostock"
+    grams = gram_array(text)
+    assert len(grams) == len(text.lower()) - 3
+    # Sama 4-gramm annab sama arvu igal nihkel
+    assert byte_ngrams("abcd") <= byte_ngrams("xabcdx") and byte_ngrams("abcd") <= byte_ngrams("xxabcd")
+    assert byte_ngrams("  ABCD ") == byte_ngrams("abcd")
+    assert len(gram_array("abc")) == 0
+
+
+def test_each_example_is_its_own_best_match(examples):
+    store = ExampleStore(examples)
+    for example_id, example in enumerate(examples):
+        scores = store.scores(example["Tekst"])
+        assert max(range(len(scores)), key=scores.__getitem__) == example_id
+        assert 0.5 < scores[example_id] <= 1.0
+
+
+def test_select_respects_k_and_token_budget(examples):
+    store = ExampleStore(examples)
+    text = examples[0]["Tekst"]
+    assert store.select(text, k=1) == [examples[0]]
+    assert len(store.select(text, k=5)) == len(examples)
+    budget = min(store.tokens)
+    selected = store.select(text, k=3, token_budget=budget)
+    assert len(selected) == 1
+    assert store.tokens[examples.index(selected[0])] <= budget
+
+
+def test_unrelated_text_scores_zero(examples):
+    store = ExampleStore(examples)
+    assert store.scores("") == [0.0] * len(examples)
+    assert ExampleStore([]).select("Dorpat") == []
+
+
+def test_select_for_batch_uses_best_score(examples):
+    store = ExampleStore(examples)
+    selected = store.select_for_batch([examples[1]["Tekst"], examples[2]["Tekst"]], k=2)
+    assert {examples.index(example) for example in selected} == {1, 2}
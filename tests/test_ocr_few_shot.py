@@ -0,0 +1,138 @@
+import asyncio
+import os
+
+import pytest
+
+
+def make_pages(folder, names):
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for name in names:
+        path = os.path.join(folder, name)
+        with open(path, "wb") as f:
+            f.write(name.encode("ascii"))
+        paths.append(path)
+    return paths
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+class FakeLocalBackend:
+    """TesseractBackendi asendaja: usaldusväärsus failinime järgi."""
+
+    workers = 2
+    model_name = "fake-tesseract"
+    prompt_version = "local"
+
+    def __init__(self, confidences):
+        self.confidences = confidences
+
+    def transcribe_with_confidence(self, image_path):
+        name = os.path.basename(image_path)
+        return f"kohalik {name}", self.confidences[name]
+
+
+@pytest.mark.parametrize("resume", [True, False])
+def test_routed_sends_low_confidence_pages_to_remote(ocr, tmp_path, resume):
+    pages = make_pages(str(tmp_path / "pildid"), ["p1.jpg", "p2.jpg", "p3.jpg"])
+    output = str(tmp_path / "tekst")
+    local = FakeLocalBackend({"p1.jpg": 95.0, "p2.jpg": 20.0, "p3.jpg": 40.0})
+    remotes = []
+
+    def make_remote():
+        remotes.append(ocr.StubOcrBackend(latency=0, jitter=0, seed=1))
+        return remotes[-1]
+
+    failed, router = ocr.ocr_routed(pages, local, output, make_remote=make_remote, resume=resume)
+
+    assert failed == []
+    assert router.counts == {'local': 1, 'remote': 0, 'low_confidence': 2}
+    assert read(os.path.join(output, "p1.txt")) == "kohalik p1.jpg"
+    assert read(os.path.join(output, "p2.txt")) == "[stub] p2.jpg"
+    assert read(os.path.join(output, "p3.txt")) == "[stub] p3.jpg"
+    assert remotes[0].usage.pages == 2
+    # Kaugtausta tulemus asendab kohaliku ebakindla teksti
+    assert not os.path.exists(os.path.join(output, "p2.txt.ebakindel"))
+    # --no-resume: ka teine läbimine ei kirjuta manifesti
+    assert os.path.exists(os.path.join(output, ocr.OcrRunState.MANIFEST_NAME)) == resume
+
+
+def test_routed_ignores_stale_journal_without_resume(ocr, tmp_path):
+    pages = make_pages(str(tmp_path / "pildid"), ["p1.jpg"])
+    output = str(tmp_path / "tekst")
+    os.makedirs(output)
+    # Vana päevik, kus lehekülg on juba lahendatud
+    with open(os.path.join(output, ocr.OcrRunState.JOURNAL_NAME), "w", encoding="utf-8") as f:
+        f.write('{"image": "%s", "status": "resolved"}\n' % pages[0])
+
+    failed, _ = ocr.ocr_routed(pages, FakeLocalBackend({"p1.jpg": 10.0}), output,
+                               make_remote=lambda: ocr.StubOcrBackend(latency=0, jitter=0), resume=False)
+
+    assert failed == []
+    assert read(os.path.join(output, "p1.txt")) == "[stub] p1.jpg"
+
+
+def test_local_only_keeps_low_confidence_text(ocr, tmp_path):
+    pages = make_pages(str(tmp_path / "pildid"), ["p1.jpg"])
+    output = str(tmp_path / "tekst")
+
+    failed, _ = ocr.ocr_routed(pages, FakeLocalBackend({"p1.jpg": 10.0}), output, make_remote=None)
+
+    assert failed == pages
+    assert not os.path.exists(os.path.join(output, "p1.txt"))
+    assert read(os.path.join(output, "p1.txt.ebakindel")) == "kohalik p1.jpg"
+
+
+def run_async(ocr, pages, backend, output, **options):
+    options.setdefault("requests_per_minute", 10 ** 6)
+    return asyncio.run(ocr.ocr_images_async(pages, backend, output, resume=False, **options))
+
+
+@pytest.fixture
+def no_backoff(ocr, monkeypatch):
+    monkeypatch.setattr(ocr, "backoff_delay", lambda attempt: 0.0)
+
+
+def test_async_concurrency_drops_on_429_and_recovers(ocr, tmp_path, no_backoff):
+    pages = make_pages(str(tmp_path / "pildid"), [f"p{i:02d}.jpg" for i in range(30)])
+    # Teenus lubab 2 samaaegset päringut; draiver alustab neljaga
+    backend = ocr.StubOcrBackend(latency=0.05, jitter=0, max_concurrency=2, seed=1)
+
+    failed, stats = run_async(ocr, pages, backend, str(tmp_path / "tekst"),
+                              initial_concurrency=4, max_concurrency=8, max_retries=10)
+
+    assert failed == []
+    assert stats['rate_limited'] > 0
+    history = stats['concurrency_history']
+    assert history[0] == 4
+    lowest = history.index(min(history))
+    assert min(history) < 4
+    # Pärast 429 vigu kasvab piir hea latentsuse korral uuesti
+    assert max(history[lowest:]) > min(history)
+
+
+def test_async_concurrency_grows_only_with_healthy_latency(ocr, tmp_path, no_backoff):
+    pages = make_pages(str(tmp_path / "pildid"), [f"p{i:02d}.jpg" for i in range(20)])
+
+    _, fast = run_async(ocr, pages, ocr.StubOcrBackend(latency=0.01, jitter=0), str(tmp_path / "kiire"),
+                        initial_concurrency=1, max_concurrency=4, target_latency=1.0)
+    _, slow = run_async(ocr, pages, ocr.StubOcrBackend(latency=0.03, jitter=0), str(tmp_path / "aeglane"),
+                        initial_concurrency=1, max_concurrency=4, target_latency=0.01)
+
+    assert fast['concurrency_history'] == [1, 2, 3, 4]
+    assert slow['concurrency_history'] == [1]
+
+
+def test_async_retries_random_429(ocr, tmp_path, no_backoff):
+    pages = make_pages(str(tmp_path / "pildid"), [f"p{i:02d}.jpg" for i in range(20)])
+    backend = ocr.StubOcrBackend(latency=0.01, jitter=0, rate_limit_rate=0.3, seed=7)
+
+    failed, stats = run_async(ocr, pages, backend, str(tmp_path / "tekst"), max_retries=10)
+
+    assert failed == []
+    assert stats['rate_limited'] == stats['retries'] > 0
+    assert backend.usage.pages == len(pages)
+
@@ -0,0 +1,58 @@
+import json
+import os
+
+import puhastamine
+from puhastamine import MANIFEST_NAME, merge_hyphenations, process_files
+
+
+def write(path, text):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_merge_hyphenations():
+    assert merge_hyphenations("Univer-\nsität Rostock") == "Universität Rostock"
+    # Suurtähega ja numbriga järg jääb alles
+    assert merge_hyphenations("Curo-\nLiv") == "Curo-\nLiv"
+    assert merge_hyphenations("1632-\n28. 5. 1633") == "1632-\n28. 5. 1633"
+
+
+def test_incremental_run_skips_unchanged_files(tmp_path):
+    write(tmp_path / "a.txt", "Univer-\nsität")
+    write(tmp_path / "b.txt", "Dorpat")
+
+    first = process_files(str(tmp_path), workers=1)
+    second = process_files(str(tmp_path), workers=1)
+
+    assert (first['changed'], first['unchanged'], first['skipped']) == (1, 1, 0)
+    assert second['skipped'] == 2
+    assert read(tmp_path / "a.txt") == "Universität"
+    entry = json.loads(read(tmp_path / MANIFEST_NAME))["a.txt"]
+    assert entry['version'] == puhastamine.CLEAN_VERSION
+
+
+def test_rules_change_invalidates_manifest(tmp_path, monkeypatch):
+    write(tmp_path / "a.txt", "Dorpat")
+    process_files(str(tmp_path), workers=1)
+
+    monkeypatch.setattr(puhastamine, "CLEAN_VERSION", "uus")
+    summary = process_files(str(tmp_path), workers=1)
+
+    assert summary['skipped'] == 0
+    assert summary['unchanged'] == 1
+
+
+def test_old_manifest_format_is_reprocessed(tmp_path):
+    write(tmp_path / "a.txt", "Dorpat")
+    process_files(str(tmp_path), workers=1)
+    manifest_path = tmp_path / MANIFEST_NAME
+    # Vanas vormingus oli väärtus ainult räsi
+    entries = {key: value['hash'] for key, value in json.loads(read(manifest_path)).items()}
+    write(manifest_path, json.dumps(entries))
+
+    assert process_files(str(tmp_path), workers=1)['skipped'] == 0
@@ -0,0 +1,16 @@
+"""
+Tokenite hinnang baitide arvu järgi (ilma mudeli tokeniseerijata).
+
+Kasutavad partiide ja plokkide eelarved (Kirjete_jagamine_sadade_kaupa.py,
+Kirjete_grupeerimine_kuupäevade_järgi.py), näidete valik (naidete_valik.py)
+ja kiiruspiirang (llm-json-tering.py).
+"""
+import math
+
+# Keskmiselt ~4 baiti tokeni kohta
+BYTES_PER_TOKEN = 4
+
+
+def estimate_tokens(n_bytes):
+    """Hindab tokenite arvu baitide arvu järgi."""
+    return math.ceil(n_bytes / BYTES_PER_TOKEN)
@@ -0,0 +1,157 @@
+"""
+LLM vastuste sisuaadressiga vahemälu SQLite failis.
+
+Võti on räsi kirje tekstist ja kõigest, mis vastust mõjutab (prompti
+mall, JSON skeem, few-shot näited, lühendid, mudel). Muutmata sisendiga
+kirjeid uuesti ei saadeta; kui muutub skeem või mõne kirje segmenteerimine,
+muutub ainult vastavate kirjete võti.
+
+Fail kasvab kuni max_bytes piirini, seejärel kustutatakse kõige kauem
+kasutamata vastused (LRU).
+
+    python vastuste_vahemalu.py stats data/llm_vastused.sqlite
+    python vastuste_vahemalu.py clear data/llm_vastused.sqlite
+"""
+import argparse
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    model TEXT,
+    size INTEGER NOT NULL,
+    prompt_tokens INTEGER,
+    output_tokens INTEGER,
+    created REAL,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+
+def cache_key(*parts):
+    """sha256 osade üle; osad eraldatakse, et ("ab", "c") != ("a", "bc")."""
+    digest = hashlib.sha256()
+    for part in parts:
+        data = part.encode('utf-8') if isinstance(part, str) else bytes(part)
+        digest.update(str(len(data)).encode('ascii') + b':' + data)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Vastuste vahemälu. Lõimede vahel jagatav (üks ühendus + lukk).
+
+    Loendurid: hits, misses (erinevad võtmed, mida ei leitud; sama kirje
+    korduv otsing ei loe topelt), saved_tokens (tabamuste sisend- ja
+    väljundtokenid, mis jäid maksmata).
+    """
+
+    def __init__(self, path, max_bytes=500 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self._missed = set()
+        self.saved_tokens = 0
+        self.evicted = 0
+
+    def get(self, key):
+        """Vastuse tekst või None."""
+        with self._lock:
+            row = self.connection.execute(
+                "SELECT response, prompt_tokens, output_tokens FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._missed.add(key)
+                return None
+            self.hits += 1
+            self.saved_tokens += (row[1] or 0) + (row[2] or 0)
+            self.connection.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.connection.commit()
+            return row[0]
+
+    def put(self, key, response, model=None, prompt_tokens=None, output_tokens=None):
+        now = time.time()
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, response, model, size, prompt_tokens, output_tokens, now, now),
+            )
+            self._evict()
+            self.connection.commit()
+
+    def _evict(self):
+        total = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Kustuta vanimad, kuni maht on 90% piirist (et mitte iga lisamise järel kustutada)
+        target = self.max_bytes * 0.9
+        rows = self.connection.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+        doomed = []
+        for key, size in rows:
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self.connection.executemany("DELETE FROM responses WHERE key = ?", doomed)
+        self.evicted += len(doomed)
+
+    @property
+    def misses(self):
+        return len(self._missed)
+
+    def stats(self):
+        with self._lock:
+            count, size = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {'entries': count, 'bytes': size}
+
+    def summary(self):
+        stats = self.stats()
+        return (f"Vastuste vahemälu: tabamusi {self.hits}, möödalaske {self.misses}, "
+                f"säästetud ~{self.saved_tokens} tokenit, eemaldatud {self.evicted}; "
+                f"{stats['entries']} kirjet, {stats['bytes'] / 1024 / 1024:.1f} MB")
+
+    def clear(self):
+        with self._lock:
+            self.connection.execute("DELETE FROM responses")
+            self.connection.commit()
+            self.connection.execute("VACUUM")
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='LLM vastuste vahemälu')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    stats_parser = subparsers.add_parser('stats', help='Näita vahemälu suurust')
+    stats_parser.add_argument('path')
+    clear_parser = subparsers.add_parser('clear', help='Tühjenda vahemälu')
+    clear_parser.add_argument('path')
+    args = parser.parse_args()
+
+    cache = ResponseCache(args.path)
+    if args.command == 'stats':
+        stats = cache.stats()
+        print(f"{stats['entries']} vastust, {stats['bytes'] / 1024 / 1024:.1f} MB: {args.path}")
+    else:
+        cache.clear()
+        print(f"Vahemälu tühjendatud: {args.path}")
+    cache.close()
+
+if __name__ == "__main__":
+    main()